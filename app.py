@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+import uvicorn
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Body
+from fastapi.responses import Response, JSONResponse
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.entity.config_entity import AppConfig, PredictionPipelineConfig
+from breastcancerdiagnosis.pipeline.prediction_service import PredictionService, BulkRequestError, load_served_model
+from breastcancerdiagnosis.pipeline.prefork_server import PreforkServer
+from breastcancerdiagnosis.utils.shared_arrays import share_model_arrays
+from breastcancerdiagnosis.logger.log import logging
+
+app_config = AppConfig.from_yaml("config/config.yaml")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the model is loaded before the first request, pre-fork workers reuse the one their parent loaded
+    app.state.service = PredictionService(app_config, PredictionPipelineConfig.from_yaml("config/config.yaml"),
+                                          served_model=getattr(app.state, "served_model", None))
+    yield
+    await app.state.service.close()
+
+
+app = FastAPI(title="Breast Cancer Diagnosis", lifespan=lifespan)
+
+
+async def score_bulk(score, payload) -> bytes:
+    ''' Runs a bulk scoring method of the service in a scoring thread, the event loop keeps serving '''
+    service = app.state.service
+    try:
+        return await asyncio.get_running_loop().run_in_executor(service.executor, score, payload)
+    except BulkRequestError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.get("/health")
+async def health():
+    ''' Served models of this worker, 503 when its model version differs from the one its parent loaded '''
+    description = app.state.service.describe()
+    if description["model_version"] != description["expected_model_version"]:
+        return JSONResponse(status_code=503, content={"status": "model version mismatch", **description})
+    return {"status": "ok", **description}
+
+
+@app.post("/predict")
+async def predict(record: dict = Body(...)):
+    ''' One feature record, scored in a micro-batch with the concurrent requests '''
+    problems = app.state.service.check_record(record)
+    if problems:
+        raise HTTPException(status_code=422, detail=problems)
+    return await app.state.service.predict_record(record)
+
+
+@app.post("/predict/batch")
+async def predict_batch(body: dict | list = Body(...)):
+    ''' A list of feature records, or {"records": [...]}, predictions are returned in request order '''
+    records = body.get("records") if isinstance(body, dict) else body
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise HTTPException(status_code=422, detail="expected a list of feature records")
+    content = await score_bulk(app.state.service.score_records_bulk, records)
+    return Response(content=content, media_type="application/json")
+
+
+@app.post("/predict/csv")
+async def predict_csv(file: UploadFile = File(...)):
+    ''' A csv of feature rows, answered with the prediction csv '''
+    content = await score_bulk(app.state.service.score_csv_bulk, await file.read())
+    return Response(content=content, media_type="text/csv")
+
+
+def main():
+    try:
+        if app_config.workers > 1 and hasattr(os, "fork"):
+            served_model = load_served_model(app_config, PredictionPipelineConfig.from_yaml("config/config.yaml"))
+            shared_bytes = share_model_arrays(served_model.model)
+            logging.info(f"Moved {shared_bytes} bytes of model arrays to shared memory")
+            app.state.served_model = served_model
+            PreforkServer(app, app_config.host, app_config.port, app_config.workers).run()
+        else:
+            uvicorn.run(app, host=app_config.host, port=app_config.port)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import sys
+import argparse
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.pipeline.benchmark_pipeline import BenchmarkPipeline
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(description="Benchmark training and prediction of the candidate models")
+        parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+        args = parser.parse_args()
+
+        benchmark_pipeline = BenchmarkPipeline()
+        regressions = benchmark_pipeline.run_pipeline(save_baseline=args.save_baseline)
+        if regressions:
+            sys.exit(1)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+
+if __name__ == "__main__": 
+    main()
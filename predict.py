@@ -0,0 +1,23 @@
+import sys
+import argparse
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.pipeline.prediction_pipeline import PredictionPipeline
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(description="Score a csv, parquet or feather file with the trained model")
+        parser.add_argument("input_file", help="file of feature rows to score")
+        parser.add_argument("output_file", help="csv the predictions are written to, in input order")
+        parser.add_argument("--model", default=None, help="model file, the configured compiled or pickled model by default")
+        parser.add_argument("--restart", action="store_true", help="discard the progress of an interrupted run")
+        args = parser.parse_args()
+
+        prediction_pipeline = PredictionPipeline(model_file_path=args.model)
+        prediction_pipeline.run_pipeline(args.input_file, args.output_file, resume=not args.restart)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+
+if __name__ == "__main__": 
+    main()
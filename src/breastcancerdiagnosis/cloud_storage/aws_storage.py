@@ -137,6 +137,37 @@ class SimpleStorageService:
         except Exception as e:
             raise AppException(e, sys) from e
 
+    def download_object_if_modified(self, bucket_name: str, key: str, file_path: str, etag: str = None) -> Union[str, None]:
+        """
+        Method Name :   download_object_if_modified
+        Description :   This method streams the key object of bucket_name bucket to file_path unless its ETag is still etag
+
+        Output      :   ETag of the downloaded object, None when the object is not modified and nothing was written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the download_object_if_modified method of S3Operations class")
+
+        try:
+            request = {"Bucket": bucket_name, "Key": key}
+            if etag is not None:
+                request["IfNoneMatch"] = f'"{etag}"'
+            try:
+                response = self.s3_client.get_object(**request)
+            except ClientError as e:
+                if e.response["Error"]["Code"] in ("304", "NotModified"):
+                    logging.info(f"{key} in {bucket_name} bucket not modified since ETag {etag}")
+                    return None
+                raise
+
+            with open(file_path, "wb") as file:
+                for chunk in response["Body"].iter_chunks(chunk_size=1024 * 1024):
+                    file.write(chunk)
+            logging.info("Exited the download_object_if_modified method of S3Operations class")
+            return response["ETag"].strip('"')
+
+        except Exception as e:
+            raise AppException(e, sys) from e
+
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
         """
         Method Name :   create_folder
@@ -1,40 +1,123 @@
 import os
 import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 from breastcancerdiagnosis.entity.config_entity import DataIngestionConfig
 from breastcancerdiagnosis.entity.artifact_entity import DataIngestionArtifact
 from breastcancerdiagnosis.exception.exception_handler import AppException  
-from breastcancerdiagnosis.utils.main_utils import download_file_from_hf
+from breastcancerdiagnosis.utils.main_utils import (download_file_from_hf, get_hf_file_revision, compute_file_sha256, read_yaml_file,
+                                                    write_yaml, get_schema_dtypes, write_dataframe, DataFrameChunkWriter)
+from breastcancerdiagnosis.utils.dataset_cache import DatasetCache
 from breastcancerdiagnosis.logger.log import logging
-from breastcancerdiagnosis.constants import TRAIN_FILE_NAME, TEST_FILE_NAME, RAW_DATA_FILE
+from breastcancerdiagnosis.constants import (TRAIN_FILE_NAME, TEST_FILE_NAME, RAW_DATA_FILE, INGESTION_MANIFEST_FILE,
+                                             ID_COLUMN, TARGET_COLUMN, SCHEMA_FILE_PATH, INGESTED_FILE_EXTENSIONS)
 
 
 class DataIngestion:
     def __init__(self, config: DataIngestionConfig):
-        self.config = config
+        try:
+            self.config = config
+            self._schema_dtypes = get_schema_dtypes(read_yaml_file(SCHEMA_FILE_PATH))
+            file_extension = INGESTED_FILE_EXTENSIONS[self.config.ingested_file_format]
+            ingested_dir = Path(os.path.join(self.config.root_dir, self.config.ingested_data_dir))
+            self.train_file_path = ingested_dir / Path(TRAIN_FILE_NAME).with_suffix(file_extension)
+            self.test_file_path = ingested_dir / Path(TEST_FILE_NAME).with_suffix(file_extension)
+            self.dataset_cache = DatasetCache(cache_dir=self.config.cache_dir,
+                                              max_size_bytes=self.config.cache_max_size_mb * 1024 * 1024)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def fetch_source_data(self, raw_data_file_path: Path) -> str:
+        ''' Places the source file at raw_data_file_path, downloading it only when the cache has no copy of the current revision. Returns its SHA-256 '''
+        try:
+            revision_info = get_hf_file_revision(self.config.source_url)
+            revision = None if revision_info is None else (revision_info["etag"] or revision_info["commit_hash"])
+
+            entry = self.dataset_cache.lookup(self.config.source_url, revision)
+            if entry is None:
+                if revision is None:
+                    if os.path.exists(raw_data_file_path):
+                        logging.info(f"{self.config.source_url} is not reachable, using existing {raw_data_file_path}")
+                        return compute_file_sha256(raw_data_file_path)
+                    raise Exception(f"{self.config.source_url} is not reachable and no cached copy is available")
+                logging.info(f"Downloading data from {self.config.source_url} to {raw_data_file_path.parent}")
+                downloaded_file_path = download_file_from_hf(self.config.source_url, raw_data_file_path.parent,
+                                                             revision=revision_info["commit_hash"])
+                logging.info(f"File downloaded successfully to {downloaded_file_path}")
+                entry = self.dataset_cache.add(self.config.source_url, revision, downloaded_file_path)
+            else:
+                logging.info(f"Using cached copy of {self.config.source_url} at revision {entry['revision']}")
+
+            self.dataset_cache.materialize(entry, raw_data_file_path)
+            return entry["sha256"]
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def is_ingestion_up_to_date(self, source_sha256: str) -> bool:
+        ''' Checks whether the ingested train and test files were produced from the same source file and split ratio '''
+        try:
+            ingested_dir = os.path.join(self.config.root_dir, self.config.ingested_data_dir)
+            manifest_file_path = os.path.join(ingested_dir, INGESTION_MANIFEST_FILE)
+            if not os.path.exists(manifest_file_path):
+                return False
+
+            manifest = read_yaml_file(manifest_file_path) or {}
+            if manifest.get("source_sha256") != source_sha256 or \
+                    manifest.get("train_test_split_ratio") != self.config.train_test_split_ratio or \
+                    manifest.get("split_mode") != self.config.split_mode:
+                return False
+
+            for file_path in [self.train_file_path, self.test_file_path]:
+                if not os.path.exists(file_path) or os.path.getsize(file_path) != manifest.get("file_sizes", {}).get(file_path.name):
+                    return False
+            return True
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def write_ingestion_manifest(self, source_sha256: str) -> None:
+        ''' Records the source hash and split ratio the ingested files were produced from '''
+        try:
+            ingested_dir = os.path.join(self.config.root_dir, self.config.ingested_data_dir)
+            manifest = {
+                "source_url": self.config.source_url,
+                "source_sha256": source_sha256,
+                "train_test_split_ratio": self.config.train_test_split_ratio,
+                "split_mode": self.config.split_mode,
+                "file_sizes": {file_path.name: os.path.getsize(file_path)
+                               for file_path in [self.train_file_path, self.test_file_path]}
+            }
+            write_yaml(file_path=os.path.join(ingested_dir, INGESTION_MANIFEST_FILE), content=manifest, replace=True)
+        except Exception as e:
+            raise AppException(e, sys) from e
 
     def initiate_data_ingestion(self) -> DataIngestionArtifact:
         try:
             feature_store_file_path = Path(os.path.join(self.config.root_dir, self.config.feature_store_dir))
-            logging.info(f"Downloading data from {self.config.source_url} to {feature_store_file_path}")
             os.makedirs(feature_store_file_path, exist_ok=True)
             
-            ''' Downloading the file from Hugging Face '''
-            download_file_from_hf(self.config.source_url, feature_store_file_path)
-            logging.info(f"File downloaded successfully to {feature_store_file_path}")
+            ''' Fetching the file from the dataset cache or Hugging Face '''
+            source_sha256 = self.fetch_source_data(feature_store_file_path / RAW_DATA_FILE)
 
-            df = pd.read_csv(os.path.join(feature_store_file_path, RAW_DATA_FILE))
-            ''' Splitting the data into train and test '''
-            self.split_data_as_train_test(dataframe=df)
+            if self.is_ingestion_up_to_date(source_sha256):
+                logging.info("Source data and split ratio unchanged, reusing ingested train and test files")
+            elif self.config.split_mode == "streaming":
+                ''' Splitting the data into train and test chunk by chunk '''
+                self.split_data_as_train_test_streaming(raw_data_file_path=feature_store_file_path / RAW_DATA_FILE)
+                self.write_ingestion_manifest(source_sha256)
+            else:
+                df = pd.read_csv(os.path.join(feature_store_file_path, RAW_DATA_FILE))
+                ''' Splitting the data into train and test '''
+                self.split_data_as_train_test(dataframe=df)
+                self.write_ingestion_manifest(source_sha256)
 
             ''' Prepare the data ingestion artifact '''
             data_ingestion_artifact = DataIngestionArtifact(
                 feature_store_file_path=feature_store_file_path,
-                train_file_path=Path(os.path.join(self.config.root_dir, self.config.ingested_data_dir, TRAIN_FILE_NAME)),
-                test_file_path=Path(os.path.join(self.config.root_dir, self.config.ingested_data_dir, TEST_FILE_NAME))
+                train_file_path=self.train_file_path,
+                test_file_path=self.test_file_path
             )
             logging.info(f"Data Ingestion artifact: {data_ingestion_artifact}")
 
@@ -47,20 +130,54 @@ class DataIngestion:
         try:
             train_set, test_set = train_test_split(dataframe, test_size=self.config.train_test_split_ratio, random_state=42)
 
-            os.makedirs(os.path.join(self.config.root_dir, self.config.ingested_data_dir), exist_ok=True)
-
-            train_file_path = os.path.join(self.config.root_dir, self.config.ingested_data_dir, TRAIN_FILE_NAME)
-            test_file_path = os.path.join(self.config.root_dir, self.config.ingested_data_dir, TEST_FILE_NAME)
-
-            logging.info(f"Exporting training dataset to file: {train_file_path}")
-            train_set.to_csv(train_file_path, index=False, header=True)
-            logging.info(f"Exporting testing dataset to file: {test_file_path}")
-            test_set.to_csv(test_file_path, index=False, header=True)
+            logging.info(f"Exporting training dataset to file: {self.train_file_path}")
+            write_dataframe(train_set, self.train_file_path, dtypes=self._schema_dtypes)
+            logging.info(f"Exporting testing dataset to file: {self.test_file_path}")
+            write_dataframe(test_set, self.test_file_path, dtypes=self._schema_dtypes)
 
             logging.info("Ingestion of data is completed.")
 
             return train_set, test_set
         except Exception as e:
             raise AppException(e, sys) from e
-    
-    
\ No newline at end of file
+
+    def assign_test_rows(self, dataframe: DataFrame, seen_counts: dict) -> np.ndarray:
+        ''' Deterministically marks rows for the test set, stratified by diagnosis class.
+        Rows of a class are taken in the order of the hash of their id, and a row goes to the test set when the
+        test rows of its class so far are fewer than train_test_split_ratio times the rows of the class seen so far.
+        seen_counts holds those running counts per class and is updated, so that consecutive chunks share it '''
+        try:
+            id_hash = pd.util.hash_pandas_object(dataframe[ID_COLUMN], index=False).to_numpy()
+            ratio = int(round(self.config.train_test_split_ratio * 1_000_000))
+            is_test = np.zeros(len(dataframe), dtype=bool)
+            for label, positions in dataframe.groupby(TARGET_COLUMN, dropna=False, sort=False).indices.items():
+                class_key = str(label)
+                positions = positions[np.argsort(id_hash[positions], kind="stable")]
+                seen = seen_counts.get(class_key, 0) + np.arange(len(positions) + 1)
+                # test rows after seen rows of the class are ceil(ratio * seen), a row is a test row where that count grows
+                test_counts = -(-(seen * ratio) // 1_000_000)
+                is_test[positions] = np.diff(test_counts) > 0
+                seen_counts[class_key] = int(seen[-1])
+            return is_test
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def split_data_as_train_test_streaming(self, raw_data_file_path: Path) -> None:
+        ''' Splitting the raw file into train and test set chunk by chunk, appending each chunk to the ingested files '''
+        try:
+            logging.info(f"Streaming {raw_data_file_path} into {self.train_file_path} and {self.test_file_path} "
+                         f"in chunks of {self.config.chunk_size} rows")
+            train_rows, test_rows = 0, 0
+            seen_counts = {}
+            with DataFrameChunkWriter(self.train_file_path, dtypes=self._schema_dtypes) as train_writer, \
+                    DataFrameChunkWriter(self.test_file_path, dtypes=self._schema_dtypes) as test_writer:
+                for chunk in pd.read_csv(raw_data_file_path, chunksize=self.config.chunk_size):
+                    is_test = self.assign_test_rows(chunk, seen_counts)
+                    train_writer.write(chunk[~is_test])
+                    test_writer.write(chunk[is_test])
+                    train_rows += int((~is_test).sum())
+                    test_rows += int(is_test.sum())
+
+            logging.info(f"Ingestion of data is completed. {train_rows} training rows, {test_rows} testing rows")
+        except Exception as e:
+            raise AppException(e, sys) from e
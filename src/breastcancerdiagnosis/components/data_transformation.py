@@ -3,81 +3,92 @@ import sys
 import pandas as pd
 from pandas import DataFrame
 import numpy as np      
-from scipy.stats import f_oneway
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import PowerTransformer, StandardScaler
-from sklearn.compose import ColumnTransformer
-from imblearn.combine import SMOTEENN
 from pathlib import Path    
 
 from breastcancerdiagnosis.exception.exception_handler import AppException
 from breastcancerdiagnosis.logger.log import logging
 from breastcancerdiagnosis.entity.config_entity import DataTransformationConfig
 from breastcancerdiagnosis.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact
-from breastcancerdiagnosis.utils.main_utils import read_yaml_file, save_numpy_array_data, save_object
-from breastcancerdiagnosis.constants import SCHEMA_FILE_PATH, TARGET_COLUMN, TRANSFORMED_TRAIN_FILE_NAME, TRANSFORMED_TEST_FILE_NAME
+from breastcancerdiagnosis.entity.transformer import YeoJohnsonScaler
+from breastcancerdiagnosis.utils.main_utils import read_yaml_file, save_numpy_array_data, save_object, read_dataframe, get_schema_dtypes, \
+    iter_dataframe_chunks, create_numpy_array_file
+from breastcancerdiagnosis.utils.artifact_cache import ArtifactCache
+from breastcancerdiagnosis.utils.feature_selection import FeatureSelector, GroupedMoments, continuous_features
+from breastcancerdiagnosis.utils.profile_utils import ReservoirSample
+from breastcancerdiagnosis.utils.resampling import get_resampler
+from breastcancerdiagnosis.constants import SCHEMA_FILE_PATH, TARGET_COLUMN, TRANSFORMED_TRAIN_FILE_NAME, TRANSFORMED_TEST_FILE_NAME, \
+    TRANSFORMED_TRAIN_FEATURES_FILE_NAME, TRANSFORMED_TRAIN_TARGET_FILE_NAME, TRANSFORMED_TEST_FEATURES_FILE_NAME, \
+    TRANSFORMED_TEST_TARGET_FILE_NAME
 
 class DataTransformation:
     def __init__(self, data_transformation_config: DataTransformationConfig,
                  data_validation_artifact: DataValidationArtifact,
-                 data_ingestion_artifact: DataIngestionArtifact):
+                 data_ingestion_artifact: DataIngestionArtifact,
+                 artifact_cache: ArtifactCache = None):
         try:
             self.data_transformation_config = data_transformation_config
+            self.artifact_cache = artifact_cache
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_artifact = data_validation_artifact
             self._schema = read_yaml_file(SCHEMA_FILE_PATH)
         except Exception as e:
             raise AppException(e, sys) from e
         
-    @staticmethod
-    def read_data(file_path: str) -> DataFrame:
+    def read_data(self, file_path: str, columns: list = None) -> DataFrame:
         try:    
-            return pd.read_csv(file_path)
+            if self.artifact_cache is not None:
+                return self.artifact_cache.read_dataframe(file_path, columns=columns, dtypes=get_schema_dtypes(self._schema))
+            return read_dataframe(file_path, columns=columns, dtypes=get_schema_dtypes(self._schema))
         except Exception as e:
             raise AppException(e, sys) from e
 
-    def get_data_transformer_object(self, transform_columns: list) -> Pipeline:
+    def read_data_chunks(self, file_path: str, columns: list = None):
         try:
-            # Create the ColumnTransformer with appropriate transformations
-  
-            num_features = transform_columns
-            
-            numeric_transformer = StandardScaler() 
-                      
-            # intialize power transformer
-            transform_pipe = Pipeline(steps=[("transformer", PowerTransformer(method = "yeo-johnson"))])
-
-            preprocessor = ColumnTransformer(
-                 [
-                      ("Transformer", transform_pipe, num_features),
-                      ("Standard_scaler", numeric_transformer, num_features)
-                 ]
-            )
+            return iter_dataframe_chunks(file_path, chunk_size=self.data_transformation_config.chunk_size,
+                                         columns=columns, dtypes=get_schema_dtypes(self._schema))
+        except Exception as e:
+            raise AppException(e, sys) from e
 
-            # Add more preprocessing steps as needed
+    def get_data_transformer_object(self, transform_columns: list) -> YeoJohnsonScaler:
+        try:
+            # Yeo-Johnson transform and standardization fused into one pass over the selected columns.
+            # dual_branch mode also outputs the standardized raw columns, matching the former
+            # PowerTransformer + StandardScaler ColumnTransformer layout
+            preprocessor = YeoJohnsonScaler(
+                columns=transform_columns,
+                include_standardized_input=self.data_transformation_config.preprocessor_mode == "dual_branch"
+            )
 
-            return preprocessor  # Replace with actual transformer object
+            return preprocessor
         except Exception as e:
             raise AppException(e, sys) from e   
 
     def run_anova_test(self, df: DataFrame, target_column: str):
         try:
+            return self.select_features(df=df, target_column=target_column, method="anova")
+        except Exception as e:
+            raise AppException(e, sys) from e
 
-            numerical_features = self._schema['numerical_columns']
-            continuous_features = [feature for feature in numerical_features if len(df[feature].unique()) > 25]
-
-            features = df.drop(columns=[target_column])
-            target = df[target_column]
-            significant_features = []
-            not_significant_features = []
+    def get_feature_selector(self, method: str = None) -> FeatureSelector:
+        try:
+            return FeatureSelector(
+                method=method or self.data_transformation_config.feature_selection_method,
+                significance_level=self.data_transformation_config.significance_level,
+                mutual_info_threshold=self.data_transformation_config.mutual_info_threshold,
+                cache_file_path=Path(os.path.join(self.data_transformation_config.root_dir,
+                                                  self.data_transformation_config.feature_selection_cache_file))
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
 
-            for column in continuous_features:
-                groups = [features[column][target == cls] for cls in target.unique()]
-                f_stat, p_value = f_oneway(*groups)
-                if p_value < 0.05:  # significance level
-                    significant_features.append(column)
-                else:
-                    not_significant_features.append(column) 
+    def select_features(self, df: DataFrame, target_column: str, method: str = None):
+        ''' Scores all continuous features at once and splits them into significant and not significant ones '''
+        try:
+            numerical_features = [feature for feature in self._schema['numerical_columns']
+                                  if feature not in self._schema['drop_columns'] and feature in df.columns]
+            feature_selector = self.get_feature_selector(method)
+            features = df[continuous_features(df, numerical_features)]
+            significant_features, not_significant_features = feature_selector.select(features, df[target_column])
 
             logging.info("{} not significant features: {}".format(len(not_significant_features), not_significant_features))
             logging.info("{} significant features: {}".format(len(significant_features), significant_features)) 
@@ -86,15 +97,181 @@ class DataTransformation:
         except Exception as e:
             raise AppException(e, sys) from e
         
+    def resample(self, split: str, features: np.ndarray, target: pd.Series) -> tuple:
+        ''' Resamples a split with the configured resampler, splits not listed in resampling_splits are returned unchanged '''
+        try:
+            config = self.data_transformation_config
+            if split not in config.resampling_splits:
+                return features, target
+            index_cache_dir = None if not config.neighbors_index_dir else Path(os.path.join(config.root_dir, config.neighbors_index_dir))
+            resampler = get_resampler(method=config.resampling_method, neighbors_algorithm=config.neighbors_algorithm,
+                                      n_jobs=config.resampling_n_jobs, random_state=config.resampling_random_state,
+                                      index_cache_dir=index_cache_dir)
+            if resampler is None:
+                return features, target
+            features, target = resampler.fit_resample(features, target)
+            logging.info(f"Applied {config.resampling_method} resampling with {config.neighbors_algorithm} neighbours "
+                         f"to the {split} split, {len(target)} rows")
+            return features, target
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def encode_target(self, target: pd.Series) -> np.ndarray:
+        try:
+            return target.replace(self._schema['target_mapping']).to_numpy(dtype=np.float64)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def scan_training_data(self, file_path: str) -> tuple:
+        ''' Single pass over the training data collecting per class moments for ANOVA and a reservoir sample of rows '''
+        try:
+            numerical_features = [feature for feature in self._schema['numerical_columns']
+                                  if feature not in self._schema['drop_columns']]
+            classes = np.unique(list(self._schema['target_mapping'].values()))
+            moments = GroupedMoments(len(numerical_features), len(classes))
+            reservoir = ReservoirSample(len(numerical_features) + 1, size=self.data_transformation_config.reservoir_size)
+            for chunk in self.read_data_chunks(file_path, columns=numerical_features + [TARGET_COLUMN]):
+                values = chunk[numerical_features].to_numpy(dtype=np.float64)
+                target = self.encode_target(chunk[TARGET_COLUMN])
+                moments.update(values, np.searchsorted(classes, target))
+                reservoir.update(np.c_[values, target])
+
+            sample = DataFrame(reservoir.sample, columns=numerical_features + [TARGET_COLUMN])
+            logging.info(f"Scanned {reservoir.n_seen} training rows, kept a sample of {len(sample)} rows")
+            return moments, sample, reservoir.n_seen
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def select_features_streaming(self, moments: GroupedMoments, sample: DataFrame) -> tuple:
+        ''' ANOVA uses the exact moments of the whole training data, the other scorers use the sample '''
+        try:
+            numerical_features = [feature for feature in sample.columns if feature != TARGET_COLUMN]
+            features = continuous_features(sample, numerical_features)
+            feature_selector = self.get_feature_selector()
+            if feature_selector.method == "anova":
+                f_statistics, p_values = moments.f_oneway()
+                positions = [numerical_features.index(feature) for feature in features]
+                significant_features, not_significant_features = feature_selector.split_features(
+                    features, f_statistics[positions], p_values[positions]
+                )
+            else:
+                significant_features, not_significant_features = feature_selector.select(sample[features], sample[TARGET_COLUMN])
+
+            logging.info("{} not significant features: {}".format(len(not_significant_features), not_significant_features))
+            logging.info("{} significant features: {}".format(len(significant_features), significant_features))
+            return significant_features, not_significant_features
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def transform_to_file(self, preprocessor: YeoJohnsonScaler, file_path: str, features_file_path: Path,
+                          target_file_path: Path = None) -> None:
+        ''' Transforms a data file chunk by chunk into memory mapped arrays, features and target share one file without target_file_path '''
+        try:
+            n_rows = sum(len(chunk) for chunk in self.read_data_chunks(file_path, columns=[TARGET_COLUMN]))
+            n_features = len(preprocessor.get_feature_names_out())
+            dtype = np.dtype(self.data_transformation_config.array_dtype)
+            if target_file_path is None:
+                features = create_numpy_array_file(features_file_path, shape=(n_rows, n_features + 1), dtype=dtype)
+                target = features[:, -1]
+            else:
+                features = create_numpy_array_file(features_file_path, shape=(n_rows, n_features), dtype=dtype)
+                target = create_numpy_array_file(target_file_path, shape=(n_rows,), dtype=np.int32)
+            offset = 0
+            for chunk in self.read_data_chunks(file_path, columns=list(preprocessor.columns) + [TARGET_COLUMN]):
+                features[offset:offset + len(chunk), :n_features] = preprocessor.transform(chunk)
+                target[offset:offset + len(chunk)] = self.encode_target(chunk[TARGET_COLUMN])
+                offset += len(chunk)
+            features.flush()
+            target.flush()
+            del features, target
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def save_transformed_data(self, features: np.ndarray, target: np.ndarray, features_file_path: Path,
+                              target_file_path: Path = None) -> None:
+        ''' Saves a transformed split, features and target share one file without target_file_path '''
+        try:
+            dtype = np.dtype(self.data_transformation_config.array_dtype)
+            if target_file_path is None:
+                array = np.c_[features, np.array(target)]
+                save_numpy_array_data(features_file_path, array=array, dtype=dtype)
+                if self.artifact_cache is not None:
+                    self.artifact_cache.put(features_file_path, np.asarray(array, dtype=dtype))
+                return
+            save_numpy_array_data(features_file_path, array=features, dtype=dtype)
+            save_numpy_array_data(target_file_path, array=target, dtype=np.int32)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def get_transformed_file_paths(self) -> tuple:
+        ''' Train and test feature file paths, train and test target file paths (None for the combined layout) and the preprocessor path '''
+        try:
+            transformed_dir = os.path.join(self.data_transformation_config.root_dir, self.data_transformation_config.transformed_data_dir)
+            preprocessor_object_path = Path(os.path.join(transformed_dir, self.data_transformation_config.preprocessor_object_file))
+            if self.data_transformation_config.array_layout == "combined":
+                return (Path(os.path.join(transformed_dir, TRANSFORMED_TRAIN_FILE_NAME)),
+                        Path(os.path.join(transformed_dir, TRANSFORMED_TEST_FILE_NAME)),
+                        None, None, preprocessor_object_path)
+            return (Path(os.path.join(transformed_dir, TRANSFORMED_TRAIN_FEATURES_FILE_NAME)),
+                    Path(os.path.join(transformed_dir, TRANSFORMED_TEST_FEATURES_FILE_NAME)),
+                    Path(os.path.join(transformed_dir, TRANSFORMED_TRAIN_TARGET_FILE_NAME)),
+                    Path(os.path.join(transformed_dir, TRANSFORMED_TEST_TARGET_FILE_NAME)),
+                    preprocessor_object_path)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def initiate_streaming_data_transformation(self) -> DataTransformationArtifact:
+        ''' Out of core variant of the transformation, the training data is never loaded in memory as a whole '''
+        try:
+            logging.info("Starting streaming data transformation")
+            train_file_path = self.data_ingestion_artifact.train_file_path
+            moments, sample, _ = self.scan_training_data(train_file_path)
+            transform_columns, not_significant_features = self.select_features_streaming(moments, sample)
+            logging.info(f"Columns to be transformed: {transform_columns}")
+            logging.info(f"Columns to be dropped: {not_significant_features}")
+
+            # lambdas are estimated on the sample, the scaling statistics on every training row
+            preprocessor = self.get_data_transformer_object(transform_columns=transform_columns)
+            preprocessor.fit_lambdas(sample[transform_columns])
+            for chunk in self.read_data_chunks(train_file_path, columns=transform_columns):
+                preprocessor.partial_fit(chunk)
+
+            # resampling needs every row in memory, so it is not applied in streaming mode
+            logging.info("Skipped resampling in streaming mode")
+
+            transformed_train_path, transformed_test_path, train_target_path, test_target_path, preprocessor_object_path = \
+                self.get_transformed_file_paths()
+            self.transform_to_file(preprocessor, train_file_path, transformed_train_path, train_target_path)
+            self.transform_to_file(preprocessor, self.data_ingestion_artifact.test_file_path, transformed_test_path, test_target_path)
+            logging.info("Saved transformed training and testing arrays")
+            save_object(preprocessor_object_path, obj=preprocessor)
+            logging.info("Saved preprocessor object")
+
+            data_transformation_artifact = DataTransformationArtifact(
+                transformed_train_file_path=transformed_train_path,
+                transformed_test_file_path=transformed_test_path,
+                preprocessor_object_path=preprocessor_object_path,
+                transformed_train_target_file_path=train_target_path,
+                transformed_test_target_file_path=test_target_path
+            )
+            logging.info("Data transformation completed")
+            return data_transformation_artifact
+        except Exception as e:
+            raise AppException(e, sys) from e
+
     def initiate_data_transformation(self) -> DataTransformationArtifact:
         try:
+            if self.data_transformation_config.fit_mode == "streaming":
+                return self.initiate_streaming_data_transformation()
+
             logging.info("Starting data transformation")
 
-            # Reading training and testing data
-            train_df = self.read_data(self.data_ingestion_artifact.train_file_path)
-            test_df = self.read_data(self.data_ingestion_artifact.test_file_path)
+            # Reading training and testing data, only the feature and target columns are loaded
+            columns = [column for column in self._schema['columns'] if column not in self._schema['drop_columns']]
+            train_df = self.read_data(self.data_ingestion_artifact.train_file_path, columns=columns)
+            test_df = self.read_data(self.data_ingestion_artifact.test_file_path, columns=columns)
 
-            significant_features, not_significant_features = self.run_anova_test(
+            significant_features, not_significant_features = self.select_features(
                 df=train_df, target_column=TARGET_COLUMN
             )
             transform_columns = significant_features
@@ -124,41 +301,33 @@ class DataTransformation:
             # Transforming the testing data
             input_feature_test_arr = preprocessor.transform(input_feature_test_df)
 
-            # applying smoteenn to handle class imbalance 
-        
-            smt = SMOTEENN(sampling_strategy = "minority")
-            input_feature_train_final, target_feature_train_final = smt.fit_resample(
-                input_feature_train_arr, target_feature_train_df
+            # resampling to handle class imbalance, by default only the training split is resampled
+            input_feature_train_final, target_feature_train_final = self.resample(
+                "train", input_feature_train_arr, target_feature_train_df
             )
-            input_feature_test_final, target_feature_test_final = smt.fit_resample(
-                input_feature_test_arr, target_feature_test_df
+            input_feature_test_final, target_feature_test_final = self.resample(
+                "test", input_feature_test_arr, target_feature_test_df
             )
 
-            logging.info("Applied SMOTEENN to handle class imbalance")
-            
-            # Combining transformed features with target variable
-            train_arr =  np.c_[input_feature_train_final, np.array(target_feature_train_final)]
-            test_arr =  np.c_[input_feature_test_final, np.array(target_feature_test_final)]
+            transformed_train_path, transformed_test_path, train_target_path, test_target_path, preprocessor_object_path = \
+                self.get_transformed_file_paths()
+            # Saving the transformed data, split layout arrays are memory mapped by the trainer and not cached
+            self.save_transformed_data(input_feature_train_final, target_feature_train_final, transformed_train_path, train_target_path)
+            self.save_transformed_data(input_feature_test_final, target_feature_test_final, transformed_test_path, test_target_path)
             logging.info("Saved transformed training and testing arrays")
-
-            transformed_train_path = Path(os.path.join(self.data_transformation_config.root_dir, self.data_transformation_config.transformed_data_dir,
-                                                     TRANSFORMED_TRAIN_FILE_NAME))
-            transformed_test_path = Path(os.path.join(self.data_transformation_config.root_dir, self.data_transformation_config.transformed_data_dir,
-                                                     TRANSFORMED_TEST_FILE_NAME))
-            preprocessor_object_path = Path(os.path.join(self.data_transformation_config.root_dir, self.data_transformation_config.transformed_data_dir,
-                                                       self.data_transformation_config.preprocessor_object_file))   
-            # Saving the transformed data
-            save_numpy_array_data(transformed_train_path, array=train_arr)
-            save_numpy_array_data(transformed_test_path, array=test_arr)
             # Saving the preprocessor object
             save_object(preprocessor_object_path, obj=preprocessor)
+            if self.artifact_cache is not None:
+                self.artifact_cache.put(preprocessor_object_path, preprocessor)
 
             logging.info("Saved preprocessor object")
             # Creating and returning the data transformation artifact
             data_transformation_artifact = DataTransformationArtifact(
                 transformed_train_file_path=transformed_train_path,
                 transformed_test_file_path=transformed_test_path,
-                preprocessor_object_path=preprocessor_object_path
+                preprocessor_object_path=preprocessor_object_path,
+                transformed_train_target_file_path=train_target_path,
+                transformed_test_target_file_path=test_target_path
             )
             logging.info("Data transformation completed")
             return data_transformation_artifact
@@ -2,58 +2,65 @@ import os
 import sys
 import pandas as pd
 from pandas import DataFrame
-from scipy.stats import ks_2samp
 from pathlib import Path
 from breastcancerdiagnosis.exception.exception_handler import AppException
 from breastcancerdiagnosis.logger.log import logging
 from breastcancerdiagnosis.entity.config_entity import DataValidationConfig
 from breastcancerdiagnosis.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
-from breastcancerdiagnosis.utils.main_utils import read_yaml_file, write_yaml
+from breastcancerdiagnosis.utils.main_utils import read_yaml_file, write_yaml, read_dataframe, iter_dataframe_chunks, get_schema_dtypes
+from breastcancerdiagnosis.utils.drift_utils import encode_drift_matrices, compute_drift_statistics
+from breastcancerdiagnosis.utils.profile_utils import ReferenceProfile
+from breastcancerdiagnosis.utils.schema_validator import SchemaValidator
+from breastcancerdiagnosis.utils.artifact_cache import ArtifactCache
 from breastcancerdiagnosis.constants import SCHEMA_FILE_PATH 
 
 class DataValidation:
     def __init__(self, data_validation_config: DataValidationConfig,
-                 data_ingestion_artifact: DataIngestionArtifact):
+                 data_ingestion_artifact: DataIngestionArtifact,
+                 artifact_cache: ArtifactCache = None):
         try:
             self.data_validation_config = data_validation_config
             self.data_ingestion_artifact = data_ingestion_artifact
+            self.artifact_cache = artifact_cache
             self._schema = read_yaml_file(SCHEMA_FILE_PATH)
         except Exception as e:
             raise AppException(e, sys)
         
-    def validate_number_of_columns(self, dataframe: DataFrame) -> bool:
-        '''Validates if the dataframe has the expected number of columns as per schema.'''
+    def read_data(self, file_path: str, columns: list = None) -> DataFrame:
+        '''Reads a csv, parquet or feather file and returns a DataFrame, optionally only the given columns.'''
         try:
-            number_of_columns = len(self._schema['columns'])
-            if len(dataframe.columns) == number_of_columns:
-                return True
-            return False
+            if self.artifact_cache is not None:
+                return self.artifact_cache.read_dataframe(file_path, columns=columns, dtypes=get_schema_dtypes(self._schema))
+            return read_dataframe(file_path, columns=columns, dtypes=get_schema_dtypes(self._schema))
         except Exception as e:
             raise AppException(e, sys)
-        
-    def is_column_exist(self, dataframe: DataFrame) -> bool:
-        '''Validates if all required columns exist in the dataframe as per schema.'''
+
+    def read_data_chunks(self, file_path: str):
+        '''Reads a csv, parquet or feather file as DataFrames of at most chunk_size rows.'''
         try:
-            schema_columns = self._schema['columns'].keys()
-            for column in schema_columns:
-                if column not in dataframe.columns:
-                    return False
-            return True
+            return iter_dataframe_chunks(file_path, chunk_size=self.data_validation_config.chunk_size,
+                                         dtypes=get_schema_dtypes(self._schema))
         except Exception as e:
             raise AppException(e, sys)
-        
-    @staticmethod
-    def read_data(file_path: str) -> DataFrame:
-        '''Reads a CSV file and returns a DataFrame.'''
+
+    def detect_data_drift_from_profile(self, reference_profile: ReferenceProfile,
+                                       current_profile: ReferenceProfile,
+                                       threshold: float = 0.05) -> bool:
+        '''Detects data drift between two profiles without loading the underlying data.'''
         try:
-            return pd.read_csv(file_path)
+            drift_report, drift_detected = reference_profile.compare(current_profile, threshold=threshold)
+
+            drift_report_file_path = os.path.join(self.data_validation_config.root_dir, self.data_validation_config.report_file_path)
+            write_yaml(file_path=drift_report_file_path, content=drift_report, replace=True)
+
+            return drift_detected
         except Exception as e:
             raise AppException(e, sys)
         
     def detect_data_drift(self, base_dataframe: DataFrame,
                         current_dataframe: DataFrame,
                         threshold: float = 0.05) -> bool:
-        '''Detects data drift between base and current dataframe using KS test.'''
+        '''Detects data drift between base and current dataframe using KS test, computed for all columns at once.'''
         try:
             '''Assumes both dataframes have the same columns. Prepares a drift report in yaml format. Returns True if drift is detected in any column.'''
             drift_report = {}
@@ -64,15 +71,19 @@ class DataValidation:
         
             current_dataframe = current_dataframe.drop(columns=drop_columns, errors='ignore')
 
-            for column in base_dataframe.columns:
-                base_data = base_dataframe[column]
-                current_data = current_dataframe[column]
-                ks_statistic, p_value = ks_2samp(base_data, current_data)
-                if p_value < threshold:
-                    drift_report[column] = {"p_value": float(p_value), "drift_detected": True}
-                    drift_detected = True
-                else:
-                    drift_report[column] = {"p_value": float(p_value), "drift_detected": False}
+            base_matrix, current_matrix, columns = encode_drift_matrices(base_dataframe, current_dataframe)
+            drift_statistics = compute_drift_statistics(base_matrix, current_matrix,
+                                                        metrics=self.data_validation_config.drift_metrics,
+                                                        psi_bins=self.data_validation_config.psi_bins,
+                                                        n_jobs=self.data_validation_config.drift_n_jobs)
+
+            for position, column in enumerate(columns):
+                p_value = float(drift_statistics["p_value"][position])
+                drift_report[column] = {"p_value": p_value, "drift_detected": bool(p_value < threshold)}
+                for metric in ("psi", "wasserstein"):
+                    if metric in drift_statistics:
+                        drift_report[column][metric] = float(drift_statistics[metric][position])
+                drift_detected = drift_detected or p_value < threshold
             # Save drift report to file
             drift_report_file_path = os.path.join(self.data_validation_config.root_dir, self.data_validation_config.report_file_path)
             write_yaml(file_path=drift_report_file_path, content=drift_report, replace=True)
@@ -82,34 +93,89 @@ class DataValidation:
         except Exception as e:
             raise AppException(e, sys)
         
+    def schema_problems(self, report: dict, label: str) -> str:
+        '''Schema check failures of a SchemaValidator report as a validation message, empty when the file passed.'''
+        problems = ""
+        if report["n_columns"] != len(self._schema['columns']):
+            problems += f"{label} data does not have the expected number of columns. "
+        if report["missing_columns"]:
+            problems += f"{label} data is missing required columns. "
+        failed_columns = [column for column, column_report in report["columns"].items()
+                          if column_report["present"] and not column_report["valid"]]
+        if failed_columns:
+            problems += f"{label} data failed schema checks for columns: {failed_columns}. "
+        return problems
+
+    def validate_batch(self, file_path: str) -> DataValidationArtifact:
+        '''Checks a new data file against the schema and for drift from the reference profile saved by a profile mode run, in one scan.'''
+        try:
+            reference_profile_file_path = os.path.join(self.data_validation_config.root_dir,
+                                                       self.data_validation_config.reference_profile_file)
+            if not os.path.exists(reference_profile_file_path):
+                raise FileNotFoundError(f"No reference profile at {reference_profile_file_path}, "
+                                        f"run the training pipeline with drift_mode: profile first")
+            reference_profile = ReferenceProfile.load(reference_profile_file_path)
+            logging.info(f"Validating {file_path} against the reference profile {reference_profile_file_path}")
+
+            schema_validator = SchemaValidator(self._schema, chunk_size=self.data_validation_config.chunk_size,
+                                               profile_centroids=reference_profile.sketch.max_centroids)
+            schema_report, batch_profile = schema_validator.validate_file(file_path)
+            write_yaml(file_path=os.path.join(self.data_validation_config.root_dir, self.data_validation_config.batch_schema_report_file),
+                       content=schema_report, replace=True)
+            validation_message = self.schema_problems(schema_report, "Batch")
+            validation_status = not validation_message
+
+            drift_report, drift_detected = reference_profile.compare(batch_profile, threshold=self.data_validation_config.drift_threshold)
+            write_yaml(file_path=os.path.join(self.data_validation_config.root_dir, self.data_validation_config.batch_report_file),
+                       content=drift_report, replace=True)
+            if drift_detected:
+                validation_message += "Data drift detected between the reference profile and the batch. "
+                validation_status = False
+            else:
+                validation_message += "No data drift detected between the reference profile and the batch. "
+
+            logging.info(f"Batch validation of {file_path} completed: {validation_message}")
+            return DataValidationArtifact(validation_status=validation_status, validation_message=validation_message)
+        except Exception as e:
+            raise AppException(e, sys)
+
     def initiate_data_validation(self) -> DataValidationArtifact:
         '''Main method to initiate data validation process.'''
         try:
             logging.info("Starting data validation process")
             validation_status = True
             validation_message = ""
-            # Read training and testing data
-            train_dataframe = self.read_data(self.data_ingestion_artifact.train_file_path)
-            test_dataframe = self.read_data(self.data_ingestion_artifact.test_file_path)
+            profile_mode = self.data_validation_config.drift_mode == "profile"
 
-            # Validate number of columns
-            if not self.validate_number_of_columns(train_dataframe):
-                validation_status = False
-                validation_message += "Training data does not have the expected number of columns. "
-            if not self.validate_number_of_columns(test_dataframe):
-                validation_status = False
-                validation_message += "Testing data does not have the expected number of columns. "
+            # Validate both files against the schema in one scan each, building the drift profiles on the way in profile mode
+            schema_validator = SchemaValidator(self._schema, chunk_size=self.data_validation_config.chunk_size,
+                                               profile_centroids=self.data_validation_config.profile_centroids if profile_mode else None)
+            validation_results = schema_validator.validate_files(
+                {"train": self.data_ingestion_artifact.train_file_path, "test": self.data_ingestion_artifact.test_file_path},
+                n_jobs=self.data_validation_config.validation_n_jobs,
+                executor=self.data_validation_config.validation_executor
+            )
+            schema_report = {name: report for name, (report, _) in validation_results.items()}
+            write_yaml(file_path=os.path.join(self.data_validation_config.root_dir, self.data_validation_config.schema_report_file),
+                       content=schema_report, replace=True)
 
-            # Validate required columns exist
-            if not self.is_column_exist(train_dataframe):
-                validation_status = False
-                validation_message += "Training data is missing required columns"
-            if not self.is_column_exist(test_dataframe):
-                validation_status = False
-                validation_message += "Testing data is missing required columns" 
+            for name, label in (("train", "Training"), ("test", "Testing")):
+                problems = self.schema_problems(schema_report[name], label)
+                if problems:
+                    validation_status = False
+                    validation_message += problems
 
             # Detect data drift
-            drift_detected = self.detect_data_drift(train_dataframe, test_dataframe, self.data_validation_config.drift_threshold)
+            if profile_mode:
+                reference_profile, current_profile = validation_results["train"][1], validation_results["test"][1]
+                reference_profile.save(os.path.join(self.data_validation_config.root_dir,
+                                                    self.data_validation_config.reference_profile_file))
+                drift_detected = self.detect_data_drift_from_profile(reference_profile, current_profile,
+                                                                     self.data_validation_config.drift_threshold)
+            else:
+                train_dataframe = self.read_data(self.data_ingestion_artifact.train_file_path)
+                test_dataframe = self.read_data(self.data_ingestion_artifact.test_file_path)
+                drift_detected = self.detect_data_drift(train_dataframe, test_dataframe, self.data_validation_config.drift_threshold)
             print(f"Drift detected: {drift_detected}")
             if drift_detected:
                 validation_message += "Data drift detected between training and testing data. "
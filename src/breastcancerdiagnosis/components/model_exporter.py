@@ -0,0 +1,61 @@
+import os
+import sys
+from pathlib import Path
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.entity.config_entity import ModelExportConfig
+from breastcancerdiagnosis.entity.artifact_entity import DataIngestionArtifact, ModelTrainerArtifact, ModelExportArtifact
+from breastcancerdiagnosis.entity.compiled_model import CompiledModel
+from breastcancerdiagnosis.utils.main_utils import load_object, read_yaml_file, read_dataframe, get_schema_dtypes
+from breastcancerdiagnosis.utils.model_compiler import (compile_model, save_compiled_model, verify_compiled_model,
+                                                        UnsupportedModelError)
+from breastcancerdiagnosis.constants import SCHEMA_FILE_PATH
+
+
+class ModelExporter:
+    def __init__(self, model_export_config: ModelExportConfig,
+                 model_trainer_artifact: ModelTrainerArtifact,
+                 data_ingestion_artifact: DataIngestionArtifact):
+        try:
+            self.model_export_config = model_export_config
+            self.model_trainer_artifact = model_trainer_artifact
+            self.data_ingestion_artifact = data_ingestion_artifact
+            self._schema = read_yaml_file(SCHEMA_FILE_PATH)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def initiate_model_export(self) -> ModelExportArtifact:
+        ''' Compiles the trained model into a numpy only artifact and verifies it against the pickled model on the test split '''
+        try:
+            prepare_model = load_object(self.model_trainer_artifact.trained_model_path)
+            try:
+                arrays = compile_model(prepare_model)
+            except UnsupportedModelError as e:
+                # serving keeps using the pickled model, any other failure of the compiler is a bug and propagates
+                logging.warning(f"{prepare_model} can not be compiled, no compiled model exported: {e}")
+                return ModelExportArtifact(compiled_model_path=None, is_verified=False, prediction_mismatches=0,
+                                           max_probability_difference=float("nan"))
+
+            compiled_model_path = Path(os.path.join(self.model_export_config.root_dir, self.model_export_config.compiled_model_file))
+            save_compiled_model(compiled_model_path, arrays)
+
+            holdout_df = read_dataframe(self.data_ingestion_artifact.test_file_path, dtypes=get_schema_dtypes(self._schema))
+            report = verify_compiled_model(prepare_model, CompiledModel.load(compiled_model_path), holdout_df,
+                                           atol=self.model_export_config.verification_atol)
+            logging.info(f"Compiled model verification on {report['rows']} test rows: "
+                         f"{report['prediction_mismatches']} differing predictions, "
+                         f"largest probability difference {report['max_probability_difference']}")
+            if not report["verified"]:
+                os.remove(compiled_model_path)
+                logging.error(f"Compiled model does not reproduce {prepare_model}, removed {compiled_model_path}")
+            else:
+                logging.info(f"Compiled model saved at: {compiled_model_path}")
+
+            return ModelExportArtifact(
+                compiled_model_path=compiled_model_path if report["verified"] else None,
+                is_verified=report["verified"],
+                prediction_mismatches=report["prediction_mismatches"],
+                max_probability_difference=report["max_probability_difference"]
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
@@ -1,87 +1,143 @@
 import os
 import sys
+import importlib
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
 from pathlib import Path
+from typing import Optional
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-from sklearn.model_selection import RandomizedSearchCV
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import AdaBoostClassifier
-from sklearn.svm import SVC
 
 from breastcancerdiagnosis.exception.exception_handler import AppException
 from breastcancerdiagnosis.logger.log import logging    
-from breastcancerdiagnosis.entity.config_entity import ModelTrainerConfig
+from breastcancerdiagnosis.entity.config_entity import ModelTrainerConfig, ModelSearchConfig
 from breastcancerdiagnosis.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
-from breastcancerdiagnosis.utils.main_utils import load_object, save_object, write_yaml
+from breastcancerdiagnosis.utils.main_utils import load_object, save_object, write_yaml, load_numpy_array_data, read_yaml_file
 from breastcancerdiagnosis.entity.model import PrepareModel
+from breastcancerdiagnosis.utils.artifact_cache import ArtifactCache
+from breastcancerdiagnosis.utils.model_search import SearchScheduler
+from breastcancerdiagnosis.utils.search_memo import SearchMemo
 
 
 class ModelTrainer:
     def __init__(self, model_trainer_config: ModelTrainerConfig,
-                 data_transformation_artifact: DataTransformationArtifact):
+                 data_transformation_artifact: DataTransformationArtifact,
+                 artifact_cache: ArtifactCache = None):
         try:
             self.model_trainer_config = model_trainer_config
             self.data_transformation_artifact = data_transformation_artifact
+            self.artifact_cache = artifact_cache
         except Exception as e:      
             raise AppException(e, sys) from e 
         
+    def load_artifact(self, file_path: Path, loader):
+        ''' Loads an artifact from the run-scoped cache, falling back to loader on a miss '''
+        try:
+            if self.artifact_cache is None:
+                return loader(file_path)
+            return self.artifact_cache.get_or_load(file_path, lambda: loader(file_path))
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def get_search_memo(self) -> SearchMemo:
+        ''' Persistent store of search results, None when search_memo_file is not set '''
+        try:
+            if not self.model_trainer_config.search_memo_file:
+                return None
+            return SearchMemo(Path(os.path.join(self.model_trainer_config.root_dir, self.model_trainer_config.search_memo_file)),
+                              max_data_keys=self.model_trainer_config.search_memo_max_datasets)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def load_transformed_data(self, features_file_path: Path, target_file_path: Path = None) -> tuple:
+        ''' Loads the features and target of a split, split layout arrays are memory mapped when array_mmap_mode is set '''
+        try:
+            if target_file_path is None:
+                array = self.load_artifact(features_file_path, np.load)
+                return array[:, :-1], array[:, -1]
+            mmap_mode = self.model_trainer_config.array_mmap_mode
+            if mmap_mode is None:
+                return (self.load_artifact(features_file_path, load_numpy_array_data),
+                        self.load_artifact(target_file_path, load_numpy_array_data))
+            # memory mapped pages are shared with the cross validation workers instead of copied into each of them
+            return (load_numpy_array_data(features_file_path, mmap_mode=mmap_mode),
+                    load_numpy_array_data(target_file_path, mmap_mode=mmap_mode))
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @staticmethod
+    def get_candidate_models(model_config_file_path: Path = Path("config/model.yaml")) -> list:
+        ''' Candidate (name, estimator, parameter grid, fit options) models of the models registry in model_config_file_path '''
+        try:
+            candidate_models = []
+            for model_name, model_config in read_yaml_file(model_config_file_path).get("models", {}).items():
+                module_name, class_name = model_config["class"].rsplit(".", 1)
+                try:
+                    model_class = getattr(importlib.import_module(module_name), class_name)
+                except ImportError as e:
+                    # optional boosting libraries, the model zoo works without them
+                    logging.warning(f"Skipping {model_name}, {module_name} can not be imported: {e}")
+                    continue
+                candidate_models.append((model_name, model_class(**(model_config.get("params") or {})),
+                                         model_config.get("search_params") or {}, model_config.get("fit") or {}))
+
+            return candidate_models
+        except Exception as e:
+            raise AppException(e, sys) from e
+
     def get_best_model_object_and_report(X_train: np.ndarray, y_train: np.ndarray,
-                                    X_test: np.ndarray, y_test: np.ndarray, target_accuracy: float):
+                                    X_test: np.ndarray, y_test: np.ndarray, target_accuracy: float, search_n_jobs: int = -1,
+                                    search_config: ModelSearchConfig = None, search_memo: SearchMemo = None,
+                                    model_config_file_path: Path = Path("config/model.yaml"),
+                                    decision_threshold: Optional[float] = None):
         try:
-           # Hyper parameter tuning
-            logistic_regression_params = {
-                'penalty': ['l1', 'l2', 'elasticnet', 'none'],
-                'C': [0.01, 0.1, 1, 10, 100],
-                'solver': ['newton-cg', 'lbfgs', 'liblinear', 'sag', 'saga'],
-                'max_iter': [100, 200, 300, 500]
-            }
-
-            adaboost_params = {
-                'n_estimators': [50, 100, 150, 200],
-                'learning_rate': [0.01, 0.1, 0.5, 1],
-                'algorithm': ['SAMME', 'SAMME.R']
-            }
-
-            svc_params = {
-                'C': [0.1, 1, 10, 100],
-                'kernel': ['linear', 'poly', 'rbf', 'sigmoid'],
-                'gamma': ['scale', 'auto'],
-                'degree': [2, 3, 4]
-            }
-
-            # models for hyper parameter tuning
-            randomcv_models = [
-                ('SVClassifier', SVC(), svc_params),
-                ('AdaBoostClassifier', AdaBoostClassifier(), adaboost_params),
-                ('LogisticRegression', LogisticRegression(), logistic_regression_params)
-            ]
+            randomcv_models = ModelTrainer.get_candidate_models(model_config_file_path)
+            if decision_threshold is not None:
+                # a decision threshold is applied to predict_proba, which e.g. an SVC without probability=True does not have
+                for model_name, model, _, _ in randomcv_models:
+                    if not hasattr(model, "predict_proba"):
+                        logging.warning(f"Skipping {model_name}, it has no predict_proba for the decision threshold {decision_threshold}")
+                randomcv_models = [candidate for candidate in randomcv_models if hasattr(candidate[1], "predict_proba")]
 
             logging.info("Starting hyper parameter tuning for models")
+            # the fits of all models share one pool of search_n_jobs workers
+            if search_config is None:
+                search_scheduler = SearchScheduler(n_jobs=search_n_jobs, cv=5, n_iter=10)
+            else:
+                search_scheduler = SearchScheduler(n_jobs=search_n_jobs, cv=search_config.cv, n_iter=search_config.n_iter,
+                                                   random_state=search_config.random_state, mode=search_config.mode,
+                                                   n_candidates=search_config.n_candidates, factor=search_config.factor,
+                                                   max_poly_C=search_config.max_poly_C, memo=search_memo,
+                                                   time_budget_seconds=search_config.time_budget_seconds)
+            search_results = search_scheduler.search(randomcv_models, X_train, y_train)
+            # models the time budget left without a completed candidate are not compared
+            randomcv_models = [candidate for candidate in randomcv_models if candidate[0] in search_results]
             model_params = {}
-            for model_name, model, params in randomcv_models:
-                randomcv = RandomizedSearchCV(model, params, cv=5, n_iter=10, n_jobs=-1)
-                randomcv.fit(X_train, y_train)
-                model_params[model_name] = randomcv.best_params_
+            for model_name, _, _, _ in randomcv_models:
+                model_params[model_name] = search_results[model_name]["best_params"]
 
-                logging.info(f"Best parameters for {model_name}: {randomcv.best_params_}")
+                logging.info(f"Best parameters for {model_name}: {model_params[model_name]}")
 
             model_report = {}
             best_model = None
             best_accuracy = target_accuracy
 
-            for model_name, model, params in randomcv_models:
-                model = model.__class__(**model_params[model_name])
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
+            for model_name, model, params, _ in randomcv_models:
+                # already fitted on all training rows with the best parameters by the search
+                model = search_results[model_name]["best_estimator"]
+                if decision_threshold is None:
+                    y_pred = model.predict(X_test)
+                else:
+                    # scored the way the saved PrepareModel predicts with the threshold
+                    y_pred = np.where(model.predict_proba(X_test)[:, 1] >= decision_threshold, model.classes_[1], model.classes_[0])
                 accuracy = accuracy_score(y_test, y_pred)
                 precision = precision_score(y_test, y_pred)
                 recall = recall_score(y_test, y_pred)
                 f1 = f1_score(y_test, y_pred)
                 metric_artifact = ClassificationMetricArtifact(f1_score=f1, precision=precision, recall=recall, accuracy=accuracy)
                 if accuracy > best_accuracy:
+                    best_accuracy = accuracy
                     best_model = model
                     best_model_metric_artifact = metric_artifact
                     best_mode_name = model_name
@@ -109,18 +165,22 @@ class ModelTrainer:
     def initiate_model_trainer(self) -> ModelTrainerArtifact:
         try:
             logging.info("Loading transformed training and testing data")
-            train_array = np.load(self.data_transformation_artifact.transformed_train_file_path)
-            test_array = np.load(self.data_transformation_artifact.transformed_test_file_path)
-
-            X_train = train_array[:, :-1]
-            y_train = train_array[:, -1]
-
-            X_test = test_array[:, :-1]
-            y_test = test_array[:, -1]
+            X_train, y_train = self.load_transformed_data(self.data_transformation_artifact.transformed_train_file_path,
+                                                          self.data_transformation_artifact.transformed_train_target_file_path)
+            X_test, y_test = self.load_transformed_data(self.data_transformation_artifact.transformed_test_file_path,
+                                                        self.data_transformation_artifact.transformed_test_target_file_path)
 
             logging.info("Training the model")
+            search_memo = self.get_search_memo()
             model_report, best_model, best_model_metric_artifact = ModelTrainer.get_best_model_object_and_report(
-                X_train, y_train, X_test, y_test, self.model_trainer_config.expected_score)
+                X_train, y_train, X_test, y_test, self.model_trainer_config.expected_score,
+                search_n_jobs=self.model_trainer_config.search_n_jobs,
+                search_config=ModelSearchConfig.from_yaml(self.model_trainer_config.model_config_file_path),
+                search_memo=search_memo,
+                model_config_file_path=self.model_trainer_config.model_config_file_path,
+                decision_threshold=self.model_trainer_config.decision_threshold)
+            if search_memo is not None:
+                search_memo.close()
 
             write_yaml(file_path=Path(os.path.join(self.model_trainer_config.root_dir,"model_report.yaml")),
                        content=model_report, replace=True)
@@ -128,17 +188,20 @@ class ModelTrainer:
 
             # read the preprocessor object from pickle file path in data transformation artifact
 
-            preprocessor = load_object(self.data_transformation_artifact.preprocessor_object_path)
+            preprocessor = self.load_artifact(self.data_transformation_artifact.preprocessor_object_path, load_object)
             
-            prepare_model = PrepareModel(preprocessing_object=preprocessor, trained_model_object=best_model)
+            prepare_model = PrepareModel(preprocessing_object=preprocessor, trained_model_object=best_model,
+                                         batch_size=self.model_trainer_config.prediction_batch_size,
+                                         threshold=self.model_trainer_config.decision_threshold)
 
-            save_object(file_path=Path(os.path.join(self.model_trainer_config.root_dir,self.model_trainer_config.trained_model_file)), obj=prepare_model)
+            trained_model_path = Path(os.path.join(self.model_trainer_config.root_dir,self.model_trainer_config.trained_model_file))
+            save_object(file_path=trained_model_path, obj=prepare_model)
             
-            logging.info(f"Trained model saved at: {self.model_trainer_config.model_config_file_path}")
+            logging.info(f"Trained model saved at: {trained_model_path}")
 
     
             model_trainer_artifact = ModelTrainerArtifact(
-                trained_model_path=self.model_trainer_config.model_config_file_path,
+                trained_model_path=trained_model_path,
                 classification_metric_artifact=best_model_metric_artifact
             )
 
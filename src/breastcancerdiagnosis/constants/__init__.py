@@ -4,10 +4,17 @@ SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
 TRAIN_FILE_NAME: str = "train.csv"
 TEST_FILE_NAME: str = "test.csv"
 RAW_DATA_FILE: str = "breast_cancer.csv"
+INGESTION_MANIFEST_FILE: str = "ingestion_manifest.yaml"
+INGESTED_FILE_EXTENSIONS: dict = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
 TRANSFORMED_TRAIN_FILE_NAME: str = "train.npy"
 TRANSFORMED_TEST_FILE_NAME: str = "test.npy"
+TRANSFORMED_TRAIN_FEATURES_FILE_NAME: str = "train_X.npy"
+TRANSFORMED_TRAIN_TARGET_FILE_NAME: str = "train_y.npy"
+TRANSFORMED_TEST_FEATURES_FILE_NAME: str = "test_X.npy"
+TRANSFORMED_TEST_TARGET_FILE_NAME: str = "test_y.npy"
 
 TARGET_COLUMN: str = "diagnosis"
+ID_COLUMN: str = "id"
 
 AWS_ACCESS_KEY_ID_ENV_KEY = ""
 AWS_SECRET_ACCESS_KEY_ENV_KEY = ""
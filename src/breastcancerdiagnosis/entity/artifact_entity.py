@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 @dataclass
 class DataIngestionArtifact:
@@ -17,6 +18,9 @@ class DataTransformationArtifact:
     transformed_train_file_path: Path
     transformed_test_file_path: Path
     preprocessor_object_path: Path
+    # set for the split array layout, the transformed file paths then hold the features only
+    transformed_train_target_file_path: Optional[Path] = None
+    transformed_test_target_file_path: Optional[Path] = None
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -30,6 +34,14 @@ class ModelTrainerArtifact:
     trained_model_path: Path
     classification_metric_artifact: ClassificationMetricArtifact
 
+@dataclass
+class ModelExportArtifact:
+    # None when the model can not be compiled or the compiled model failed verification
+    compiled_model_path: Optional[Path]
+    is_verified: bool
+    prediction_mismatches: int
+    max_probability_difference: float
+
 @dataclass
 class ModelEvaluationArtifact:
     is_model_accepted: bool
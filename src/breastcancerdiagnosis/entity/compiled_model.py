@@ -0,0 +1,158 @@
+import sys
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+# version of the compiled model layout written by utils.model_compiler, older layouts stay loadable
+COMPILED_MODEL_FORMAT_VERSION: int = 1
+MODEL_KINDS = ("linear", "kernel_svm", "tree_ensemble")
+
+
+class CompiledModel:
+    """
+    NumPy only runtime of a PrepareModel compiled by utils.model_compiler
+    Loads a .npz artifact holding the Yeo-Johnson lambdas and standardization statistics of
+    the preprocessor and the decision function of the binary classifier: the coefficients
+    of a linear model, the support vectors of a kernel SVC or the flattened node arrays of a
+    tree ensemble. Neither sklearn nor pandas nor the pickled model classes are imported,
+    so a serving worker or batch job starts scoring as soon as NumPy is loaded.
+    Inputs are arrays in columns order, a record dict, a list of record dicts or a
+    DataFrame, and are scored batch_size rows at a time.
+    """
+    def __init__(self, arrays: dict):
+        try:
+            format_version = int(arrays["format_version"])
+            if format_version > COMPILED_MODEL_FORMAT_VERSION:
+                raise ValueError(f"Compiled model format {format_version} is newer than the supported "
+                                 f"{COMPILED_MODEL_FORMAT_VERSION}")
+            self.model_kind = str(arrays["model_kind"])
+            if self.model_kind not in MODEL_KINDS:
+                raise ValueError(f"Unknown compiled model kind {self.model_kind}, expected one of {MODEL_KINDS}")
+            self.arrays = arrays
+            self.format_version = format_version
+            self.model_class = str(arrays["model_class"])
+            self.columns = [str(column) for column in arrays["columns"]]
+            self.classes = arrays["classes"]
+            self.has_proba = bool(arrays["has_proba"])
+            self.threshold = None if np.isnan(arrays["threshold"]) else float(arrays["threshold"])
+            self.batch_size = int(arrays["batch_size"])
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: Path) -> "CompiledModel":
+        try:
+            with np.load(file_path, allow_pickle=False) as npz_file:
+                return cls({key: npz_file[key] for key in npz_file.files})
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _to_block(self, X) -> np.ndarray:
+        '''Float64 (n_rows, n_columns) block of the input in columns order.'''
+        if isinstance(X, dict):
+            X = [X]
+        if isinstance(X, list):
+            block = np.empty((len(X), len(self.columns)), dtype=np.float64)
+            for position, column in enumerate(self.columns):
+                block[:, position] = [record[column] for record in X]
+            return block
+        if hasattr(X, "columns"):
+            # a DataFrame, selected by column name without importing pandas
+            missing = [column for column in self.columns if column not in X.columns]
+            if missing:
+                raise KeyError(f"Input is missing the columns {missing}")
+            block = np.empty((len(X), len(self.columns)), dtype=np.float64)
+            for position, column in enumerate(self.columns):
+                block[:, position] = X[column].to_numpy(dtype=np.float64)
+            return block
+        block = np.array(X, dtype=np.float64, order="C", ndmin=2)
+        if block.shape[1] != len(self.columns):
+            raise ValueError(f"Expected {len(self.columns)} columns {self.columns}, got {block.shape[1]}")
+        return block
+
+    def _preprocess(self, block: np.ndarray) -> np.ndarray:
+        '''Yeo-Johnson transform and standardization of block in place, as YeoJohnsonScaler.transform.'''
+        if "input_mean" in self.arrays:
+            standardized_input = (block - self.arrays["input_mean"]) / self.arrays["input_scale"]
+        lambdas = self.arrays["yeo_johnson_lambdas"]
+        is_negative = block < 0
+        exponent = np.where(is_negative, 2.0 - lambdas, lambdas)
+        np.abs(block, out=block)
+        np.log1p(block, out=block)
+        is_log = np.abs(exponent) < np.spacing(1.0)
+        safe_exponent = np.where(is_log, 1.0, exponent)
+        transformed = np.expm1(safe_exponent * block)
+        transformed /= safe_exponent
+        np.copyto(block, transformed, where=~is_log)
+        np.negative(block, out=block, where=is_negative)
+        block -= self.arrays["scaling_mean"]
+        block /= self.arrays["scaling_scale"]
+        if "input_mean" in self.arrays:
+            return np.hstack([block, standardized_input])
+        return block
+
+    def _linear_decision(self, features: np.ndarray) -> np.ndarray:
+        return features @ self.arrays["coef"] + self.arrays["intercept"]
+
+    def _kernel_svm_decision(self, features: np.ndarray) -> np.ndarray:
+        support_vectors, kernel = self.arrays["support_vectors"], str(self.arrays["kernel"])
+        gamma, coef0, degree = float(self.arrays["gamma"]), float(self.arrays["coef0"]), int(self.arrays["degree"])
+        if kernel == "rbf":
+            squared_distances = ((features ** 2).sum(axis=1)[:, np.newaxis] - 2 * features @ support_vectors.T
+                                 + (support_vectors ** 2).sum(axis=1)[np.newaxis, :])
+            kernel_matrix = np.exp(-gamma * np.maximum(squared_distances, 0.0))
+        elif kernel == "linear":
+            kernel_matrix = features @ support_vectors.T
+        elif kernel == "poly":
+            kernel_matrix = (gamma * features @ support_vectors.T + coef0) ** degree
+        else:
+            kernel_matrix = np.tanh(gamma * features @ support_vectors.T + coef0)
+        return kernel_matrix @ self.arrays["dual_coef"] + self.arrays["intercept"]
+
+    def _tree_ensemble_decision(self, features: np.ndarray) -> np.ndarray:
+        # leaves point to themselves, so every tree is walked max_depth steps in lockstep
+        features = features.astype(str(self.arrays["tree_input_dtype"]), copy=False)
+        feature, threshold = self.arrays["tree_feature"], self.arrays["tree_threshold"]
+        left, right, missing_left = self.arrays["tree_left"], self.arrays["tree_right"], self.arrays["tree_missing_left"]
+        rows = np.arange(len(features))[:, np.newaxis]
+        nodes = np.broadcast_to(self.arrays["tree_roots"], (len(features), len(self.arrays["tree_roots"])))
+        for _ in range(int(self.arrays["tree_max_depth"])):
+            values = features[rows, feature[nodes]]
+            go_left = (values <= threshold[nodes]) | (np.isnan(values) & missing_left[nodes])
+            nodes = np.where(go_left, left[nodes], right[nodes])
+        return self.arrays["tree_leaf_value"][nodes].sum(axis=1) + self.arrays["bias"]
+
+    def decision_function(self, X) -> np.ndarray:
+        ''' Positive class score of the binary classifier, > 0 predicts classes[1] '''
+        try:
+            block = self._to_block(X)
+            decision = np.empty(len(block), dtype=np.float64)
+            for start in range(0, len(block), self.batch_size):
+                features = self._preprocess(block[start:start + self.batch_size])
+                decision[start:start + self.batch_size] = getattr(self, f"_{self.model_kind}_decision")(features)
+            return decision
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def predict_proba(self, X) -> np.ndarray:
+        try:
+            if not self.has_proba:
+                raise AttributeError(f"{self.model_class} was compiled without probability estimates")
+            positive = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+            probabilities = np.empty((len(positive), 2), dtype=np.float64)
+            probabilities[:, 1] = positive
+            probabilities[:, 0] = 1.0 - positive
+            return probabilities
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def predict(self, X, threshold: Optional[float] = None) -> np.ndarray:
+        ''' Predicted classes, by positive class probability >= threshold when one is given or compiled in '''
+        try:
+            threshold = self.threshold if threshold is None else threshold
+            if threshold is not None:
+                return np.where(self.predict_proba(X)[:, 1] >= threshold, self.classes[1], self.classes[0])
+            return np.where(self.decision_function(X) > 0, self.classes[1], self.classes[0])
+        except Exception as e:
+            raise AppException(e, sys) from e
@@ -2,6 +2,7 @@ import os
 import sys
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from breastcancerdiagnosis.utils.main_utils import read_yaml_file
 from breastcancerdiagnosis.exception.exception_handler import AppException
 from breastcancerdiagnosis.logger.log import logging
@@ -13,6 +14,11 @@ class DataIngestionConfig:
     feature_store_dir: Path
     ingested_data_dir: Path
     train_test_split_ratio: float
+    cache_dir: Path
+    cache_max_size_mb: int
+    split_mode: str
+    chunk_size: int
+    ingested_file_format: str
 
     @classmethod
     def from_yaml(cls, config_path: Path) -> "DataIngestionConfig":
@@ -24,7 +30,12 @@ class DataIngestionConfig:
                 source_url=data_ingestion_config.get("source_url", ""),
                 feature_store_dir=Path(data_ingestion_config.get("feature_store_dir", "")),
                 ingested_data_dir=Path(data_ingestion_config.get("ingested_data_dir", "")),
-                train_test_split_ratio=data_ingestion_config.get("train_test_split_ratio", 0.0)
+                train_test_split_ratio=data_ingestion_config.get("train_test_split_ratio", 0.0),
+                cache_dir=Path(data_ingestion_config.get("cache_dir", "")),
+                cache_max_size_mb=data_ingestion_config.get("cache_max_size_mb", 512),
+                split_mode=data_ingestion_config.get("split_mode", "in_memory"),
+                chunk_size=data_ingestion_config.get("chunk_size", 100000),
+                ingested_file_format=data_ingestion_config.get("ingested_file_format", "csv")
             )
         except Exception as e:
             raise AppException(e, sys) from e
@@ -35,6 +46,18 @@ class DataValidationConfig:
     root_dir: Path
     report_file_path: Path
     drift_threshold: float
+    drift_metrics: list
+    psi_bins: int
+    drift_n_jobs: int
+    drift_mode: str
+    reference_profile_file: Path
+    profile_centroids: int
+    chunk_size: int
+    schema_report_file: Path
+    validation_n_jobs: int
+    validation_executor: str
+    batch_report_file: Path
+    batch_schema_report_file: Path
 
     @classmethod
     def from_yaml(cls, config_path: Path) -> "DataValidationConfig":
@@ -44,7 +67,19 @@ class DataValidationConfig:
             return cls(
                 root_dir=Path(data_validation_config.get("root_dir", "")),
                 report_file_path=Path(data_validation_config.get("report_file_path", "")),
-                drift_threshold=data_validation_config.get("drift_threshold", 0.0)
+                drift_threshold=data_validation_config.get("drift_threshold", 0.0),
+                drift_metrics=data_validation_config.get("drift_metrics", ["ks"]),
+                psi_bins=data_validation_config.get("psi_bins", 10),
+                drift_n_jobs=data_validation_config.get("drift_n_jobs", 1),
+                drift_mode=data_validation_config.get("drift_mode", "dataframe"),
+                reference_profile_file=Path(data_validation_config.get("reference_profile_file", "reference_profile.npz")),
+                profile_centroids=data_validation_config.get("profile_centroids", 1000),
+                chunk_size=data_validation_config.get("chunk_size", 100000),
+                schema_report_file=Path(data_validation_config.get("schema_report_file", "schema_report.yaml")),
+                validation_n_jobs=data_validation_config.get("validation_n_jobs", 2),
+                validation_executor=data_validation_config.get("validation_executor", "thread"),
+                batch_report_file=Path(data_validation_config.get("batch_report_file", "batch_drift_report.yaml")),
+                batch_schema_report_file=Path(data_validation_config.get("batch_schema_report_file", "batch_schema_report.yaml"))
             )
         except Exception as e:
             raise AppException(e, sys ) from e
@@ -54,6 +89,22 @@ class DataTransformationConfig:
     root_dir: Path
     transformed_data_dir: Path
     preprocessor_object_file: str
+    feature_selection_method: str
+    significance_level: float
+    mutual_info_threshold: float
+    feature_selection_cache_file: str
+    preprocessor_mode: str
+    fit_mode: str
+    chunk_size: int
+    reservoir_size: int
+    resampling_method: str
+    resampling_splits: list
+    neighbors_algorithm: str
+    resampling_n_jobs: int
+    resampling_random_state: Optional[int]
+    neighbors_index_dir: Optional[str]
+    array_layout: str
+    array_dtype: str
 
     @classmethod
     def from_yaml(cls, config_path: Path) -> "DataTransformationConfig":
@@ -63,7 +114,23 @@ class DataTransformationConfig:
             return cls(
                 root_dir=Path(data_transformation_config.get("root_dir", "")),
                 transformed_data_dir=Path(data_transformation_config.get("transformed_data_dir", "")),
-                preprocessor_object_file=data_transformation_config.get("preprocessor_object_file", "")
+                preprocessor_object_file=data_transformation_config.get("preprocessor_object_file", ""),
+                feature_selection_method=data_transformation_config.get("feature_selection_method", "anova"),
+                significance_level=data_transformation_config.get("significance_level", 0.05),
+                mutual_info_threshold=data_transformation_config.get("mutual_info_threshold", 0.0),
+                feature_selection_cache_file=data_transformation_config.get("feature_selection_cache_file", "feature_selection_cache.yaml"),
+                preprocessor_mode=data_transformation_config.get("preprocessor_mode", "fused"),
+                fit_mode=data_transformation_config.get("fit_mode", "in_memory"),
+                chunk_size=data_transformation_config.get("chunk_size", 100000),
+                reservoir_size=data_transformation_config.get("reservoir_size", 100000),
+                resampling_method=data_transformation_config.get("resampling_method", "smoteenn"),
+                resampling_splits=data_transformation_config.get("resampling_splits", ["train"]),
+                neighbors_algorithm=data_transformation_config.get("neighbors_algorithm", "auto"),
+                resampling_n_jobs=data_transformation_config.get("resampling_n_jobs", -1),
+                resampling_random_state=data_transformation_config.get("resampling_random_state"),
+                neighbors_index_dir=data_transformation_config.get("neighbors_index_dir", "neighbors_index"),
+                array_layout=data_transformation_config.get("array_layout", "split"),
+                array_dtype=data_transformation_config.get("array_dtype", "float32")
             )
         except Exception as e:
             raise AppException(e, sys) from e
@@ -74,6 +141,12 @@ class ModelTrainerConfig:
     trained_model_file: str
     expected_score: float
     model_config_file_path: Path
+    array_mmap_mode: Optional[str]
+    search_n_jobs: int
+    search_memo_file: Optional[str]
+    search_memo_max_datasets: Optional[int]
+    prediction_batch_size: int
+    decision_threshold: Optional[float]
 
     @classmethod
     def from_yaml(cls, config_path: Path) -> "ModelTrainerConfig":
@@ -84,11 +157,65 @@ class ModelTrainerConfig:
                 root_dir=Path(model_trainer_config.get("root_dir", "")),
                 trained_model_file=model_trainer_config.get("trained_model_file", ""),
                 expected_score=model_trainer_config.get("expected_score", 0.0),
-                model_config_file_path=Path(model_trainer_config.get("model_config_file_path", ""))
+                model_config_file_path=Path(model_trainer_config.get("model_config_file_path", "")),
+                array_mmap_mode=model_trainer_config.get("array_mmap_mode", "r"),
+                search_n_jobs=model_trainer_config.get("search_n_jobs", -1),
+                search_memo_file=model_trainer_config.get("search_memo_file"),
+                search_memo_max_datasets=model_trainer_config.get("search_memo_max_datasets", 8),
+                prediction_batch_size=model_trainer_config.get("prediction_batch_size", 8192),
+                decision_threshold=model_trainer_config.get("decision_threshold")
             )
         except Exception as e:
             raise AppException(e, sys) from e    
         
+@dataclass
+class ModelSearchConfig:
+    mode: str
+    cv: int
+    n_iter: int
+    n_candidates: int
+    factor: int
+    max_poly_C: Optional[float]
+    random_state: Optional[int]
+    time_budget_seconds: Optional[float]
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "ModelSearchConfig":
+        try:
+            config = read_yaml_file(config_path)
+            search_config = config.get("search", {})
+            return cls(
+                mode=search_config.get("mode", "random"),
+                cv=search_config.get("cv", 5),
+                n_iter=search_config.get("n_iter", 10),
+                n_candidates=search_config.get("n_candidates", 30),
+                factor=search_config.get("factor", 3),
+                max_poly_C=search_config.get("max_poly_C"),
+                random_state=search_config.get("random_state"),
+                time_budget_seconds=search_config.get("time_budget_seconds")
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+@dataclass
+class ModelExportConfig:
+    root_dir: Path
+    compiled_model_file: str
+    verification_atol: float
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "ModelExportConfig":
+        try:
+            config = read_yaml_file(config_path)
+            model_export_config = config.get("model_export", {})
+            return cls(
+                root_dir=Path(model_export_config.get("root_dir", "")),
+                compiled_model_file=model_export_config.get("compiled_model_file", "model.npz"),
+                verification_atol=float(model_export_config.get("verification_atol", 1e-9))
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
+
 @dataclass
 class ModelEvaluationConfig:
     root_dir: Path 
@@ -108,3 +235,140 @@ class ModelEvaluationConfig:
         except Exception as e:
             raise AppException(e, sys) from e
 
+@dataclass
+class TrainingPipelineConfig:
+    artifact_cache_max_size_mb: int
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "TrainingPipelineConfig":
+        try:
+            config = read_yaml_file(config_path)
+            training_pipeline_config = config.get("training_pipeline", {})
+            return cls(
+                artifact_cache_max_size_mb=training_pipeline_config.get("artifact_cache_max_size_mb", 1024)
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+@dataclass
+class PredictionPipelineConfig:
+    model_file_path: Path
+    fallback_model_file_path: Path
+    chunk_size: int
+    n_jobs: int
+    max_pending_chunks: Optional[int]
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "PredictionPipelineConfig":
+        try:
+            config = read_yaml_file(config_path)
+            prediction_config = config.get("prediction", {})
+            return cls(
+                model_file_path=Path(prediction_config.get("model_file_path", "")),
+                fallback_model_file_path=Path(prediction_config.get("fallback_model_file_path", "")),
+                chunk_size=prediction_config.get("chunk_size", 50000),
+                n_jobs=prediction_config.get("n_jobs", -1),
+                max_pending_chunks=prediction_config.get("max_pending_chunks")
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+@dataclass
+class ModelCacheConfig:
+    root_dir: Path
+    max_size_mb: int
+    refresh_interval_seconds: Optional[float]
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "ModelCacheConfig":
+        try:
+            config = read_yaml_file(config_path)
+            model_cache_config = config.get("model_cache", {})
+            return cls(
+                root_dir=Path(model_cache_config.get("root_dir", "data/model_cache")),
+                max_size_mb=model_cache_config.get("max_size_mb", 1024),
+                refresh_interval_seconds=model_cache_config.get("refresh_interval_seconds", 60)
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+@dataclass
+class PredictionCacheConfig:
+    enabled: bool
+    max_entries: int
+    ttl_seconds: float
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "PredictionCacheConfig":
+        try:
+            config = read_yaml_file(config_path)
+            prediction_cache_config = config.get("prediction_cache", {})
+            return cls(
+                enabled=prediction_cache_config.get("enabled", False),
+                max_entries=prediction_cache_config.get("max_entries", 100000),
+                ttl_seconds=prediction_cache_config.get("ttl_seconds", 3600)
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+@dataclass
+class AppConfig:
+    host: str
+    port: int
+    workers: int
+    max_batch_size: int
+    max_wait_ms: float
+    n_threads: int
+    max_bulk_rows: int
+    models: list
+    max_pending_shadow_batches: int
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "AppConfig":
+        try:
+            config = read_yaml_file(config_path)
+            app_config = config.get("app", {})
+            return cls(
+                host=app_config.get("host", "0.0.0.0"),
+                port=app_config.get("port", 8080),
+                workers=app_config.get("workers", 1),
+                max_batch_size=app_config.get("max_batch_size", 64),
+                max_wait_ms=app_config.get("max_wait_ms", 5),
+                n_threads=app_config.get("n_threads", 2),
+                max_bulk_rows=app_config.get("max_bulk_rows", 100000),
+                models=app_config.get("models") or [],
+                max_pending_shadow_batches=app_config.get("max_pending_shadow_batches", 8)
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+@dataclass
+class BenchmarkConfig:
+    root_dir: Path
+    rows: list
+    feature_multipliers: list
+    models: list
+    latency_samples: int
+    results_file: str
+    baseline_file: str
+    regression_tolerance: float
+    random_state: int
+
+    @classmethod
+    def from_yaml(cls, config_path: Path) -> "BenchmarkConfig":
+        try:
+            config = read_yaml_file(config_path)
+            benchmark_config = config.get("benchmark", {})
+            return cls(
+                root_dir=Path(benchmark_config.get("root_dir", "")),
+                rows=benchmark_config.get("rows", [569]),
+                feature_multipliers=benchmark_config.get("feature_multipliers", [1]),
+                models=benchmark_config.get("models", []),
+                latency_samples=benchmark_config.get("latency_samples", 200),
+                results_file=benchmark_config.get("results_file", "benchmark_results.yaml"),
+                baseline_file=benchmark_config.get("baseline_file", "benchmark_baseline.yaml"),
+                regression_tolerance=benchmark_config.get("regression_tolerance", 0.25),
+                random_state=benchmark_config.get("random_state", 42)
+            )
+        except Exception as e:
+            raise AppException(e, sys) from e
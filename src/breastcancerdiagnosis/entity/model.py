@@ -1,30 +1,164 @@
 import sys
+import numpy as np
+from typing import Optional
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
 from breastcancerdiagnosis.logger.log import logging
 from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.entity.transformer import YeoJohnsonScaler
+
+# rows preprocessed and predicted at a time
+DEFAULT_BATCH_SIZE: int = 8192
+
 
 class PrepareModel:
-    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
+    """
+    Preprocessor and trained model served as one object
+    Inputs are DataFrames, NumPy arrays whose columns are in input_columns_ order, a record
+    dict or a list of record dicts. The input column order is resolved once, when the model
+    is created or unpickled, and rows are processed batch_size at a time through a single
+    float64 buffer, with the predictions written into an output array allocated up front.
+    With a threshold, predict assigns the positive class when its probability reaches it.
+    """
+    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object,
+                 batch_size: int = DEFAULT_BATCH_SIZE, threshold: Optional[float] = None):
         try:
             self.preprocessing_object = preprocessing_object
             self.trained_model_object = trained_model_object
+            self.batch_size = batch_size
+            self.threshold = threshold
+            self._resolve_columns()
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for attribute in ("input_columns_", "_in_place_transform"):
+            state.pop(attribute, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # models pickled before batching was added have no batch_size and threshold
+        self.__dict__.update(state)
+        self.__dict__.setdefault("batch_size", DEFAULT_BATCH_SIZE)
+        self.__dict__.setdefault("threshold", None)
+        self._resolve_columns()
+
+    def _resolve_columns(self) -> None:
+        preprocessor = self.preprocessing_object
+        columns = getattr(preprocessor, "columns", None)
+        if columns is None and hasattr(preprocessor, "feature_names_in_"):
+            columns = preprocessor.feature_names_in_
+        self.input_columns_ = None if columns is None else [str(column) for column in columns]
+        # the fused scaler transforms the batch buffer itself, other preprocessors get a DataFrame view of it
+        self._in_place_transform = isinstance(preprocessor, YeoJohnsonScaler) and not preprocessor.include_standardized_input
+
+    def _input_source(self, X) -> tuple:
+        '''(n_rows, 2d array or list of column arrays) of the input, in input_columns_ order.'''
+        if isinstance(X, dict):
+            X = [X]
+        if isinstance(X, list):
+            if self.input_columns_ is None:
+                raise ValueError("Record inputs need a preprocessor fitted on named columns")
+            missing = [column for column in self.input_columns_ if column not in X[0]] if X else []
+            if missing:
+                raise KeyError(f"Records are missing the columns {missing}")
+            return len(X), [np.fromiter((record[column] for record in X), dtype=np.float64, count=len(X))
+                            for column in self.input_columns_]
+        if isinstance(X, DataFrame):
+            if self.input_columns_ is None:
+                return len(X), X.to_numpy(dtype=np.float64)
+            missing = [column for column in self.input_columns_ if column not in X.columns]
+            if missing:
+                raise KeyError(f"Input is missing the columns {missing}")
+            return len(X), [X[column].to_numpy(dtype=np.float64, copy=False) for column in self.input_columns_]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.input_columns_ is not None and X.shape[1] != len(self.input_columns_):
+            raise ValueError(f"Expected {len(self.input_columns_)} columns {self.input_columns_}, got {X.shape[1]}")
+        return len(X), X
+
+    def _batches(self, n_rows: int, source):
+        '''Yields (start, stop, transformed features) of every batch of an input source.'''
+        n_columns = len(source) if isinstance(source, list) else source.shape[1]
+        buffer = np.empty((min(self.batch_size, n_rows), n_columns), dtype=np.float64)
+        for start in range(0, n_rows, self.batch_size):
+            stop = min(start + self.batch_size, n_rows)
+            block = buffer[:stop - start]
+            if isinstance(source, list):
+                for position, column in enumerate(source):
+                    block[:, position] = column[start:stop]
+            else:
+                block[:] = source[start:stop]
+            if self._in_place_transform:
+                yield start, stop, self.preprocessing_object.transform(block, copy=False)
+            elif self.input_columns_ is not None:
+                yield start, stop, self.preprocessing_object.transform(DataFrame(block, columns=self.input_columns_, copy=False))
+            else:
+                yield start, stop, self.preprocessing_object.transform(block)
+
+    def transform(self, X) -> np.ndarray:
+        ''' Preprocessed features of X, to be scored by the *_transformed methods of models sharing the preprocessor '''
+        try:
+            n_rows, source = self._input_source(X)
+            transformed = None
+            for start, stop, features in self._batches(n_rows, source):
+                if transformed is None:
+                    transformed = np.empty((n_rows, features.shape[1]), dtype=np.float64)
+                transformed[start:stop] = features
+            return transformed if transformed is not None else np.empty((0, 0), dtype=np.float64)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def predict_proba_transformed(self, features: np.ndarray) -> np.ndarray:
+        try:
+            return self.trained_model_object.predict_proba(features)
         except Exception as e:
             raise AppException(e, sys) from e
 
+    def predict_transformed(self, features: np.ndarray, threshold: Optional[float] = None) -> np.ndarray:
+        ''' predict of already preprocessed features '''
+        try:
+            threshold = self.threshold if threshold is None else threshold
+            classes = self.trained_model_object.classes_
+            if threshold is not None:
+                return np.where(self.trained_model_object.predict_proba(features)[:, 1] >= threshold, classes[1], classes[0])
+            return self.trained_model_object.predict(features)
+        except Exception as e:
+            raise AppException(e, sys) from e
 
-    def predict(self, dataframe: DataFrame) -> DataFrame:
+    def predict_proba(self, X) -> np.ndarray:
         try:
-            transformed_feature = self.preprocessing_object(dataframe)
+            n_rows, source = self._input_source(X)
+            probabilities = np.empty((n_rows, len(self.trained_model_object.classes_)), dtype=np.float64)
+            for start, stop, features in self._batches(n_rows, source):
+                probabilities[start:stop] = self.trained_model_object.predict_proba(features)
+            return probabilities
+        except Exception as e:
+            raise AppException(e, sys) from e
 
-            return self.trained_model_object.predict(transformed_feature)
+    def predict(self, X, threshold: Optional[float] = None) -> np.ndarray:
+        ''' Predicted classes, by positive class probability >= threshold when one is given or set on the model '''
+        try:
+            threshold = self.threshold if threshold is None else threshold
+            classes = self.trained_model_object.classes_
+            if threshold is not None:
+                if len(classes) != 2:
+                    raise ValueError(f"A decision threshold needs a binary model, it has the classes {list(classes)}")
+                return np.where(self.predict_proba(X)[:, 1] >= threshold, classes[1], classes[0])
 
+            n_rows, source = self._input_source(X)
+            predictions = np.empty(n_rows, dtype=classes.dtype)
+            for start, stop, features in self._batches(n_rows, source):
+                predictions[start:stop] = self.trained_model_object.predict(features)
+            return predictions
         except Exception as e:
             raise AppException(e, sys) from e
-        
+
     def __repr__(self):
         return f"{type(self.trained_model_object).__name__}()"
-    
+
 
     def __str__(self):
-        return f"{type(self.trained_model_object).__name__}()"
\ No newline at end of file
+        return f"{type(self.trained_model_object).__name__}()"
@@ -0,0 +1,164 @@
+import sys
+import dill
+import hashlib
+import threading
+import numpy as np
+from typing import Optional
+from pandas import DataFrame, Series
+from pandas.util import hash_pandas_object
+from concurrent.futures import ThreadPoolExecutor
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.entity.model import PrepareModel
+from breastcancerdiagnosis.entity.compiled_model import CompiledModel
+
+
+def model_input_columns(model) -> list:
+    ''' Raw feature columns a CompiledModel, PrepareModel or ModelRouter scores, in order '''
+    return model.columns if isinstance(model, CompiledModel) else model.input_columns_
+
+
+def model_has_proba(model) -> bool:
+    if isinstance(model, (CompiledModel, ModelRouter)):
+        return model.has_proba
+    return hasattr(model.trained_model_object, "predict_proba")
+
+
+def preprocessor_fingerprint(model) -> Optional[str]:
+    ''' Hash of the fitted preprocessor of a PrepareModel, None for a CompiledModel which preprocesses internally '''
+    if not isinstance(model, PrepareModel):
+        return None
+    return hashlib.sha256(dill.dumps(model.preprocessing_object)).hexdigest()
+
+
+class ModelRouter:
+    """
+    Several models served side by side
+    Every row is answered by one of the models with a positive weight, picked from a hash of
+    its id so a patient keeps getting the same model, or at random for rows without an id.
+    Shadow models score every batch in a background thread once the answer is computed and
+    only feed the agreement report, they never delay or change a response. Within a batch,
+    models whose preprocessors have the same fingerprint share one preprocessing pass.
+    """
+    def __init__(self, models: dict, weights: dict, shadow_models: list = (),
+                 max_pending_shadow_batches: int = 8, seed: Optional[int] = None):
+        try:
+            self.models = models
+            self.primary_names = [name for name in models if weights.get(name, 0) > 0]
+            if not self.primary_names:
+                raise ValueError(f"No served model has a positive weight: {weights}")
+            total_weight = sum(weights[name] for name in self.primary_names)
+            self.traffic_shares = {name: weights[name] / total_weight for name in self.primary_names}
+            self.cumulative_weights = np.cumsum(list(self.traffic_shares.values()))
+            self.shadow_names = [name for name in shadow_models if name in models]
+            self.max_pending_shadow_batches = max_pending_shadow_batches
+
+            self.fingerprints = {name: preprocessor_fingerprint(models[name]) for name in self.primary_names + self.shadow_names}
+            fingerprints = [fingerprint for fingerprint in self.fingerprints.values() if fingerprint is not None]
+            # preprocessing of a fingerprint used by a single model is done on that model's rows only
+            self.shared_fingerprints = {fingerprint for fingerprint in fingerprints if fingerprints.count(fingerprint) > 1}
+            self.input_columns_ = []
+            for name in self.fingerprints:
+                self.input_columns_ += [column for column in model_input_columns(models[name]) if column not in self.input_columns_]
+            self.has_proba = all(model_has_proba(models[name]) for name in self.primary_names)
+
+            self._rng = np.random.default_rng(seed)
+            self._lock = threading.Lock()
+            self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow") if self.shadow_names else None
+            self._pending_shadow_batches = 0
+            self._shadow_report = {name: {"rows": 0, "disagreements": 0, "probability_difference_sum": 0.0,
+                                          "dropped_batches": 0} for name in self.shadow_names}
+            logging.info(f"Serving traffic shares {self.traffic_shares}, shadow models {self.shadow_names}, "
+                         f"{len(self.shared_fingerprints)} shared preprocessors")
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def route(self, n_rows: int, ids: Optional[Series] = None) -> np.ndarray:
+        ''' Index in primary_names of the model answering every row '''
+        with self._lock:
+            position = self._rng.random(n_rows)
+        if ids is not None:
+            ids = Series(ids).reset_index(drop=True)
+            has_id = ids.notna().to_numpy()
+            position[has_id] = hash_pandas_object(ids[has_id].astype(str), index=False).to_numpy() / 2.0 ** 64
+        return np.minimum(np.searchsorted(self.cumulative_weights, position, side="right"), len(self.primary_names) - 1)
+
+    def _predict(self, name: str, rows: DataFrame, mask: Optional[np.ndarray], transformed: dict) -> tuple:
+        '''(predicted classes, positive class probabilities or None) of model name for the rows of mask, all rows when None.'''
+        model, fingerprint = self.models[name], self.fingerprints[name]
+        if fingerprint is None:
+            subset = rows if mask is None else rows[mask]
+            probabilities = model.predict_proba(subset)[:, 1] if model_has_proba(model) else None
+            return model.predict(subset), probabilities
+
+        if fingerprint in self.shared_fingerprints:
+            if fingerprint not in transformed:
+                transformed[fingerprint] = model.transform(rows)
+            features = transformed[fingerprint] if mask is None else transformed[fingerprint][mask]
+        else:
+            features = model.transform(rows if mask is None else rows[mask])
+        probabilities = model.predict_proba_transformed(features)[:, 1] if model_has_proba(model) else None
+        if model.threshold is not None and probabilities is not None:
+            classes = model.trained_model_object.classes_
+            return np.where(probabilities >= model.threshold, classes[1], classes[0]), probabilities
+        return model.predict_transformed(features), probabilities
+
+    def score(self, rows: DataFrame, ids: Optional[Series] = None) -> tuple:
+        ''' (predicted classes, positive class probabilities, answering model names) of rows '''
+        try:
+            assignment = self.route(len(rows), ids)
+            predictions = np.empty(len(rows), dtype=object)
+            probabilities = np.full(len(rows), np.nan)
+            transformed = {}
+            for index, name in enumerate(self.primary_names):
+                mask = assignment == index
+                if not mask.any():
+                    continue
+                model_predictions, model_probabilities = self._predict(name, rows, mask, transformed)
+                predictions[mask] = model_predictions
+                if model_probabilities is not None:
+                    probabilities[mask] = model_probabilities
+            if self.shadow_names:
+                self._submit_shadow(rows, transformed, predictions, probabilities)
+            return predictions, probabilities, np.array(self.primary_names, dtype=object)[assignment]
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _submit_shadow(self, rows: DataFrame, transformed: dict, predictions: np.ndarray, probabilities: np.ndarray) -> None:
+        with self._lock:
+            if self._pending_shadow_batches >= self.max_pending_shadow_batches:
+                # shadow scoring falls behind the traffic, batches are skipped rather than queued without bound
+                for report in self._shadow_report.values():
+                    report["dropped_batches"] += 1
+                return
+            self._pending_shadow_batches += 1
+        self._shadow_executor.submit(self._score_shadow, rows, dict(transformed), predictions, probabilities)
+
+    def _score_shadow(self, rows: DataFrame, transformed: dict, predictions: np.ndarray, probabilities: np.ndarray) -> None:
+        try:
+            for name in self.shadow_names:
+                shadow_predictions, shadow_probabilities = self._predict(name, rows, None, transformed)
+                with self._lock:
+                    report = self._shadow_report[name]
+                    report["rows"] += len(rows)
+                    report["disagreements"] += int((shadow_predictions != predictions).sum())
+                    if shadow_probabilities is not None:
+                        report["probability_difference_sum"] += float(np.nansum(np.abs(shadow_probabilities - probabilities)))
+        except Exception as e:
+            logging.error(f"Shadow scoring failed: {e}")
+        finally:
+            with self._lock:
+                self._pending_shadow_batches -= 1
+
+    def shadow_report(self) -> dict:
+        ''' Agreement of every shadow model with the answered predictions so far '''
+        with self._lock:
+            return {name: {"rows": report["rows"],
+                           "agreement": 1 - report["disagreements"] / report["rows"] if report["rows"] else None,
+                           "mean_probability_difference": report["probability_difference_sum"] / report["rows"] if report["rows"] else None,
+                           "dropped_batches": report["dropped_batches"]}
+                    for name, report in self._shadow_report.items()}
+
+    def close(self) -> None:
+        if self._shadow_executor is not None:
+            self._shadow_executor.shutdown(wait=True)
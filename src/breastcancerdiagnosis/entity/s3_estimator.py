@@ -1,22 +1,49 @@
 import sys
+import threading
+import numpy as np
 import pandas as pd
+from typing import Optional
 from pandas import DataFrame
 
 from breastcancerdiagnosis.logger.log import logging
 from breastcancerdiagnosis.exception.exception_handler import AppException
 from breastcancerdiagnosis.entity.model import PrepareModel
+from breastcancerdiagnosis.entity.config_entity import ModelCacheConfig, PredictionCacheConfig
 from breastcancerdiagnosis.cloud_storage.aws_storage import SimpleStorageService
+from breastcancerdiagnosis.utils.main_utils import load_object
+from breastcancerdiagnosis.utils.model_cache import ModelCache
+from breastcancerdiagnosis.utils.prediction_cache import PredictionCache, canonical_feature_rows
 
 class ModelEstimator:
-    def __init__(self, bucket_name, model_path):
+    def __init__(self, bucket_name, model_path, model_cache_config: Optional[ModelCacheConfig] = None,
+                 prediction_cache_config: Optional[PredictionCacheConfig] = None):
         try:
             self.bucket_name = bucket_name
             self.model_path = model_path
             self.s3 = SimpleStorageService()
-            self.loaded_model: PrepareModel = None
+            self.model_cache_config = model_cache_config or ModelCacheConfig.from_yaml("config/config.yaml")
+            self.model_cache = ModelCache(self.s3, self.model_cache_config.root_dir,
+                                          max_size_bytes=self.model_cache_config.max_size_mb * 1024 * 1024)
+            prediction_cache_config = prediction_cache_config or PredictionCacheConfig.from_yaml("config/config.yaml")
+            self.prediction_cache = PredictionCache(prediction_cache_config.max_entries, prediction_cache_config.ttl_seconds) \
+                if prediction_cache_config.enabled else None
+            # model and ETag are swapped together in one assignment, a prediction never sees a half loaded version
+            self._loaded: tuple = (None, None)
+            self._load_lock = threading.Lock()
+            self._refresh_stop = threading.Event()
+            self._refresh_thread: Optional[threading.Thread] = None
 
         except Exception as e:
             raise AppException(e, sys) from e 
+
+    @property
+    def loaded_model(self) -> Optional[PrepareModel]:
+        return self._loaded[0]
+
+    @property
+    def model_version(self) -> Optional[str]:
+        ''' ETag of the loaded model '''
+        return self._loaded[1]
         
     def is_model_present(self, model_path):
         try:
@@ -26,11 +53,57 @@ class ModelEstimator:
         
     def load_model(self,) -> PrepareModel:
         try:
-            logging.info("Model loaded")
-            return self.s3.load_model(self.model_path, bucket_name=self.bucket_name)
+            model_file_path, etag = self.model_cache.fetch(self.bucket_name, self.model_path)
+            logging.info(f"Model version {etag} loaded from {model_file_path}")
+            return load_object(model_file_path)
         except Exception as e:
             raise AppException(e, sys) from e  
 
+    def refresh_model(self) -> bool:
+        ''' Revalidates the model against S3 and swaps in a new version when there is one, returns whether it changed '''
+        try:
+            with self._load_lock:
+                model_file_path, etag = self.model_cache.fetch(self.bucket_name, self.model_path)
+                if etag == self.model_version:
+                    return False
+                # loaded aside, predictions keep using the previous model until the swap
+                model = load_object(model_file_path)
+                previous_version = self.model_version
+                self._loaded = (model, etag)
+                if self.prediction_cache is not None:
+                    # entries of the previous version can not be hit anymore, their memory is freed right away
+                    self.prediction_cache.clear()
+                logging.info(f"Model swapped from version {previous_version} to {etag}")
+                return True
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def start_background_refresh(self, interval_seconds: Optional[float] = None) -> None:
+        ''' Revalidates the model every interval_seconds in a daemon thread, refresh_interval_seconds of the config by default '''
+        try:
+            interval_seconds = interval_seconds or self.model_cache_config.refresh_interval_seconds
+            if interval_seconds is None or (self._refresh_thread is not None and self._refresh_thread.is_alive()):
+                return
+            self._refresh_stop.clear()
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, args=(interval_seconds,),
+                                                    name="model-refresh", daemon=True)
+            self._refresh_thread.start()
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _refresh_loop(self, interval_seconds: float) -> None:
+        while not self._refresh_stop.wait(interval_seconds):
+            try:
+                self.refresh_model()
+            except Exception as e:
+                logging.error(f"Model refresh failed, serving version {self.model_version}: {e}")
+
+    def stop_background_refresh(self) -> None:
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
+
     def save_model(self, from_file, remove:bool = False) -> None:
         try:
             self.s3.upload_file(from_file,
@@ -43,9 +116,25 @@ class ModelEstimator:
     def predict(self, dataframe: DataFrame):
         try:
             if self.loaded_model is None:
-                self.loaded_model = self.load_model()
-            
-            return self.loaded_model.predict(dataframe= dataframe)
+                self.refresh_model()
+            model, model_version = self._loaded
+            if self.prediction_cache is None or model.input_columns_ is None:
+                return model.predict(dataframe)
+
+            keys = PredictionCache.row_keys(canonical_feature_rows(dataframe, model.input_columns_), model_version)
+            cached = self.prediction_cache.get_many(keys)
+            missing = [row for row, prediction in enumerate(cached) if prediction is None]
+            if not missing:
+                return np.array(cached)
+            predictions = model.predict(dataframe.iloc[missing])
+            self.prediction_cache.put_many([keys[row] for row in missing], predictions)
+            if len(missing) == len(dataframe):
+                return predictions
+            output = np.empty(len(dataframe), dtype=predictions.dtype)
+            output[missing] = predictions
+            hit_rows = [row for row, prediction in enumerate(cached) if prediction is not None]
+            output[hit_rows] = [cached[row] for row in hit_rows]
+            return output
         
         except Exception as e:
-            raise AppException(e, sys) from e  
\ No newline at end of file
+            raise AppException(e, sys) from e
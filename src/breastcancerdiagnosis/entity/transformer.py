@@ -0,0 +1,122 @@
+import sys
+import numpy as np
+from pandas import DataFrame
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import PowerTransformer
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+
+class YeoJohnsonScaler(BaseEstimator, TransformerMixin):
+    """
+    Yeo-Johnson power transform followed by standardization in one vectorized pass
+    The selected columns are copied once into a contiguous float64 block which is then
+    transformed in place. With include_standardized_input the standardized raw columns are
+    appended, giving the same 2 * n_columns layout as the former PowerTransformer and
+    StandardScaler branches of a ColumnTransformer. For data that does not fit in memory the
+    lambdas can be fitted on a sample with fit_lambdas and the standardization statistics
+    accumulated chunk by chunk with partial_fit.
+    """
+    def __init__(self, columns: list = None, include_standardized_input: bool = False):
+        self.columns = columns
+        self.include_standardized_input = include_standardized_input
+
+    def _to_block(self, X, copy: bool = True) -> np.ndarray:
+        if isinstance(X, DataFrame):
+            columns = self.columns if self.columns is not None else list(X.columns)
+            return np.array(X[columns], dtype=np.float64, order="C")
+        # without copy a C-contiguous float64 array is transformed in place
+        return np.array(X, dtype=np.float64, order="C", copy=copy)
+
+    @staticmethod
+    def _standard_deviation(variance: np.ndarray) -> np.ndarray:
+        scale = np.sqrt(variance)
+        scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+        return scale
+
+    def _yeo_johnson(self, block: np.ndarray) -> np.ndarray:
+        '''Applies the fitted Yeo-Johnson transform to block in place.'''
+        is_negative = block < 0
+        # ((x + 1) ** lambda - 1) / lambda == expm1(lambda * log1p(x)) on each side of zero
+        exponent = np.where(is_negative, 2.0 - self.lambdas_, self.lambdas_)
+        np.abs(block, out=block)
+        np.log1p(block, out=block)
+        is_log = np.abs(exponent) < np.spacing(1.0)
+        safe_exponent = np.where(is_log, 1.0, exponent)
+        transformed = np.expm1(safe_exponent * block)
+        transformed /= safe_exponent
+        np.copyto(block, transformed, where=~is_log)
+        np.negative(block, out=block, where=is_negative)
+        return block
+
+    def fit_lambdas(self, X) -> "YeoJohnsonScaler":
+        '''Estimates the Yeo-Johnson lambdas from X, usually a sample, and resets the standardization statistics.'''
+        try:
+            if isinstance(X, DataFrame):
+                self.feature_names_in_ = np.array(X.columns, dtype=object)
+            block = self._to_block(X)
+            self.n_features_in_ = block.shape[1] if self.columns is None else len(self.columns)
+            self.lambdas_ = PowerTransformer(method="yeo-johnson", standardize=False).fit(block).lambdas_
+            self.n_samples_seen_ = np.zeros(block.shape[1])
+            self.mean_, self.var_ = np.zeros(block.shape[1]), np.zeros(block.shape[1])
+            self.input_mean_, self.input_var_ = np.zeros(block.shape[1]), np.zeros(block.shape[1])
+            return self
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @staticmethod
+    def _merge_moments(count, mean, var, block: np.ndarray) -> tuple:
+        '''Merges the column moments of block into running (count, mean, var), ignoring missing values.'''
+        block_count = (~np.isnan(block)).sum(axis=0)
+        with np.errstate(invalid="ignore"):
+            block_mean = np.where(block_count > 0, np.nanmean(block, axis=0), 0.0)
+            block_var = np.where(block_count > 0, np.nanvar(block, axis=0), 0.0)
+        total = np.maximum(count + block_count, 1)
+        delta = block_mean - mean
+        merged_mean = mean + delta * block_count / total
+        merged_var = (var * count + block_var * block_count + delta ** 2 * count * block_count / total) / total
+        return count + block_count, merged_mean, merged_var
+
+    def partial_fit(self, X, y=None) -> "YeoJohnsonScaler":
+        '''Accumulates the standardization statistics of a chunk, lambdas are fitted on the first chunk if not set.'''
+        try:
+            if not hasattr(self, "lambdas_"):
+                self.fit_lambdas(X)
+            block = self._to_block(X)
+            if self.include_standardized_input:
+                _, self.input_mean_, self.input_var_ = self._merge_moments(self.n_samples_seen_, self.input_mean_,
+                                                                          self.input_var_, block)
+                self.input_scale_ = self._standard_deviation(self.input_var_)
+            self.n_samples_seen_, self.mean_, self.var_ = self._merge_moments(self.n_samples_seen_, self.mean_,
+                                                                             self.var_, self._yeo_johnson(block))
+            self.scale_ = self._standard_deviation(self.var_)
+            return self
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def fit(self, X, y=None):
+        try:
+            self.fit_lambdas(X)
+            return self.partial_fit(X)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def transform(self, X, copy: bool = True) -> np.ndarray:
+        try:
+            block = self._to_block(X, copy=copy)
+            if self.include_standardized_input:
+                standardized_input = (block - self.input_mean_) / self.input_scale_
+            block = self._yeo_johnson(block)
+            block -= self.mean_
+            block /= self.scale_
+            if self.include_standardized_input:
+                return np.hstack([block, standardized_input])
+            return block
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        columns = list(self.columns) if self.columns is not None else [f"x{i}" for i in range(len(self.lambdas_))]
+        names = [f"yeo_johnson__{column}" for column in columns]
+        if self.include_standardized_input:
+            names += [f"standard_scaler__{column}" for column in columns]
+        return np.array(names, dtype=object)
@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import resource
+import warnings
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from pandas import DataFrame
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.entity.config_entity import DataIngestionConfig, BenchmarkConfig
+from breastcancerdiagnosis.entity.model import PrepareModel
+from breastcancerdiagnosis.entity.transformer import YeoJohnsonScaler
+from breastcancerdiagnosis.components.data_ingestion import DataIngestion
+from breastcancerdiagnosis.components.model_trainer import ModelTrainer
+from breastcancerdiagnosis.utils.main_utils import read_yaml_file, write_yaml, read_dataframe, get_schema_dtypes
+from breastcancerdiagnosis.utils.model_search import fit_estimator
+from breastcancerdiagnosis.constants import SCHEMA_FILE_PATH, TARGET_COLUMN
+
+# metrics compared against the baseline, with True when a higher value is better
+BENCHMARK_METRICS: dict = {
+    "fit_seconds": False,
+    "predict_rows_per_second": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "peak_rss_mb": False
+}
+
+
+def upsample_data(dataframe: DataFrame, features: list, n_rows: int, feature_multiplier: int, random_state: int) -> tuple:
+    """
+    WDBC rows resampled with replacement to n_rows, with gaussian noise of 5% of each feature's standard deviation
+    Every feature is repeated feature_multiplier times, each copy with its own noise.
+    """
+    random = np.random.default_rng(random_state)
+    rows = random.integers(0, len(dataframe), size=n_rows)
+    values = dataframe[features].to_numpy(dtype=np.float64)[rows]
+    noise_scale = values.std(axis=0) * 0.05
+    columns = {}
+    for copy in range(feature_multiplier):
+        noisy = values + random.normal(size=values.shape) * noise_scale
+        for position, feature in enumerate(features):
+            columns[feature if copy == 0 else f"{feature}_{copy}"] = noisy[:, position]
+    return DataFrame(columns), dataframe[TARGET_COLUMN].to_numpy()[rows]
+
+
+def _run_benchmark_case(train_file_path: Path, case: dict, latency_samples: int, random_state: int) -> dict:
+    '''Runs one (model, rows, features) case in a fresh process, so that its peak RSS is its own.'''
+    warnings.simplefilter("ignore")
+    schema = read_yaml_file(SCHEMA_FILE_PATH)
+    dataframe = read_dataframe(train_file_path, dtypes=get_schema_dtypes(schema))
+    features = [feature for feature in schema['numerical_columns'] if feature not in schema['drop_columns']]
+    X, y = upsample_data(dataframe, features, case["rows"], case["feature_multiplier"], random_state)
+    y = pd.Series(y).replace(schema['target_mapping']).to_numpy(dtype=np.int64)
+    estimator, fit_options = dict((name, (model, fit_options)) for name, model, _, fit_options
+                                  in ModelTrainer.get_candidate_models())[case["model"]]
+
+    start = time.perf_counter()
+    preprocessor = YeoJohnsonScaler(columns=list(X.columns)).fit(X)
+    preprocess_seconds = time.perf_counter() - start
+    X_transformed = preprocessor.transform(X)
+    start = time.perf_counter()
+    fit_estimator(estimator, X_transformed, y, fit_options)
+    fit_seconds = time.perf_counter() - start
+
+    prepare_model = PrepareModel(preprocessing_object=preprocessor, trained_model_object=estimator)
+    start = time.perf_counter()
+    prepare_model.predict(X)
+    predict_seconds = time.perf_counter() - start
+
+    single_rows = [X.iloc[[row]] for row in np.random.default_rng(random_state).integers(0, len(X), size=latency_samples)]
+    for row in single_rows[:10]:
+        # warm up code paths and caches before timing
+        prepare_model.predict(row)
+    latencies = np.empty(latency_samples)
+    for position, row in enumerate(single_rows):
+        start = time.perf_counter()
+        prepare_model.predict(row)
+        latencies[position] = time.perf_counter() - start
+
+    return dict(case, **{
+        "features": X.shape[1],
+        "preprocess_seconds": preprocess_seconds,
+        "fit_seconds": fit_seconds,
+        "predict_rows_per_second": len(X) / predict_seconds,
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    })
+
+
+class BenchmarkPipeline:
+    """
+    Training and prediction microbenchmarks of the ModelTrainer candidate models
+    The WDBC training data is upsampled to every configured size and feature count, and each
+    model is fitted and wrapped in a PrepareModel to time batch prediction and single row
+    latency. Every case runs in its own spawned process. Results are written to results_file
+    and compared against baseline_file, flagging metrics worse than regression_tolerance.
+    """
+    def __init__(self):
+        try:
+            self.data_ingestion_config = DataIngestionConfig.from_yaml("config/config.yaml")
+            self.benchmark_config = BenchmarkConfig.from_yaml("config/config.yaml")
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def run_benchmarks(self, train_file_path: Path) -> list:
+        try:
+            cases = [{"model": model, "rows": rows, "feature_multiplier": feature_multiplier}
+                     for model in self.benchmark_config.models
+                     for rows in self.benchmark_config.rows
+                     for feature_multiplier in self.benchmark_config.feature_multipliers]
+            results = []
+            for case in cases:
+                # a fresh spawned process per case, a forked or reused one would carry over the memory of earlier cases
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    result = pool.submit(_run_benchmark_case, train_file_path, case, self.benchmark_config.latency_samples,
+                                         self.benchmark_config.random_state).result()
+                logging.info(f"Benchmark {result['model']} rows={result['rows']} features={result['features']}: "
+                             f"fit {result['fit_seconds']:.3f}s, {result['predict_rows_per_second']:.0f} rows/s, "
+                             f"p50 {result['latency_p50_ms']:.3f}ms, p99 {result['latency_p99_ms']:.3f}ms, "
+                             f"peak RSS {result['peak_rss_mb']:.1f}MB")
+                results.append(result)
+            return results
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def compare_with_baseline(self, results: list, baseline: list) -> list:
+        ''' Metrics of results worse than the matching baseline case by more than regression_tolerance '''
+        try:
+            tolerance = self.benchmark_config.regression_tolerance
+            baseline_cases = {(case["model"], case["rows"], case["features"]): case for case in baseline}
+            regressions = []
+            for result in results:
+                base = baseline_cases.get((result["model"], result["rows"], result["features"]))
+                if base is None:
+                    continue
+                for metric, higher_is_better in BENCHMARK_METRICS.items():
+                    if higher_is_better:
+                        regressed = result[metric] < base[metric] / (1 + tolerance)
+                    else:
+                        regressed = result[metric] > base[metric] * (1 + tolerance)
+                    if regressed:
+                        regressions.append({"model": result["model"], "rows": result["rows"], "features": result["features"],
+                                            "metric": metric, "baseline": base[metric], "current": result[metric]})
+            return regressions
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def run_pipeline(self, save_baseline: bool = False) -> list:
+        ''' Runs the benchmarks and returns the regressions against the stored baseline '''
+        try:
+            train_file_path = DataIngestion(config=self.data_ingestion_config).initiate_data_ingestion().train_file_path
+            results = self.run_benchmarks(train_file_path)
+
+            results_path = Path(os.path.join(self.benchmark_config.root_dir, self.benchmark_config.results_file))
+            baseline_path = Path(os.path.join(self.benchmark_config.root_dir, self.benchmark_config.baseline_file))
+            write_yaml(file_path=results_path, content=results, replace=True)
+            logging.info(f"Benchmark results saved at: {results_path}")
+
+            regressions = []
+            if os.path.exists(baseline_path):
+                regressions = self.compare_with_baseline(results, read_yaml_file(baseline_path))
+                for regression in regressions:
+                    logging.warning(f"Benchmark regression {regression['model']} rows={regression['rows']} "
+                                    f"features={regression['features']} {regression['metric']}: "
+                                    f"{regression['baseline']:.4f} -> {regression['current']:.4f}")
+            if save_baseline:
+                write_yaml(file_path=baseline_path, content=results, replace=True)
+                logging.info(f"Benchmark baseline saved at: {baseline_path}")
+            return regressions
+        except Exception as e:
+            raise AppException(e, sys) from e
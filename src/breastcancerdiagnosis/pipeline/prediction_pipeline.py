@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import numpy as np
+from pathlib import Path
+from collections import deque
+from pandas import DataFrame
+from concurrent.futures import ProcessPoolExecutor
+from joblib import effective_n_jobs
+from threadpoolctl import threadpool_limits
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.entity.config_entity import PredictionPipelineConfig
+from breastcancerdiagnosis.entity.compiled_model import CompiledModel
+from breastcancerdiagnosis.entity.model_router import ModelRouter, model_input_columns, model_has_proba
+from breastcancerdiagnosis.utils.main_utils import load_object, read_yaml_file, write_yaml, iter_dataframe_chunks
+from breastcancerdiagnosis.utils.schema_validator import SchemaValidator
+from breastcancerdiagnosis.constants import SCHEMA_FILE_PATH, ID_COLUMN
+
+PROGRESS_FILE_SUFFIX: str = ".progress.yaml"
+
+# model and schema of the current scoring worker process, set once per worker by _init_worker
+_worker_state = {}
+
+
+def load_prediction_model(model_file_path: Path):
+    """
+    Model scoring raw feature rows: a CompiledModel for a .npz file, the pickled PrepareModel otherwise
+    """
+    try:
+        if Path(model_file_path).suffix == ".npz":
+            return CompiledModel.load(model_file_path)
+        return load_object(model_file_path)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def get_model_file_path(prediction_config: PredictionPipelineConfig) -> Path:
+    ''' The compiled model when one was exported, the pickled model otherwise '''
+    if os.path.exists(prediction_config.model_file_path):
+        return Path(prediction_config.model_file_path)
+    logging.info(f"No compiled model at {prediction_config.model_file_path}, using the pickled model")
+    return Path(prediction_config.fallback_model_file_path)
+
+
+def score_dataframe(model, validator: SchemaValidator, labels: dict, chunk: DataFrame, first_row: int = 0) -> DataFrame:
+    """
+    Validates and scores the rows of chunk, rows failing validation get no prediction
+    Returns the input row numbers, the id when present, the predicted labels, the positive
+    class probabilities when the model has them, the answering model of a ModelRouter and
+    the row validity.
+    """
+    try:
+        feature_columns = model_input_columns(model)
+        errors, row_valid = validator.validate_feature_chunk(chunk, feature_columns)
+        if errors:
+            logging.warning(f"Chunk starting at row {first_row} failed validation: {errors}")
+
+        output = {"row": np.arange(first_row, first_row + len(chunk))}
+        if ID_COLUMN in chunk.columns:
+            output[ID_COLUMN] = chunk[ID_COLUMN].to_numpy()
+        predictions = np.full(len(chunk), None, dtype=object)
+        probabilities = np.full(len(chunk), np.nan)
+        served_by = np.full(len(chunk), None, dtype=object)
+        if row_valid.any():
+            valid_rows = chunk.loc[row_valid, feature_columns]
+            if isinstance(model, ModelRouter):
+                ids = chunk.loc[row_valid, ID_COLUMN] if ID_COLUMN in chunk.columns else None
+                codes, probabilities[row_valid], served_by[row_valid] = model.score(valid_rows, ids)
+            else:
+                if model_has_proba(model):
+                    probabilities[row_valid] = model.predict_proba(valid_rows)[:, 1]
+                codes = model.predict(valid_rows)
+            predictions[row_valid] = [labels.get(int(code), code) for code in codes]
+        output["prediction"] = predictions
+        if model_has_proba(model):
+            output["probability"] = probabilities
+        if isinstance(model, ModelRouter):
+            output["model"] = served_by
+        output["valid"] = row_valid
+        return DataFrame(output)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def get_prediction_labels(schema: dict) -> dict:
+    ''' Encoded class -> label of the target_mapping in schema.yaml '''
+    return {code: label for label, code in schema['target_mapping'].items()}
+
+
+def _init_worker(model_file_path: Path) -> None:
+    # parallelism comes from the worker processes, numpy runs single threaded in each of them
+    threadpool_limits(limits=1)
+    schema = read_yaml_file(SCHEMA_FILE_PATH)
+    _worker_state["model"] = load_prediction_model(model_file_path)
+    _worker_state["validator"] = SchemaValidator(schema)
+    _worker_state["labels"] = get_prediction_labels(schema)
+
+
+def _score_chunk(first_row: int, chunk: DataFrame) -> DataFrame:
+    return score_dataframe(_worker_state["model"], _worker_state["validator"], _worker_state["labels"], chunk, first_row)
+
+
+class PredictionPipeline:
+    """
+    Streaming batch scoring of a csv, parquet or feather file
+    The input is read chunk_size rows at a time and every chunk is validated against
+    config/schema.yaml and scored in a pool of n_jobs processes, each loading the model
+    once. At most max_pending_chunks chunks are in flight, and results are appended to the
+    output csv in input order as soon as the oldest chunk is done. After every chunk the
+    progress (chunks and bytes written) is saved next to the output, so an interrupted run
+    resumes after the last written chunk when the input, chunk size and model are unchanged.
+    """
+    def __init__(self, model_file_path: Path = None):
+        try:
+            self.prediction_config = PredictionPipelineConfig.from_yaml("config/config.yaml")
+            self.model_file_path = Path(model_file_path or get_model_file_path(self.prediction_config))
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def get_run_fingerprint(self, input_file_path: Path) -> dict:
+        ''' Identity of a scoring run, progress is only resumed for the same input, chunking and model '''
+        try:
+            input_stat, model_stat = os.stat(input_file_path), os.stat(self.model_file_path)
+            return {
+                "input_file": str(Path(input_file_path).resolve()),
+                "input_size": input_stat.st_size,
+                "input_mtime_ns": input_stat.st_mtime_ns,
+                "chunk_size": self.prediction_config.chunk_size,
+                "model_file": str(self.model_file_path.resolve()),
+                "model_mtime_ns": model_stat.st_mtime_ns
+            }
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def load_progress(self, progress_file_path: Path, output_file_path: Path, fingerprint: dict, resume: bool = True) -> dict:
+        ''' Progress of an interrupted run of the same fingerprint, a fresh progress otherwise '''
+        try:
+            if resume and os.path.exists(progress_file_path) and os.path.exists(output_file_path):
+                progress = read_yaml_file(progress_file_path)
+                if progress and progress.get("fingerprint") == fingerprint:
+                    return progress
+            return {"fingerprint": fingerprint, "chunks_done": 0, "rows_done": 0, "invalid_rows": 0,
+                    "output_bytes": 0, "completed": False}
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @staticmethod
+    def save_progress(progress_file_path: Path, progress: dict) -> None:
+        # written aside and renamed, an interruption never leaves a truncated progress file
+        temporary_path = Path(f"{progress_file_path}.tmp")
+        write_yaml(file_path=temporary_path, content=progress, replace=True)
+        os.replace(temporary_path, progress_file_path)
+
+    def run_pipeline(self, input_file_path: Path, output_file_path: Path, resume: bool = True) -> dict:
+        ''' Scores input_file_path into the output_file_path csv and returns the run summary '''
+        try:
+            start = time.perf_counter()
+            output_file_path = Path(output_file_path)
+            progress_file_path = Path(f"{output_file_path}{PROGRESS_FILE_SUFFIX}")
+            fingerprint = self.get_run_fingerprint(input_file_path)
+            progress = self.load_progress(progress_file_path, output_file_path, fingerprint, resume=resume)
+            if progress["completed"]:
+                logging.info(f"Predictions of {input_file_path} already complete in {output_file_path}")
+                return progress
+            resumed_chunks, resumed_rows = progress["chunks_done"], progress["rows_done"]
+            if resumed_chunks:
+                logging.info(f"Resuming prediction of {input_file_path} after {resumed_chunks} chunks "
+                             f"({progress['rows_done']} rows)")
+
+            os.makedirs(output_file_path.parent, exist_ok=True)
+            n_workers = max(1, effective_n_jobs(self.prediction_config.n_jobs))
+            max_pending_chunks = self.prediction_config.max_pending_chunks or 2 * n_workers
+            with open(output_file_path, "a+b") as output_file, \
+                    ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                        initargs=(self.model_file_path,)) as pool:
+                # anything written after the last saved progress belongs to a chunk that is scored again
+                output_file.truncate(progress["output_bytes"])
+                output_file.seek(progress["output_bytes"])
+
+                def write_oldest(pending: deque) -> None:
+                    predictions = pending.popleft().result()
+                    predictions.to_csv(output_file, mode="ab", header=progress["output_bytes"] == 0, index=False)
+                    output_file.flush()
+                    os.fsync(output_file.fileno())
+                    progress["chunks_done"] += 1
+                    progress["rows_done"] += len(predictions)
+                    progress["invalid_rows"] += int((~predictions["valid"]).sum())
+                    progress["output_bytes"] = output_file.tell()
+                    self.save_progress(progress_file_path, progress)
+
+                pending, first_row = deque(), 0
+                for chunk_index, chunk in enumerate(iter_dataframe_chunks(input_file_path,
+                                                                          chunk_size=self.prediction_config.chunk_size)):
+                    if chunk_index >= resumed_chunks:
+                        pending.append(pool.submit(_score_chunk, first_row, chunk))
+                        if len(pending) >= max_pending_chunks:
+                            write_oldest(pending)
+                    first_row += len(chunk)
+                while pending:
+                    write_oldest(pending)
+
+            progress["completed"] = True
+            self.save_progress(progress_file_path, progress)
+            seconds = time.perf_counter() - start
+            logging.info(f"Scored {progress['rows_done'] - resumed_rows} rows of {input_file_path} into {output_file_path} "
+                         f"in {seconds:.1f}s with {n_workers} workers, {progress['invalid_rows']} rows failed validation")
+            return progress
+        except Exception as e:
+            raise AppException(e, sys) from e
@@ -0,0 +1,160 @@
+import io
+import os
+import sys
+import json
+import pandas as pd
+from pathlib import Path
+from dataclasses import dataclass
+from pandas import DataFrame
+from concurrent.futures import ThreadPoolExecutor
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.entity.config_entity import AppConfig, PredictionPipelineConfig
+from breastcancerdiagnosis.entity.model_router import ModelRouter
+from breastcancerdiagnosis.pipeline.prediction_pipeline import (load_prediction_model, get_model_file_path, model_input_columns,
+                                                                score_dataframe, get_prediction_labels)
+from breastcancerdiagnosis.utils.main_utils import read_yaml_file
+from breastcancerdiagnosis.utils.micro_batcher import MicroBatcher
+from breastcancerdiagnosis.utils.schema_validator import SchemaValidator
+from breastcancerdiagnosis.utils.shared_arrays import model_arrays_digest
+from breastcancerdiagnosis.constants import SCHEMA_FILE_PATH
+
+
+def to_json_records(predictions: DataFrame) -> list:
+    ''' Prediction rows as JSON ready dicts, missing values become None '''
+    return predictions.astype(object).where(predictions.notna(), None).to_dict("records")
+
+
+class BulkRequestError(Exception):
+    ''' A bulk request the service refuses, with the HTTP status code it is answered with '''
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class ServedModel:
+    model: object
+    model_file_paths: dict
+    # weights digest taken when the model was loaded, workers forked from the loading process compare theirs with it
+    model_version: str
+
+
+def load_served_model(app_config: AppConfig, prediction_config: PredictionPipelineConfig, model_file_path: Path = None) -> ServedModel:
+    ''' The ModelRouter of the app.models when there are some, the model_file_path or configured prediction model otherwise '''
+    try:
+        if app_config.models and model_file_path is None:
+            model_file_paths = {entry["name"]: Path(entry["model_file_path"]) for entry in app_config.models}
+            model = ModelRouter({name: load_prediction_model(path) for name, path in model_file_paths.items()},
+                                weights={entry["name"]: entry.get("weight", 0) for entry in app_config.models},
+                                shadow_models=[entry["name"] for entry in app_config.models if entry.get("shadow")],
+                                max_pending_shadow_batches=app_config.max_pending_shadow_batches)
+        else:
+            model_file_paths = {"model": Path(model_file_path or get_model_file_path(prediction_config))}
+            model = load_prediction_model(model_file_paths["model"])
+        logging.info(f"Loaded served models {model_file_paths}")
+        return ServedModel(model=model, model_file_paths=model_file_paths, model_version=model_arrays_digest(model))
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+class PredictionService:
+    """
+    Online scoring behind the inference API
+    Holds the model, loaded once, the schema validator and the threads batches are scored
+    in. Single records go through a MicroBatcher, so concurrent requests share one
+    vectorized predict call; bulk requests are scored directly as one DataFrame, built and
+    serialized in a scoring thread so the event loop never touches the rows. When
+    app.models lists several models they are served by a ModelRouter. A pre-fork worker
+    gets the served_model its parent loaded instead of loading its own.
+    """
+    def __init__(self, app_config: AppConfig, prediction_config: PredictionPipelineConfig, model_file_path: Path = None,
+                 served_model: ServedModel = None):
+        try:
+            self.app_config = app_config
+            schema = read_yaml_file(SCHEMA_FILE_PATH)
+            self.served_model = served_model or load_served_model(app_config, prediction_config, model_file_path)
+            self.model = self.served_model.model
+            self.model_file_paths = self.served_model.model_file_paths
+            # recomputed from the weights this process sees, a worker reading other pages than its parent shows up in /health
+            self.model_version = model_arrays_digest(self.model)
+            self.feature_columns = model_input_columns(self.model)
+            self.validator = SchemaValidator(schema)
+            self.labels = get_prediction_labels(schema)
+            self.executor = ThreadPoolExecutor(max_workers=app_config.n_threads, thread_name_prefix="scoring")
+            self.batcher = MicroBatcher(self.score_records, max_batch_size=app_config.max_batch_size,
+                                        max_wait_seconds=app_config.max_wait_ms / 1000, executor=self.executor)
+            logging.info(f"Prediction service of process {os.getpid()} serving model version {self.model_version}")
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def check_record(self, record: dict) -> list:
+        ''' Problems that would make a record spoil the batch it joins: missing or non numeric features '''
+        problems = [f"missing feature {column}" for column in self.feature_columns if column not in record]
+        problems += [f"feature {column} is not a number" for column in self.feature_columns if column in record
+                     and record[column] is not None
+                     and (isinstance(record[column], bool) or not isinstance(record[column], (int, float)))]
+        return problems
+
+    def score_frame(self, dataframe: DataFrame) -> DataFrame:
+        try:
+            return score_dataframe(self.model, self.validator, self.labels, dataframe)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def score_records(self, records: list) -> list:
+        ''' Scores a micro-batch of records in a scoring thread, one result dict per record '''
+        try:
+            predictions = self.score_frame(DataFrame.from_records(records))
+            return to_json_records(predictions.drop(columns=["row"]))
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _score_bulk_frame(self, dataframe: DataFrame) -> DataFrame:
+        if len(dataframe) > self.app_config.max_bulk_rows:
+            raise BulkRequestError(413, f"{len(dataframe)} rows, at most {self.app_config.max_bulk_rows} per request")
+        return self.score_frame(dataframe)
+
+    def score_records_bulk(self, records: list) -> bytes:
+        ''' Scores a bulk request of feature records in a scoring thread, returns the JSON body of the response '''
+        try:
+            predictions = self._score_bulk_frame(DataFrame.from_records(records))
+            return json.dumps({"predictions": to_json_records(predictions)}, allow_nan=False).encode()
+        except BulkRequestError:
+            raise
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def score_csv_bulk(self, content: bytes) -> bytes:
+        ''' Scores an uploaded csv of feature rows in a scoring thread, returns the prediction csv '''
+        try:
+            try:
+                dataframe = pd.read_csv(io.BytesIO(content))
+            except (ValueError, pd.errors.ParserError) as e:
+                raise BulkRequestError(422, f"unreadable csv: {e}") from e
+            return self._score_bulk_frame(dataframe).to_csv(index=False).encode()
+        except BulkRequestError:
+            raise
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def describe(self) -> dict:
+        ''' Served model files and versions, with the traffic shares and shadow agreement of a ModelRouter '''
+        description = {"pid": os.getpid(), "model_version": self.model_version,
+                       "expected_model_version": self.served_model.model_version,
+                       "model_files": {name: str(path) for name, path in self.model_file_paths.items()},
+                       "features": len(self.feature_columns)}
+        if isinstance(self.model, ModelRouter):
+            description["traffic_shares"] = self.model.traffic_shares
+            description["shadow"] = self.model.shadow_report()
+        return description
+
+    async def predict_record(self, record: dict) -> dict:
+        return await self.batcher.submit(record)
+
+    async def close(self) -> None:
+        await self.batcher.close()
+        self.executor.shutdown(wait=True)
+        if isinstance(self.model, ModelRouter):
+            self.model.close()
@@ -0,0 +1,93 @@
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import uvicorn
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.logger.log import logging
+
+# a worker exiting sooner than this after its fork is restarted with a delay, not in a tight loop
+MIN_WORKER_UPTIME_SECONDS: float = 5.0
+
+
+class PreforkServer:
+    """
+    Serves an ASGI app from n_workers processes forked from one parent
+    Whatever the parent loaded before run, typically the model with its arrays moved to
+    shared memory, is inherited by every worker instead of being loaded once per worker.
+    The parent binds the listening socket, freezes the garbage collector so the collector
+    of a worker never writes to the inherited objects, forks the workers and restarts any
+    worker that exits until it receives SIGTERM or SIGINT, which it forwards to them.
+    """
+    def __init__(self, app, host: str, port: int, n_workers: int):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.n_workers = n_workers
+        self._workers = {}
+        self._stopping = False
+
+    def _bind(self) -> socket.socket:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(2048)
+        listener.set_inheritable(True)
+        return listener
+
+    def _spawn(self, listener: socket.socket) -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                uvicorn.Server(uvicorn.Config(self.app, log_level="info")).run(sockets=[listener])
+            except BaseException as e:
+                logging.error(f"Worker {os.getpid()} failed: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self._workers[pid] = time.monotonic()
+        logging.info(f"Started worker {pid}")
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                continue
+
+    def run(self) -> None:
+        try:
+            listener = self._bind()
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            gc.collect()
+            gc.freeze()
+            logging.info(f"Pre-fork server on {self.host}:{self.port} starting {self.n_workers} workers")
+            for _ in range(self.n_workers):
+                self._spawn(listener)
+
+            while self._workers:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                started = self._workers.pop(pid, None)
+                if started is None or self._stopping:
+                    continue
+                logging.warning(f"Worker {pid} exited with status {status}, restarting it")
+                if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+                    time.sleep(MIN_WORKER_UPTIME_SECONDS)
+                if not self._stopping:
+                    self._spawn(listener)
+            listener.close()
+            logging.info("Pre-fork server stopped")
+        except Exception as e:
+            raise AppException(e, sys) from e
@@ -4,15 +4,20 @@ from breastcancerdiagnosis.logger.log import logging
 from breastcancerdiagnosis.entity.config_entity import (DataIngestionConfig, 
                                                         DataValidationConfig, 
                                                         DataTransformationConfig, 
-                                                        ModelTrainerConfig)
+                                                        ModelTrainerConfig,
+                                                        ModelExportConfig,
+                                                        TrainingPipelineConfig)
 from breastcancerdiagnosis.entity.artifact_entity import (DataIngestionArtifact, 
                                                         DataValidationArtifact, 
                                                         DataTransformationArtifact, 
-                                                        ModelTrainerArtifact)
+                                                        ModelTrainerArtifact,
+                                                        ModelExportArtifact)
 from breastcancerdiagnosis.components.data_ingestion import DataIngestion
 from breastcancerdiagnosis.components.data_validation import DataValidation
 from breastcancerdiagnosis.components.data_transformation import DataTransformation
 from breastcancerdiagnosis.components.model_trainer import ModelTrainer
+from breastcancerdiagnosis.components.model_exporter import ModelExporter
+from breastcancerdiagnosis.utils.artifact_cache import ArtifactCache
 
 class TrainingPipeline:
     def __init__(self):
@@ -21,6 +26,10 @@ class TrainingPipeline:
             self.data_validation_config = DataValidationConfig.from_yaml("config/config.yaml")
             self.data_transformation_config = DataTransformationConfig.from_yaml("config/config.yaml")
             self.model_trainer_config = ModelTrainerConfig.from_yaml("config/config.yaml")
+            self.model_export_config = ModelExportConfig.from_yaml("config/config.yaml")
+            self.training_pipeline_config = TrainingPipelineConfig.from_yaml("config/config.yaml")
+            ''' Parsed DataFrames, arrays and fitted objects shared between the stages of this run '''
+            self.artifact_cache = ArtifactCache(max_size_bytes=self.training_pipeline_config.artifact_cache_max_size_mb * 1024 * 1024)
         except Exception as e:
             raise AppException(e, sys) from e
 
@@ -43,7 +52,8 @@ class TrainingPipeline:
             logging.info("Starting data validation")
             data_validation = DataValidation(
                 data_validation_config=self.data_validation_config,
-                data_ingestion_artifact=data_ingestion_artifact
+                data_ingestion_artifact=data_ingestion_artifact,
+                artifact_cache=self.artifact_cache
             )
 
             data_validation_artifact = data_validation.initiate_data_validation()
@@ -64,7 +74,8 @@ class TrainingPipeline:
             data_transformation = DataTransformation(
                 data_transformation_config=data_transformation_config,
                 data_validation_artifact=data_validation_artifact,
-                data_ingestion_artifact=data_ingestion_artifact
+                data_ingestion_artifact=data_ingestion_artifact,
+                artifact_cache=self.artifact_cache
             )
             data_transformation_artifact = data_transformation.initiate_data_transformation()
             logging.info("Data transformation completed")
@@ -80,7 +91,8 @@ class TrainingPipeline:
             logging.info("Starting model training")
             model_trainer = ModelTrainer(
                 model_trainer_config=self.model_trainer_config,
-                data_transformation_artifact=data_transformation_artifact
+                data_transformation_artifact=data_transformation_artifact,
+                artifact_cache=self.artifact_cache
             )
             model_trainer_artifact = model_trainer.initiate_model_trainer()
             logging.info("Model training completed")
@@ -90,6 +102,24 @@ class TrainingPipeline:
         except Exception as e:
             raise AppException(e, sys) from e
 
+    def start_model_export(self, model_trainer_artifact: ModelTrainerArtifact,
+                           data_ingestion_artifact: DataIngestionArtifact) -> ModelExportArtifact:
+        '''Compiles the trained model into the numpy only artifact and returns the artifact.'''
+        try:
+            logging.info("Starting model export")
+            model_exporter = ModelExporter(
+                model_export_config=self.model_export_config,
+                model_trainer_artifact=model_trainer_artifact,
+                data_ingestion_artifact=data_ingestion_artifact
+            )
+            model_export_artifact = model_exporter.initiate_model_export()
+            logging.info("Model export completed")
+
+            return model_export_artifact
+
+        except Exception as e:
+            raise AppException(e, sys) from e
+
     def run_pipeline(self):
         try:
             ''' Run the training pipeline steps '''
@@ -117,5 +147,12 @@ class TrainingPipeline:
                 data_transformation_artifact=data_transformation_artifact
             )
 
+            ''' Model Export '''
+            model_export_artifact = self.start_model_export(
+                model_trainer_artifact=model_trainer_artifact,
+                data_ingestion_artifact=data_ingestion_artifact
+            )
+            logging.info(f"Model Export Artifact: {model_export_artifact}")
+
         except Exception as e:
             raise AppException(e, sys) from e
\ No newline at end of file
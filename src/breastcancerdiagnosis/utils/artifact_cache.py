@@ -0,0 +1,106 @@
+import os
+import sys
+import dill
+import threading
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from typing import Callable, Optional
+from pandas import DataFrame
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.utils.main_utils import read_dataframe
+
+
+def estimate_size(obj: object) -> int:
+    """
+    Approximate in-memory size of a cached artifact in bytes
+    """
+    if isinstance(obj, DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_size(item) for item in obj)
+    return len(dill.dumps(obj))
+
+
+class ArtifactCache:
+    """
+    Run-scoped in-memory cache of artifacts shared between pipeline stages
+    Entries are keyed by the file they were read from or written to, including its size and
+    modification time, so a file changed on disk is never served from memory. Least recently
+    used entries are evicted once the cached objects exceed max_size_bytes. Cached objects are
+    shared between stages and must not be modified in place.
+    """
+    def __init__(self, max_size_bytes: int):
+        self.max_size_bytes = max_size_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_key(file_path: Path, variant: Optional[tuple] = None) -> tuple:
+        stat = os.stat(file_path)
+        return (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns, variant)
+
+    def get(self, file_path: Path, variant: Optional[tuple] = None) -> Optional[object]:
+        try:
+            if not os.path.exists(file_path):
+                return None
+            key = self.file_key(file_path, variant)
+            with self._lock:
+                if key not in self._entries:
+                    return None
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def put(self, file_path: Path, value: object, variant: Optional[tuple] = None) -> None:
+        '''Caches value as the parsed content of file_path, which must exist on disk.'''
+        try:
+            key = self.file_key(file_path, variant)
+            size = estimate_size(value)
+            if size > self.max_size_bytes:
+                logging.info(f"Not caching {file_path}: {size} bytes exceeds the artifact cache size")
+                return
+            with self._lock:
+                if key in self._entries:
+                    self._size -= self._entries.pop(key)[1]
+                self._entries[key] = (value, size)
+                self._size += size
+                while self._size > self.max_size_bytes:
+                    evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                    self._size -= evicted_size
+                    logging.info(f"Evicted {evicted_key[0]} from artifact cache")
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def get_or_load(self, file_path: Path, loader: Callable[[], object], variant: Optional[tuple] = None) -> object:
+        '''Returns the cached artifact of file_path or loads it from disk with loader and caches it.'''
+        try:
+            value = self.get(file_path, variant)
+            if value is not None:
+                return value
+            with self._lock:
+                self.misses += 1
+            value = loader()
+            self.put(file_path, value, variant)
+            return value
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def read_dataframe(self, file_path: Path, columns: Optional[list] = None, dtypes: Optional[dict] = None) -> DataFrame:
+        '''Reads a data file through the cache, projecting from the full DataFrame when that is already cached.'''
+        try:
+            dataframe = self.get(file_path)
+            if dataframe is not None:
+                return dataframe if columns is None else dataframe[columns]
+            return self.get_or_load(file_path, lambda: read_dataframe(file_path, columns=columns, dtypes=dtypes),
+                                    variant=None if columns is None else tuple(columns))
+        except Exception as e:
+            raise AppException(e, sys) from e
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import shutil
+from pathlib import Path
+from typing import Optional
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.utils.main_utils import read_yaml_file, write_yaml, compute_file_sha256
+
+
+class DatasetCache:
+    """
+    Local content-addressed cache for downloaded source files.
+    Files are stored once under <cache_dir>/blobs/<sha256>; the index maps a
+    source url and revision to the blob digest. Least recently used entries are
+    evicted once the blobs exceed max_size_bytes.
+    """
+    INDEX_FILE_NAME: str = "index.yaml"
+    BLOB_DIR_NAME: str = "blobs"
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int):
+        try:
+            self.cache_dir = Path(cache_dir)
+            self.max_size_bytes = max_size_bytes
+            self.blob_dir = self.cache_dir / self.BLOB_DIR_NAME
+            self.index_file_path = self.cache_dir / self.INDEX_FILE_NAME
+            os.makedirs(self.blob_dir, exist_ok=True)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @staticmethod
+    def entry_key(source_url: str, revision: str) -> str:
+        return f"{source_url}@{revision}"
+
+    def _read_index(self) -> dict:
+        if not os.path.exists(self.index_file_path):
+            return {}
+        return read_yaml_file(self.index_file_path) or {}
+
+    def _write_index(self, index: dict) -> None:
+        write_yaml(file_path=self.index_file_path, content=index, replace=True)
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.blob_dir / sha256
+
+    def lookup(self, source_url: str, revision: Optional[str] = None) -> Optional[dict]:
+        '''Returns the cache entry for source_url at revision, or the most recent one when revision is None.'''
+        try:
+            index = self._read_index()
+            if revision is not None:
+                entry = index.get(self.entry_key(source_url, revision))
+            else:
+                entries = [entry for entry in index.values() if entry["source_url"] == source_url]
+                entry = max(entries, key=lambda item: item["last_access"]) if entries else None
+
+            if entry is None or not os.path.exists(self._blob_path(entry["sha256"])):
+                return None
+
+            entry["last_access"] = time.time()
+            index[self.entry_key(entry["source_url"], entry["revision"])] = entry
+            self._write_index(index)
+            return entry
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def add(self, source_url: str, revision: str, file_path: Path) -> dict:
+        '''Stores file_path in the cache under its SHA-256 digest and records it for source_url at revision.'''
+        try:
+            sha256 = compute_file_sha256(file_path)
+            blob_path = self._blob_path(sha256)
+            if not os.path.exists(blob_path):
+                tmp_path = blob_path.with_suffix(".tmp")
+                shutil.copyfile(file_path, tmp_path)
+                os.replace(tmp_path, blob_path)
+
+            entry = {
+                "source_url": source_url,
+                "revision": revision,
+                "sha256": sha256,
+                "size": os.path.getsize(blob_path),
+                "last_access": time.time()
+            }
+            index = self._read_index()
+            index[self.entry_key(source_url, revision)] = entry
+            self._write_index(index)
+            logging.info(f"Cached {source_url}@{revision} as {sha256}")
+
+            self.evict(keep=sha256)
+            return entry
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def materialize(self, entry: dict, destination: Path) -> Path:
+        '''Copies the cached blob of entry to destination unless an identical file is already there.'''
+        try:
+            destination = Path(destination)
+            if os.path.exists(destination) and os.path.getsize(destination) == entry["size"] \
+                    and compute_file_sha256(destination) == entry["sha256"]:
+                return destination
+
+            os.makedirs(destination.parent, exist_ok=True)
+            shutil.copyfile(self._blob_path(entry["sha256"]), destination)
+            return destination
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        '''Removes least recently used entries until the blobs fit in max_size_bytes.'''
+        try:
+            index = self._read_index()
+            blob_sizes = {entry["sha256"]: entry["size"] for entry in index.values()}
+            total_size = sum(blob_sizes.values())
+
+            for key, entry in sorted(index.items(), key=lambda item: item[1]["last_access"]):
+                if total_size <= self.max_size_bytes:
+                    break
+                if entry["sha256"] == keep:
+                    continue
+                del index[key]
+                if all(other["sha256"] != entry["sha256"] for other in index.values()):
+                    blob_path = self._blob_path(entry["sha256"])
+                    if os.path.exists(blob_path):
+                        os.remove(blob_path)
+                    total_size -= blob_sizes[entry["sha256"]]
+                logging.info(f"Evicted {key} from dataset cache")
+
+            self._write_index(index)
+        except Exception as e:
+            raise AppException(e, sys) from e
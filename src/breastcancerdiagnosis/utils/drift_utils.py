@@ -0,0 +1,160 @@
+import sys
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import kstwo
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+
+def encode_drift_matrices(base_dataframe: DataFrame, current_dataframe: DataFrame) -> tuple:
+    """
+    Convert both dataframes to float matrices with the same column order
+    Non numeric columns are replaced by their rank in the sorted union of values,
+    which keeps the KS statistic of the original values
+    return: base matrix, current matrix and the column names
+    """
+    try:
+        columns = list(base_dataframe.columns)
+        base_matrix = np.empty((len(base_dataframe), len(columns)), dtype=np.float64)
+        current_matrix = np.empty((len(current_dataframe), len(columns)), dtype=np.float64)
+        for position, column in enumerate(columns):
+            base_values, current_values = base_dataframe[column], current_dataframe[column]
+            if not (pd.api.types.is_numeric_dtype(base_values) and pd.api.types.is_numeric_dtype(current_values)):
+                categories = np.sort(pd.concat([base_values, current_values]).dropna().unique())
+                base_values = pd.Categorical(base_values, categories=categories).codes
+                current_values = pd.Categorical(current_values, categories=categories).codes
+                base_values = np.where(base_values < 0, np.nan, base_values)
+                current_values = np.where(current_values < 0, np.nan, current_values)
+            base_matrix[:, position] = base_values
+            current_matrix[:, position] = current_values
+        return base_matrix, current_matrix, columns
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def ks_and_wasserstein(base: np.ndarray, current: np.ndarray) -> tuple:
+    """
+    Two sample KS statistic and Wasserstein-1 distance for every column at once
+    base: (n_base, n_columns) array without missing values
+    current: (n_current, n_columns) array without missing values
+    return: arrays of KS statistics and Wasserstein distances, one per column
+    """
+    try:
+        n_base, n_current = base.shape[0], current.shape[0]
+        combined = np.concatenate([base, current], axis=0)
+        order = np.argsort(combined, axis=0, kind="stable")
+        sorted_values = np.take_along_axis(combined, order, axis=0)
+
+        from_base = order < n_base
+        cdf_difference = np.cumsum(from_base, axis=0) / n_base - np.cumsum(~from_base, axis=0) / n_current
+        np.abs(cdf_difference, out=cdf_difference)
+
+        # the empirical cdfs are only compared after the last of a run of tied values
+        step_widths = np.diff(sorted_values, axis=0)
+        run_ends = np.ones_like(cdf_difference, dtype=bool)
+        run_ends[:-1] = step_widths != 0
+
+        ks_statistics = np.where(run_ends, cdf_difference, 0.0).max(axis=0)
+        wasserstein_distances = (cdf_difference[:-1] * step_widths).sum(axis=0)
+        return ks_statistics, wasserstein_distances
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def ks_pvalues(ks_statistics: np.ndarray, n_base: int, n_current: int) -> np.ndarray:
+    """
+    Two-sided p-values of two sample KS statistics from the KS distribution at the effective
+    sample size, as scipy.stats.ks_2samp(method="asymp") computes them. For small samples they
+    differ slightly from the exact p-values, without re-sorting any column.
+    """
+    try:
+        effective_n = n_base * n_current / (n_base + n_current)
+        return np.clip(kstwo.sf(ks_statistics, np.round(effective_n)), 0.0, 1.0)
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def population_stability_index(base: np.ndarray, current: np.ndarray, bins: int = 10) -> np.ndarray:
+    """
+    PSI of every column using bins at the quantiles of the base column
+    """
+    try:
+        edges = np.quantile(base, np.linspace(0, 1, bins + 1)[1:-1], axis=0)
+        base_bins = np.zeros(base.shape, dtype=np.int64)
+        current_bins = np.zeros(current.shape, dtype=np.int64)
+        for edge in edges:
+            base_bins += base > edge
+            current_bins += current > edge
+
+        epsilon = 1e-6
+        psi = np.zeros(base.shape[1], dtype=np.float64)
+        for bin_index in range(bins):
+            base_share = (base_bins == bin_index).mean(axis=0) + epsilon
+            current_share = (current_bins == bin_index).mean(axis=0) + epsilon
+            psi += (current_share - base_share) * np.log(current_share / base_share)
+        return psi
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def _drift_statistics_block(base: np.ndarray, current: np.ndarray, metrics: tuple, psi_bins: int) -> dict:
+    ks_statistics, wasserstein_distances = ks_and_wasserstein(base, current)
+    statistics = {"ks_statistic": ks_statistics, "p_value": ks_pvalues(ks_statistics, base.shape[0], current.shape[0])}
+    if "wasserstein" in metrics:
+        statistics["wasserstein"] = wasserstein_distances
+    if "psi" in metrics:
+        statistics["psi"] = population_stability_index(base, current, bins=psi_bins)
+    return statistics
+
+
+def _drift_statistics_dense(base: np.ndarray, current: np.ndarray, metrics: tuple, psi_bins: int) -> dict:
+    """
+    Statistics of a block of columns, columns with missing values are handled one by one
+    """
+    has_missing = np.isnan(base).any(axis=0) | np.isnan(current).any(axis=0)
+    complete_columns = np.flatnonzero(~has_missing)
+    statistics = _drift_statistics_block(base[:, complete_columns], current[:, complete_columns], metrics, psi_bins)
+    if not has_missing.any():
+        return statistics
+
+    merged = {name: np.full(base.shape[1], np.nan) for name in statistics}
+    for name, values in statistics.items():
+        merged[name][complete_columns] = values
+    for column in np.flatnonzero(has_missing):
+        base_column = base[:, column][~np.isnan(base[:, column])]
+        current_column = current[:, column][~np.isnan(current[:, column])]
+        if len(base_column) == 0 or len(current_column) == 0:
+            continue
+        column_statistics = _drift_statistics_block(base_column[:, None], current_column[:, None], metrics, psi_bins)
+        for name, values in column_statistics.items():
+            merged[name][column] = values[0]
+    return merged
+
+
+def compute_drift_statistics(base: np.ndarray, current: np.ndarray, metrics: tuple = ("ks",),
+                             psi_bins: int = 10, n_jobs: int = 1, columns_per_job: int = 64) -> dict:
+    """
+    Drift statistics of every column of base against the same column of current
+    metrics: statistics to compute besides the KS test, any of "wasserstein" and "psi"
+    n_jobs: number of processes the columns are fanned out to, in blocks of columns_per_job
+    return: dict of statistic name to an array with one value per column
+    """
+    try:
+        n_columns = base.shape[1]
+        if n_jobs <= 1 or n_columns <= columns_per_job:
+            return _drift_statistics_dense(base, current, tuple(metrics), psi_bins)
+
+        blocks = [slice(start, start + columns_per_job) for start in range(0, n_columns, columns_per_job)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(_drift_statistics_dense, base[:, block], current[:, block], tuple(metrics), psi_bins)
+                       for block in blocks]
+            results = [future.result() for future in futures]
+        return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+    except Exception as e:
+        raise AppException(e, sys) from e
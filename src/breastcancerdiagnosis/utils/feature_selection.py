@@ -0,0 +1,164 @@
+import os
+import sys
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional
+from pandas import DataFrame, Series
+from scipy.stats import f as f_distribution
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.utils.main_utils import read_yaml_file, write_yaml
+
+# a numerical feature with more distinct values than this is treated as continuous
+CONTINUOUS_MIN_UNIQUE_VALUES: int = 25
+# number of feature selection results kept in the cache file, the least recently used are evicted first
+MAX_CACHED_SELECTIONS: int = 16
+
+
+class GroupedMoments:
+    """
+    Per class counts, sums and sums of squares of every feature
+    Chunks can be added one at a time, so the one-way ANOVA of all features can be
+    computed in a single pass over data that does not fit in memory.
+    """
+    def __init__(self, n_features: int, n_classes: int):
+        self.counts = np.zeros(n_classes)
+        self.sums = np.zeros((n_classes, n_features))
+        self.sums_of_squares = np.zeros((n_classes, n_features))
+        self.shift = None
+
+    def update(self, features: np.ndarray, class_codes: np.ndarray) -> None:
+        '''Adds a chunk of rows, class_codes holds the class index of every row.'''
+        features = np.asarray(features, dtype=np.float64)
+        if self.shift is None:
+            # values are shifted by the first chunk mean to keep the sums of squares well conditioned
+            self.shift = features.mean(axis=0)
+        features = features - self.shift
+        one_hot = np.zeros((len(class_codes), len(self.counts)))
+        one_hot[np.arange(len(class_codes)), class_codes] = 1.0
+        self.counts += one_hot.sum(axis=0)
+        self.sums += one_hot.T @ features
+        self.sums_of_squares += one_hot.T @ (features * features)
+
+    def f_oneway(self) -> tuple:
+        '''F statistics and p-values of a one-way ANOVA of every feature across the classes.'''
+        present = self.counts > 0
+        counts, sums, sums_of_squares = self.counts[present], self.sums[present], self.sums_of_squares[present]
+        n_classes, n_samples = len(counts), counts.sum()
+        grand_mean = sums.sum(axis=0) / n_samples
+        class_means = sums / counts[:, None]
+        ss_between = (counts[:, None] * (class_means - grand_mean) ** 2).sum(axis=0)
+        ss_within = (sums_of_squares - sums ** 2 / counts[:, None]).sum(axis=0)
+        df_between, df_within = n_classes - 1, n_samples - n_classes
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f_statistics = (ss_between / df_between) / (ss_within / df_within)
+        return f_statistics, f_distribution.sf(f_statistics, df_between, df_within)
+
+
+def anova_f_scores(features: np.ndarray, target: np.ndarray) -> tuple:
+    """
+    One-way ANOVA F statistic and p-value of every feature against the target classes
+    features: (n_samples, n_features) array
+    target: class label of every row
+    """
+    try:
+        classes, class_codes = np.unique(target, return_inverse=True)
+        moments = GroupedMoments(features.shape[1], len(classes))
+        moments.update(features, class_codes)
+        return moments.f_oneway()
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def continuous_features(dataframe: DataFrame, numerical_features: list) -> list:
+    """
+    Numerical features with more than CONTINUOUS_MIN_UNIQUE_VALUES distinct values
+    """
+    try:
+        unique_counts = dataframe[numerical_features].nunique(dropna=False)
+        return [feature for feature in numerical_features if unique_counts[feature] > CONTINUOUS_MIN_UNIQUE_VALUES]
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+class FeatureSelector:
+    """
+    Selects the features related to the target with one of several scorers
+    anova and chi2 keep features whose p-value is below significance_level, mutual_info keeps
+    features whose mutual information exceeds mutual_info_threshold. Results are cached in
+    cache_file_path keyed by a hash of the data and the selection settings, with the time
+    each entry was last used so the least recently used one is evicted first.
+    """
+    SCORERS = ("anova", "mutual_info", "chi2")
+
+    def __init__(self, method: str = "anova", significance_level: float = 0.05,
+                 mutual_info_threshold: float = 0.0, cache_file_path: Optional[Path] = None):
+        if method not in self.SCORERS:
+            raise AppException(ValueError(f"Unknown feature selection method {method}, expected one of {self.SCORERS}"), sys)
+        self.method = method
+        self.significance_level = significance_level
+        self.mutual_info_threshold = mutual_info_threshold
+        self.cache_file_path = cache_file_path
+
+    def cache_key(self, features: DataFrame, target: Series) -> str:
+        digest = hashlib.sha256()
+        digest.update(",".join(features.columns).encode())
+        digest.update(pd.util.hash_pandas_object(features, index=False).to_numpy().tobytes())
+        digest.update(pd.util.hash_pandas_object(target, index=False).to_numpy().tobytes())
+        digest.update(f"{self.method}:{self.significance_level}:{self.mutual_info_threshold}".encode())
+        return digest.hexdigest()
+
+    def score(self, features: DataFrame, target: Series) -> tuple:
+        '''Scores every feature, returns the scores and the p-values (None for mutual_info).'''
+        try:
+            values = features.to_numpy(dtype=np.float64)
+            if self.method == "anova":
+                return anova_f_scores(values, target.to_numpy())
+            if self.method == "chi2":
+                from sklearn.feature_selection import chi2
+                return chi2(values, target.to_numpy())
+            from sklearn.feature_selection import mutual_info_classif
+            return mutual_info_classif(values, target.to_numpy(), random_state=42), None
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def split_features(self, features: list, scores: np.ndarray, p_values: Optional[np.ndarray]) -> tuple:
+        '''Splits features into selected and rejected ones from their scores and p-values.'''
+        if p_values is not None:
+            is_selected = np.nan_to_num(p_values, nan=1.0) < self.significance_level
+        else:
+            is_selected = scores > self.mutual_info_threshold
+        selected = [feature for feature, keep in zip(features, is_selected) if keep]
+        rejected = [feature for feature, keep in zip(features, is_selected) if not keep]
+        return selected, rejected
+
+    def select(self, features: DataFrame, target: Series) -> tuple:
+        '''Returns the lists of selected and rejected features.'''
+        try:
+            cache = {}
+            key = None
+            if self.cache_file_path is not None:
+                key = self.cache_key(features, target)
+                if os.path.exists(self.cache_file_path):
+                    cache = read_yaml_file(self.cache_file_path) or {}
+                if key in cache:
+                    logging.info(f"Reusing cached {self.method} feature selection for unchanged training data")
+                    cache[key]["last_used"] = time.time()
+                    write_yaml(file_path=self.cache_file_path, content=cache, replace=True)
+                    return cache[key]["selected"], cache[key]["rejected"]
+
+            scores, p_values = self.score(features, target)
+            selected, rejected = self.split_features(list(features.columns), scores, p_values)
+
+            if key is not None:
+                cache[key] = {"method": self.method, "selected": selected, "rejected": rejected, "last_used": time.time()}
+                # the yaml file is written with sorted keys, so recency comes from last_used, not from the key order
+                recent_keys = sorted(cache, key=lambda cached_key: cache[cached_key].get("last_used", 0.0))[-MAX_CACHED_SELECTIONS:]
+                cache = {cached_key: cache[cached_key] for cached_key in recent_keys}
+                write_yaml(file_path=self.cache_file_path, content=cache, replace=True)
+            return selected, rejected
+        except Exception as e:
+            raise AppException(e, sys) from e
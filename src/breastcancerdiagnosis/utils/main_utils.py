@@ -1,11 +1,14 @@
 import os
 import sys
+import hashlib
 import numpy as np
 import dill
 import yaml
 from pathlib import Path
 from pandas import DataFrame
-from huggingface_hub import hf_hub_download
+from typing import Optional
+import pandas as pd
+from huggingface_hub import hf_hub_download, hf_hub_url, get_hf_file_metadata
 from breastcancerdiagnosis.logger.log import logging
 from breastcancerdiagnosis.exception.exception_handler import AppException
 
@@ -46,28 +49,47 @@ def load_object(file_path: Path) -> object:
     except Exception as e:
         raise AppException(e, sys) from e 
     
-def save_numpy_array_data(file_path: Path, array: np.array):
+def save_numpy_array_data(file_path: Path, array: np.array, dtype: Optional[np.dtype] = None):
     """
     Save numpy array data to file
     file_path: str location of file to save
     array: np.array data to save
+    dtype: np.dtype optional storage type the array is cast to
     """
     try:
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
         with open(file_path, "wb") as file:
-            np.save(file, array)
+            np.save(file, array if dtype is None else np.asarray(array, dtype=dtype))
 
     except Exception as e:
         raise AppException(e, sys) from e
     
-def load_numpy_array_data(file_path: Path) -> np.array:
+def create_numpy_array_file(file_path: Path, shape: tuple, dtype: np.dtype = np.float64) -> np.memmap:
+    """
+    Create a .npy file of the given shape and return it memory mapped for writing in blocks
+    file_path: str location of file to create
+    shape: tuple shape of the array
+    dtype: np.dtype type of the array elements
+    """
+    try:
+        dir_path = os.path.dirname(file_path)
+        os.makedirs(dir_path, exist_ok=True)
+        return np.lib.format.open_memmap(file_path, mode="w+", dtype=dtype, shape=shape)
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+def load_numpy_array_data(file_path: Path, mmap_mode: Optional[str] = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: str optional memory map mode, the pages of a memory mapped array are shared between processes
     return: np.array data loaded
     """
     try:
+        if mmap_mode is not None:
+            return np.load(file_path, mmap_mode=mmap_mode)
         with open(file_path, "rb") as file:
             return np.load(file)
         
@@ -86,6 +108,155 @@ def save_object(file_path: Path, obj: object) -> None:
     except Exception as e:
         raise AppException(e, sys) from e 
     
+SCHEMA_DTYPES = {"int": "int64", "float64": "float64", "float32": "float32"}
+
+def get_schema_dtypes(schema: dict) -> dict:
+    """
+    Map the column types of schema.yaml to pandas dtypes
+    schema: dict content of schema.yaml
+    return: dict of column name to dtype, object columns are left to the reader
+    """
+    try:
+        return {column: SCHEMA_DTYPES[dtype] for column, dtype in schema['columns'].items() if dtype in SCHEMA_DTYPES}
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+def _cast_to_schema(dataframe: DataFrame, dtypes: Optional[dict]) -> DataFrame:
+    if not dtypes:
+        return dataframe
+    return dataframe.astype({column: dtype for column, dtype in dtypes.items() if column in dataframe.columns})
+
+def write_dataframe(dataframe: DataFrame, file_path: Path, dtypes: Optional[dict] = None) -> None:
+    """
+    Write a DataFrame as csv, parquet or feather depending on the file extension
+    dataframe: pandas DataFrame to write
+    file_path: str location of file to save
+    dtypes: dict optional column dtypes to cast to before writing
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        dataframe = _cast_to_schema(dataframe, dtypes)
+        suffix = Path(file_path).suffix
+        if suffix == ".parquet":
+            dataframe.to_parquet(file_path, index=False)
+        elif suffix == ".feather":
+            dataframe.reset_index(drop=True).to_feather(file_path)
+        else:
+            dataframe.to_csv(file_path, index=False, header=True)
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+def read_dataframe(file_path: Path, columns: Optional[list] = None, dtypes: Optional[dict] = None) -> DataFrame:
+    """
+    Read a csv, parquet or feather file into a DataFrame
+    file_path: str location of file to load
+    columns: list optional subset of columns to load
+    dtypes: dict optional column dtypes used when parsing csv
+    """
+    try:
+        suffix = Path(file_path).suffix
+        if suffix == ".parquet":
+            return pd.read_parquet(file_path, columns=columns)
+        if suffix == ".feather":
+            return pd.read_feather(file_path, columns=columns)
+        if dtypes and columns is not None:
+            dtypes = {column: dtype for column, dtype in dtypes.items() if column in columns}
+        return pd.read_csv(file_path, usecols=columns, dtype=dtypes)
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+def iter_dataframe_chunks(file_path: Path, chunk_size: int, columns: Optional[list] = None, dtypes: Optional[dict] = None):
+    """
+    Read a csv, parquet or feather file as a sequence of DataFrames of at most chunk_size rows
+    file_path: str location of file to load
+    chunk_size: int number of rows per chunk
+    columns: list optional subset of columns to load
+    dtypes: dict optional column dtypes used when parsing csv
+    """
+    try:
+        suffix = Path(file_path).suffix
+        if suffix == ".parquet":
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size, columns=columns):
+                yield batch.to_pandas()
+        elif suffix == ".feather":
+            import pyarrow as pa
+            with pa.memory_map(str(file_path)) as source:
+                reader = pa.ipc.open_file(source)
+                for batch_index in range(reader.num_record_batches):
+                    batch = reader.get_batch(batch_index)
+                    if columns is not None:
+                        batch = batch.select(columns)
+                    for offset in range(0, batch.num_rows, chunk_size):
+                        yield batch.slice(offset, chunk_size).to_pandas()
+        else:
+            if dtypes and columns is not None:
+                dtypes = {column: dtype for column, dtype in dtypes.items() if column in columns}
+            yield from pd.read_csv(file_path, usecols=columns, dtype=dtypes, chunksize=chunk_size)
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+class DataFrameChunkWriter:
+    """
+    Append DataFrame chunks to a csv, parquet or feather file
+    file_path: str location of file to write
+    dtypes: dict optional column dtypes to cast every chunk to
+    """
+    def __init__(self, file_path: Path, dtypes: Optional[dict] = None):
+        self.file_path = Path(file_path)
+        self.dtypes = dtypes
+        self._writer = None
+        self._arrow_schema = None
+        self._empty_chunk = None
+        os.makedirs(self.file_path.parent, exist_ok=True)
+
+    def write(self, dataframe: DataFrame) -> None:
+        try:
+            dataframe = _cast_to_schema(dataframe, self.dtypes)
+            if self.file_path.suffix == ".csv":
+                dataframe.to_csv(self.file_path, mode="a" if self._writer else "w", index=False, header=not self._writer)
+                self._writer = True
+                return
+            if len(dataframe) == 0:
+                self._empty_chunk = dataframe
+                return
+
+            import pyarrow as pa
+            if self._writer is None:
+                table = pa.Table.from_pandas(dataframe, preserve_index=False)
+                self._arrow_schema = table.schema
+                if self.file_path.suffix == ".parquet":
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(self.file_path, self._arrow_schema)
+                else:
+                    self._writer = pa.ipc.new_file(str(self.file_path), self._arrow_schema)
+            else:
+                table = pa.Table.from_pandas(dataframe, schema=self._arrow_schema, preserve_index=False)
+            self._writer.write_table(table)
+
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def close(self) -> None:
+        try:
+            if self._writer is None and self._empty_chunk is not None:
+                write_dataframe(self._empty_chunk, self.file_path)
+            elif self._writer not in (None, True):
+                self._writer.close()
+
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def __enter__(self) -> "DataFrameChunkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
 def drop_columns(df: DataFrame, cols: list) ->DataFrame:
     """
     drop the columns form a pandas DataFrame
@@ -100,17 +271,64 @@ def drop_columns(df: DataFrame, cols: list) ->DataFrame:
     except Exception as e:
         raise AppException(e, sys) from e 
     
-def download_file_from_hf(source_url: str, local_path: Path) -> None:
+def parse_hf_source_url(source_url: str) -> tuple:
+    """
+    Split a hf:// source url into repo type, repo id and filename
+    source_url: str url of the form hf://<repo_type>/<owner>/<repo>/<filename>
+    """
+    try:
+        repo_type, repo_id_1, repo_id_2, filename = source_url.replace("hf://", "").split("/", 3,)[0:4]
+        return repo_type, f'{repo_id_1}/{repo_id_2}', filename
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+def download_file_from_hf(source_url: str, local_path: Path, revision: Optional[str] = None) -> Path:
     """
     Download file from huggingface hub
     source_url: str url of the file to be downloaded
     local_path: str location where the file is to be saved
+    revision: str optional commit hash to pin the download to
+    return: Path of the downloaded file
     """
     try:
-        repo_type, repo_id_1, repo_id_2, filename = source_url.replace("hf://", "").split("/", 3,)[0:4]
+        repo_type, repo_id, filename = parse_hf_source_url(source_url)
 
-        logging.info(f"type {repo_type} repo {repo_id_1}/{repo_id_2} filename {filename}")
-        hf_hub_download(repo_id=f'{repo_id_1}/{repo_id_2}', filename=filename, repo_type='dataset', local_dir=local_path, local_dir_use_symlinks=False)
+        logging.info(f"type {repo_type} repo {repo_id} filename {filename}")
+        downloaded_file = hf_hub_download(repo_id=repo_id, filename=filename, repo_type='dataset', revision=revision,
+                                          local_dir=local_path, local_dir_use_symlinks=False)
+        return Path(downloaded_file)
+
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+def get_hf_file_revision(source_url: str) -> Optional[dict]:
+    """
+    Fetch the current revision (commit hash and ETag) of a file on huggingface hub
+    source_url: str url of the file
+    return: dict with commit_hash and etag, or None when the hub cannot be reached
+    """
+    try:
+        repo_type, repo_id, filename = parse_hf_source_url(source_url)
+        metadata = get_hf_file_metadata(hf_hub_url(repo_id=repo_id, filename=filename, repo_type='dataset'))
+        return {"commit_hash": metadata.commit_hash, "etag": metadata.etag}
+
+    except Exception as e:
+        logging.info(f"Could not resolve revision of {source_url}, working offline: {e}")
+        return None
+
+def compute_file_sha256(file_path: Path, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 digest of a file
+    file_path: str location of the file
+    block_size: int number of bytes read at a time
+    """
+    try:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
 
     except Exception as e:
         raise AppException(e, sys) from e
@@ -0,0 +1,75 @@
+import sys
+import asyncio
+from typing import Callable, Optional
+from concurrent.futures import Executor
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single item requests into batches scored by one call
+    Items submitted from the event loop are buffered until max_batch_size of them are
+    waiting or max_wait_seconds passed since the first one, whichever comes first. The
+    batch is then scored by score_batch(items) -> results in the executor, so the event
+    loop keeps accepting requests while a batch runs, and every submitter receives its own
+    result, or the exception of its batch.
+    """
+    def __init__(self, score_batch: Callable[[list], list], max_batch_size: int = 64,
+                 max_wait_seconds: float = 0.005, executor: Optional[Executor] = None):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.executor = executor
+        self._pending = []
+        self._timer = None
+        self._running = set()
+
+    async def submit(self, item):
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending.append((item, future))
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+            return await future
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        loop = asyncio.get_running_loop()
+        if self._pending:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+        if batch:
+            # a reference is kept until the batch is scored, the loop only holds weak ones to its tasks
+            task = loop.create_task(self._score(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _score(self, batch: list) -> None:
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.score_batch,
+                                                                       [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            # a submitter that went away has its future cancelled
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        ''' Scores the buffered items and waits for the running batches '''
+        if self._pending:
+            self._flush()
+        while self._running or self._pending:
+            await asyncio.gather(*self._running, return_exceptions=True)
+            if self._pending:
+                self._flush()
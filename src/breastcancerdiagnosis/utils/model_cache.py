@@ -0,0 +1,122 @@
+import os
+import re
+import sys
+import hashlib
+import contextlib
+import threading
+from pathlib import Path
+from typing import Optional
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory file locks outside POSIX, processes then only share the files
+    fcntl = None
+
+CACHED_MODEL_SUFFIX: str = ".pkl"
+LOCK_FILE_SUFFIX: str = ".lock"
+
+
+class ModelCache:
+    """
+    Local on-disk cache of model objects stored in S3, keyed by bucket, key and ETag
+    Every version of a model is kept in its own file, so processes on the same node share
+    downloads and a cold start only sends one conditional request: the object body is
+    downloaded when its ETag differs from the newest cached version, otherwise the cached
+    file is used. When S3 can not be reached the newest cached version is served. Least
+    recently used versions are removed once the cache exceeds max_size_bytes.
+    Revalidation holds an exclusive flock on a lock file of the object, so when several
+    processes start at once one of them downloads and the others get a 304 afterwards.
+    """
+    def __init__(self, s3, cache_dir: Path, max_size_bytes: int):
+        self.s3 = s3
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def object_prefix(bucket_name: str, key: str) -> str:
+        return hashlib.sha256(f"{bucket_name}/{key}".encode()).hexdigest()[:16]
+
+    def version_path(self, bucket_name: str, key: str, etag: str) -> Path:
+        # multipart ETags carry a -<parts> suffix, anything else is kept out of the file name
+        return self.cache_dir / f"{self.object_prefix(bucket_name, key)}-{re.sub(r'[^0-9A-Za-z-]', '', etag)}{CACHED_MODEL_SUFFIX}"
+
+    def _cached_files(self, pattern: str) -> list:
+        # (path, stat) oldest used first, files evicted meanwhile by another process are skipped
+        files = []
+        for path in self.cache_dir.glob(pattern):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return sorted(files, key=lambda file: file[1].st_mtime_ns)
+
+    def cached_version(self, bucket_name: str, key: str) -> Optional[tuple]:
+        ''' (path, etag) of the most recently used cached version of the object, None when nothing is cached '''
+        prefix = self.object_prefix(bucket_name, key)
+        files = self._cached_files(f"{prefix}-*{CACHED_MODEL_SUFFIX}")
+        if not files:
+            return None
+        path = files[-1][0]
+        return path, path.name[len(prefix) + 1:-len(CACHED_MODEL_SUFFIX)]
+
+    @contextlib.contextmanager
+    def _object_lock(self, bucket_name: str, key: str):
+        # the thread lock serializes the threads of this process, the flock the processes sharing cache_dir
+        with self._lock, open(self.cache_dir / f"{self.object_prefix(bucket_name, key)}{LOCK_FILE_SUFFIX}", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def fetch(self, bucket_name: str, key: str) -> tuple:
+        ''' Revalidates the cached object against S3, downloading a new version when there is one, returns (path, etag) '''
+        try:
+            with self._object_lock(bucket_name, key):
+                cached = self.cached_version(bucket_name, key)
+                temporary_path = self.cache_dir / f".{os.getpid()}-{threading.get_ident()}.download"
+                etag = None
+                try:
+                    etag = self.s3.download_object_if_modified(bucket_name, key, temporary_path,
+                                                               etag=cached[1] if cached else None)
+                except Exception as e:
+                    if cached is None:
+                        raise
+                    logging.warning(f"Revalidating {key} in {bucket_name} failed, using cached version {cached[1]}: {e}")
+                finally:
+                    if etag is None and temporary_path.exists():
+                        os.remove(temporary_path)
+
+                if etag is None:
+                    path, etag = cached
+                    # the modification time orders versions by last use
+                    os.utime(path)
+                else:
+                    path = self.version_path(bucket_name, key, etag)
+                    os.replace(temporary_path, path)
+                    logging.info(f"Cached version {etag} of {key} from {bucket_name} at {path}")
+                self._evict(keep=path)
+                return path, etag
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _evict(self, keep: Path) -> None:
+        files = self._cached_files(f"*{CACHED_MODEL_SUFFIX}")
+        size = sum(stat.st_size for _, stat in files)
+        for path, stat in files:
+            if size <= self.max_size_bytes:
+                break
+            if path == keep:
+                continue
+            size -= stat.st_size
+            # a process still loading an evicted version keeps reading its open file
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            logging.info(f"Evicted {path} from model cache")
@@ -0,0 +1,195 @@
+import os
+import sys
+import numpy as np
+import sklearn
+from pathlib import Path
+from sklearn.svm import SVC
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import AdaBoostClassifier, HistGradientBoostingClassifier
+from sklearn.tree import DecisionTreeClassifier
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.entity.model import PrepareModel
+from breastcancerdiagnosis.entity.transformer import YeoJohnsonScaler
+from breastcancerdiagnosis.entity.compiled_model import CompiledModel, COMPILED_MODEL_FORMAT_VERSION
+
+
+class UnsupportedModelError(ValueError):
+    ''' A fitted model the compiler has no NumPy runtime for, it is served from its pickle instead '''
+
+
+def _compile_preprocessor(preprocessor) -> dict:
+    if not isinstance(preprocessor, YeoJohnsonScaler):
+        raise UnsupportedModelError(f"Only a YeoJohnsonScaler preprocessor can be compiled, got {type(preprocessor).__name__}")
+    arrays = {
+        "yeo_johnson_lambdas": np.asarray(preprocessor.lambdas_, dtype=np.float64),
+        "scaling_mean": np.asarray(preprocessor.mean_, dtype=np.float64),
+        "scaling_scale": np.asarray(preprocessor.scale_, dtype=np.float64)
+    }
+    if preprocessor.include_standardized_input:
+        arrays["input_mean"] = np.asarray(preprocessor.input_mean_, dtype=np.float64)
+        arrays["input_scale"] = np.asarray(preprocessor.input_scale_, dtype=np.float64)
+    return arrays
+
+
+def _flatten_trees(trees: list) -> dict:
+    """
+    Node arrays of (feature, threshold, left, right, missing_go_to_left, value, is_leaf) trees concatenated
+    Child indices become global and every leaf points to itself, so that all trees are walked together.
+    """
+    feature, threshold, left, right, missing_left, leaf_value, roots = [], [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for tree_feature, tree_threshold, tree_left, tree_right, tree_missing_left, tree_value, is_leaf in trees:
+        own_index = np.arange(len(tree_feature)) + offset
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree_feature))
+        threshold.append(np.where(is_leaf, np.inf, tree_threshold))
+        left.append(np.where(is_leaf, own_index, tree_left + offset))
+        right.append(np.where(is_leaf, own_index, tree_right + offset))
+        missing_left.append(np.asarray(tree_missing_left, dtype=bool) & ~is_leaf)
+        leaf_value.append(np.where(is_leaf, tree_value, 0.0))
+        max_depth = max(max_depth, _tree_depth(tree_left, tree_right, is_leaf))
+        offset += len(tree_feature)
+    return {
+        "tree_feature": np.concatenate(feature).astype(np.int64),
+        "tree_threshold": np.concatenate(threshold).astype(np.float64),
+        "tree_left": np.concatenate(left).astype(np.int64),
+        "tree_right": np.concatenate(right).astype(np.int64),
+        "tree_missing_left": np.concatenate(missing_left),
+        "tree_leaf_value": np.concatenate(leaf_value).astype(np.float64),
+        "tree_roots": np.asarray(roots, dtype=np.int64),
+        "tree_max_depth": np.asarray(max_depth)
+    }
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray, is_leaf: np.ndarray) -> int:
+    depth, level = 0, np.array([0])
+    while True:
+        level = level[~is_leaf[level]]
+        if not len(level):
+            return depth
+        level = np.concatenate([left[level], right[level]])
+        depth += 1
+
+
+def _decision_tree_nodes(estimator: DecisionTreeClassifier, leaf_value) -> tuple:
+    '''Node arrays of a fitted decision tree, leaf_value maps the (n_nodes, n_classes) class probabilities to node values.'''
+    tree = estimator.tree_
+    is_leaf = tree.children_left == -1
+    missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=bool))
+    probabilities = tree.value[:, 0, :] / tree.value[:, 0, :].sum(axis=1, keepdims=True)
+    return (tree.feature, tree.threshold, tree.children_left, tree.children_right, missing_left,
+            leaf_value(probabilities), is_leaf)
+
+
+def _compile_classifier(model) -> dict:
+    '''Decision function arrays of a binary classifier, > 0 predicts classes_[1] as in its predict.'''
+    if isinstance(model, LogisticRegression):
+        return {"model_kind": np.asarray("linear"), "has_proba": np.asarray(True),
+                "coef": model.coef_[0].astype(np.float64), "intercept": np.asarray(model.intercept_[0], dtype=np.float64)}
+
+    if isinstance(model, SVC):
+        if model.kernel not in ("linear", "poly", "rbf", "sigmoid"):
+            raise UnsupportedModelError(f"SVC kernel {model.kernel} can not be compiled")
+        # predict_proba of an SVC with probability=True is a separately fitted Platt scaling, left out
+        return {"model_kind": np.asarray("kernel_svm"), "has_proba": np.asarray(False),
+                "support_vectors": model.support_vectors_.astype(np.float64), "dual_coef": model.dual_coef_[0].astype(np.float64),
+                "intercept": np.asarray(model.intercept_[0], dtype=np.float64), "kernel": np.asarray(model.kernel),
+                "gamma": np.asarray(model._gamma, dtype=np.float64), "coef0": np.asarray(model.coef0, dtype=np.float64),
+                "degree": np.asarray(model.degree)}
+
+    if isinstance(model, AdaBoostClassifier):
+        total_weight = model.estimator_weights_.sum()
+        trees = []
+        for estimator, weight in zip(model.estimators_, model.estimator_weights_):
+            if model.algorithm == "SAMME.R":
+                # binary SAMME.R decision: sum of log(p1 / p0) of every tree with probabilities clipped to eps
+                leaf_value = lambda probabilities: np.diff(np.log(np.clip(probabilities, np.finfo(np.float64).eps, None)),
+                                                           axis=1)[:, 0] / total_weight
+            else:
+                # binary SAMME decision: a vote scores +weight for the predicted class and -weight for the other,
+                # so each tree moves the difference of the two class scores by 2 * weight
+                leaf_value = lambda probabilities, weight=weight: np.where(np.argmax(probabilities, axis=1) == 1,
+                                                                           2 * weight, -2 * weight) / total_weight
+            trees.append(_decision_tree_nodes(estimator, leaf_value))
+        # decision trees compare float32 features with their thresholds
+        return dict(_flatten_trees(trees), model_kind=np.asarray("tree_ensemble"), has_proba=np.asarray(True),
+                    bias=np.asarray(0.0), tree_input_dtype=np.asarray("float32"))
+
+    if isinstance(model, HistGradientBoostingClassifier):
+        trees = []
+        for predictors in model._predictors:
+            nodes = predictors[0].nodes
+            if nodes["is_categorical"].any():
+                raise UnsupportedModelError("HistGradientBoostingClassifier categorical splits can not be compiled")
+            trees.append((nodes["feature_idx"], nodes["num_threshold"], nodes["left"].astype(np.int64),
+                          nodes["right"].astype(np.int64), nodes["missing_go_to_left"], nodes["value"],
+                          nodes["is_leaf"].astype(bool)))
+        return dict(_flatten_trees(trees), model_kind=np.asarray("tree_ensemble"), has_proba=np.asarray(True),
+                    bias=np.asarray(model._baseline_prediction.ravel()[0], dtype=np.float64),
+                    tree_input_dtype=np.asarray("float64"))
+
+    raise UnsupportedModelError(f"{type(model).__name__} can not be compiled")
+
+
+def compile_model(prepare_model: PrepareModel) -> dict:
+    """
+    NumPy arrays of a fitted PrepareModel scored by entity.compiled_model.CompiledModel
+    Supports a YeoJohnsonScaler preprocessor and a binary LogisticRegression, SVC,
+    AdaBoostClassifier or HistGradientBoostingClassifier, anything else raises UnsupportedModelError.
+    """
+    try:
+        model = prepare_model.trained_model_object
+        if len(model.classes_) != 2:
+            raise UnsupportedModelError(f"Only binary classifiers can be compiled, {type(model).__name__} has "
+                                      f"{len(model.classes_)} classes")
+        if prepare_model.input_columns_ is None:
+            raise UnsupportedModelError("Only preprocessors fitted on named columns can be compiled")
+        arrays = {
+            "format_version": np.asarray(COMPILED_MODEL_FORMAT_VERSION),
+            "model_class": np.asarray(type(model).__name__),
+            "sklearn_version": np.asarray(sklearn.__version__),
+            "columns": np.asarray(prepare_model.input_columns_, dtype=str),
+            "classes": np.asarray(model.classes_),
+            "threshold": np.asarray(np.nan if prepare_model.threshold is None else prepare_model.threshold, dtype=np.float64),
+            "batch_size": np.asarray(prepare_model.batch_size)
+        }
+        arrays.update(_compile_preprocessor(prepare_model.preprocessing_object))
+        arrays.update(_compile_classifier(model))
+        return arrays
+    except UnsupportedModelError:
+        raise
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def save_compiled_model(file_path: Path, arrays: dict) -> None:
+    """
+    Writes compiled model arrays to an uncompressed .npz file, replacing file_path atomically
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        temporary_path = f"{file_path}.tmp.npz"
+        np.savez(temporary_path, **arrays)
+        os.replace(temporary_path, file_path)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def verify_compiled_model(prepare_model: PrepareModel, compiled_model: CompiledModel, dataframe, atol: float = 1e-9) -> dict:
+    """
+    Compares the compiled model with the original object on the rows of dataframe
+    Returns the number of differing predictions, the largest absolute probability difference
+    (nan without probabilities) and verified, True when no prediction differs and every
+    probability is within atol.
+    """
+    try:
+        prediction_mismatches = int((compiled_model.predict(dataframe) != prepare_model.predict(dataframe)).sum())
+        max_probability_difference = np.nan
+        if compiled_model.has_proba:
+            max_probability_difference = float(np.abs(compiled_model.predict_proba(dataframe)
+                                                      - prepare_model.predict_proba(dataframe)).max(initial=0.0))
+        verified = prediction_mismatches == 0 and not max_probability_difference > atol
+        return {"rows": len(dataframe), "prediction_mismatches": prediction_mismatches,
+                "max_probability_difference": max_probability_difference, "verified": verified}
+    except Exception as e:
+        raise AppException(e, sys) from e
@@ -0,0 +1,503 @@
+import sys
+import math
+import time
+import warnings
+import numpy as np
+from typing import Optional
+from itertools import zip_longest
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from joblib import effective_n_jobs
+from threadpoolctl import threadpool_limits
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid, ParameterSampler, check_cv, train_test_split
+from breastcancerdiagnosis.logger.log import logging
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.utils.search_memo import SearchMemo
+
+SEARCH_MODES = ("random", "successive_halving")
+# penalties accepted by every LogisticRegression solver
+LOGISTIC_REGRESSION_SOLVER_PENALTIES = {
+    "lbfgs": ("l2", None), "newton-cg": ("l2", None), "newton-cholesky": ("l2", None),
+    "sag": ("l2", None), "saga": ("l1", "l2", "elasticnet", None), "liblinear": ("l1", "l2")
+}
+
+# training data of the current search worker process, set once per worker by _init_worker
+_worker_data = {}
+
+
+def _shareable_array(array: np.ndarray):
+    '''A whole .npy memory map is sent to the workers as its file name, anything else as the array itself.'''
+    if isinstance(array, np.memmap) and array.filename and array.flags.c_contiguous:
+        mapped = np.load(array.filename, mmap_mode="r")
+        if mapped.shape == array.shape and mapped.dtype == array.dtype:
+            return ("memmap", array.filename)
+    return np.asarray(array)
+
+
+def _init_worker(X, y) -> None:
+    # every fit runs on one core, the worker budget is the number of processes
+    threadpool_limits(limits=1)
+    _worker_data["X"] = np.load(X[1], mmap_mode="r") if isinstance(X, tuple) else X
+    _worker_data["y"] = np.load(y[1], mmap_mode="r") if isinstance(y, tuple) else y
+
+
+def fit_estimator(estimator, X: np.ndarray, y: np.ndarray, fit_options: Optional[dict] = None,
+                  n_threads: Optional[int] = None):
+    """
+    Fits estimator with the fit options of its model registry entry
+    threads_param: constructor parameter set to n_threads, for estimators managing their own threads
+    eval_set: holds out a stratified validation_fraction of the rows as the early stopping eval_set
+    fit_params: further keyword arguments of fit
+    """
+    fit_options = fit_options or {}
+    if n_threads is not None and fit_options.get("threads_param"):
+        estimator.set_params(**{fit_options["threads_param"]: n_threads})
+    fit_params = dict(fit_options.get("fit_params") or {})
+    if fit_options.get("eval_set"):
+        X, X_validation, y, y_validation = train_test_split(X, y, test_size=fit_options.get("validation_fraction", 0.1),
+                                                            stratify=y, random_state=fit_options.get("random_state", 42))
+        fit_params["eval_set"] = [(X_validation, y_validation)]
+    return estimator.fit(X, y, **fit_params)
+
+
+def _fit_and_score(estimator, params: dict, train: np.ndarray, test: np.ndarray, scoring,
+                   fit_options: Optional[dict] = None) -> tuple:
+    '''Fits one (model, params, fold) task in a worker, a failing fit scores nan as in RandomizedSearchCV.'''
+    X, y = _worker_data["X"], _worker_data["y"]
+    start = time.time()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            estimator = clone(estimator).set_params(**params)
+            fit_estimator(estimator, X[train], y[train], fit_options, n_threads=1)
+            score = check_scoring(estimator, scoring=scoring)(estimator, X[test], y[test])
+    except Exception:
+        score = np.nan
+    return float(score), time.time() - start
+
+
+def _fit_all_rows(estimator, params: dict, fit_options: Optional[dict] = None, n_threads: int = 1):
+    '''Fits an estimator with the best parameters on every training row in a worker, using n_threads threads.'''
+    X, y = _worker_data["X"], _worker_data["y"]
+    with warnings.catch_warnings(), threadpool_limits(limits=n_threads):
+        warnings.simplefilter("ignore")
+        return fit_estimator(clone(estimator).set_params(**params), X, y, fit_options, n_threads=n_threads)
+
+
+def canonical_params(estimator, params: dict, max_poly_C: Optional[float] = None) -> Optional[dict]:
+    """
+    Parameters with the settings the estimator ignores removed, None when it would reject them or is too slow to fit
+    estimator: unfitted estimator the parameters are meant for
+    max_poly_C: largest C tried with a polynomial SVC kernel, whose fits slow down sharply as C grows
+    """
+    try:
+        candidate = clone(estimator).set_params(**params)
+        # estimators from outside sklearn validate their parameters in fit
+        if hasattr(candidate, "_validate_params"):
+            candidate._validate_params()
+    except Exception:
+        return None
+    params = dict(params)
+    name = type(estimator).__name__
+    if name == "LogisticRegression":
+        penalty = candidate.get_params()["penalty"]
+        if penalty not in LOGISTIC_REGRESSION_SOLVER_PENALTIES.get(candidate.get_params()["solver"], (penalty,)):
+            return None
+        if penalty == "elasticnet" and candidate.get_params()["l1_ratio"] is None:
+            return None
+        if penalty is None:
+            params.pop("C", None)
+    elif name == "SVC":
+        kernel = candidate.get_params()["kernel"]
+        if kernel != "poly":
+            params.pop("degree", None)
+        if kernel == "linear":
+            params.pop("gamma", None)
+        if kernel == "poly" and max_poly_C is not None and candidate.get_params()["C"] > max_poly_C:
+            return None
+    return params
+
+
+def sample_valid_params(estimator, param_distributions: dict, n_iter: int, random_state: Optional[int] = None,
+                        max_poly_C: Optional[float] = None) -> list:
+    """
+    Up to n_iter distinct parameter combinations the estimator accepts
+    Grids of lists are enumerated and pruned before sampling without replacement, parameters with
+    distributions are sampled with ParameterSampler and pruned afterwards.
+    """
+    try:
+        if all(isinstance(values, list) for values in param_distributions.values()):
+            valid = []
+            for params in ParameterGrid(param_distributions):
+                params = canonical_params(estimator, params, max_poly_C)
+                if params is not None and params not in valid:
+                    valid.append(params)
+            if len(valid) <= n_iter:
+                return valid
+            chosen = np.random.RandomState(random_state).choice(len(valid), size=n_iter, replace=False)
+            return [valid[index] for index in chosen]
+
+        valid = []
+        for params in ParameterSampler(param_distributions, n_iter=n_iter, random_state=random_state):
+            params = canonical_params(estimator, params, max_poly_C)
+            if params is not None and params not in valid:
+                valid.append(params)
+        return valid
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+class SearchScheduler:
+    """
+    Hyper parameter search of several models sharing one process pool
+    Every (model, params, fold) fit of every candidate model is submitted to a single pool
+    of n_jobs workers, so no core waits for the slowest search to finish before the next
+    one starts. The training data is sent to each worker once, or only its file name when
+    it is a memory mapped .npy file.
+    mode random fits n_iter sampled combinations on all rows and keeps the highest mean
+    cross validation score. mode successive_halving starts n_candidates combinations on a
+    small stratified subset of the rows and, every round, keeps the best 1 / factor of
+    them while growing the subset factor times, until the last round uses every row. The
+    rounds of every model run at their own pace: a model's next round is submitted as soon
+    as its own fits are done, never waiting for the current round of another model.
+    Combinations the estimator rejects are pruned before any fit in both modes.
+    With a SearchMemo, fold scores already stored for the same data, estimator, folds and
+    parameters are reused instead of fitted, and with refit the best parameters of every
+    model are fitted on all rows (or taken from the memo) and returned as best_estimator.
+    With time_budget_seconds, fits of the models are submitted interleaved and those still
+    pending when the budget runs out are cancelled, successive halving starts no new round
+    after it and models without a single completed candidate are left out of the results.
+    The budget covers the final refits as well: their time, estimated from the fit times of
+    the cross validation fits, is held back from the search, and refits that can not finish
+    in the time left are skipped.
+    """
+    def __init__(self, n_jobs: int = -1, cv: int = 5, n_iter: int = 10, scoring: Optional[str] = None,
+                 random_state: Optional[int] = None, mode: str = "random", n_candidates: int = 30,
+                 factor: int = 3, max_poly_C: Optional[float] = None, memo: Optional[SearchMemo] = None,
+                 refit: bool = True, time_budget_seconds: Optional[float] = None):
+        if mode not in SEARCH_MODES:
+            raise AppException(ValueError(f"Unknown search mode {mode}, expected one of {SEARCH_MODES}"), sys)
+        self.n_jobs = n_jobs
+        self.cv = cv
+        self.n_iter = n_iter
+        self.scoring = scoring
+        self.random_state = random_state
+        self.mode = mode
+        self.n_candidates = n_candidates
+        self.factor = factor
+        self.max_poly_C = max_poly_C
+        self.memo = memo
+        self.refit = refit
+        self.time_budget_seconds = time_budget_seconds
+        self._data_key = None
+        self._deadline = None
+        self._fit_options = {}
+        self._n_rows = 0
+        self._n_workers = 1
+        self._fit_seconds_per_row = {}
+
+    def _record_fit_time(self, name: str, fit_time: float, n_train_rows: int) -> None:
+        total, count = self._fit_seconds_per_row.get(name, (0.0, 0))
+        self._fit_seconds_per_row[name] = (total + fit_time / max(1, n_train_rows), count + 1)
+
+    def _estimated_refit_seconds(self, name: str) -> float:
+        '''Fit time of a model on all rows, scaled from the mean fit time per training row of its cross validation fits.'''
+        total, count = self._fit_seconds_per_row.get(name, (0.0, 0))
+        return total / count * self._n_rows if count else 0.0
+
+    def _refit_reserve_seconds(self) -> float:
+        # the refits share the pool: at least the longest one, at most all of them spread over the workers;
+        # a refit longer than the whole budget is skipped anyway and holds nothing back from the other models
+        estimates = [estimate for estimate in map(self._estimated_refit_seconds, self._fit_seconds_per_row)
+                     if estimate <= self.time_budget_seconds]
+        return max(max(estimates, default=0.0), sum(estimates) / self._n_workers) if self.refit else 0.0
+
+    def _remaining_seconds(self) -> Optional[float]:
+        '''Seconds left for search fits, the estimated time of the final refits is held back from the budget.'''
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - self._refit_reserve_seconds() - time.monotonic())
+
+    def _estimator_key(self, name: str, estimator) -> str:
+        return SearchMemo.estimator_key(estimator, self.scoring, self._fit_options.get(name))
+
+    def _prepare_round(self, job: tuple) -> tuple:
+        '''(scores, memo keys, fits to run) of a (name, estimator, params list, folds) round, stored fold scores filled in.'''
+        name, estimator, params_list, folds = job
+        scores = np.full((len(params_list), len(folds)), np.nan)
+        memo_keys, tasks = {}, []
+        if self.memo is not None:
+            estimator_key, folds_key = self._estimator_key(name, estimator), SearchMemo.folds_key(folds)
+        for params_index, params in enumerate(params_list):
+            stored = {}
+            if self.memo is not None:
+                memo_keys[params_index] = (self._data_key, estimator_key, folds_key, SearchMemo.params_key(params))
+                stored = self.memo.get_scores(*memo_keys[params_index])
+            for fold_index, (train, test) in enumerate(folds):
+                if fold_index in stored:
+                    scores[params_index, fold_index] = stored[fold_index][0]
+                    self._record_fit_time(name, stored[fold_index][1], len(train))
+                    continue
+                tasks.append((params_index, fold_index, params, train, test))
+        return scores, memo_keys, tasks
+
+    def _run_rounds(self, pool: ProcessPoolExecutor, jobs: list, next_round) -> None:
+        """
+        Runs search rounds of several models on the shared pool, each model at its own pace
+        jobs: the first (name, estimator, params list, folds) round of every model
+        next_round: called with (name, (n_params, n_folds) scores) as soon as every fit of a
+        round of that model is done, returns the model's next round or None when it is over
+        The next round of a model is submitted right away, without waiting for the rounds of
+        the other models. Once the time budget runs out the queued fits are cancelled and keep
+        a nan score, running fits are waited for and no new round is started.
+        """
+        rounds, futures, records = {}, {}, []
+        budget_exhausted = False
+
+        def start(round_jobs: list) -> None:
+            task_lists = []
+            queue = list(round_jobs)
+            while queue:
+                job = queue.pop(0)
+                name, estimator, params_list, _ = job
+                scores, memo_keys, tasks = self._prepare_round(job)
+                if len(tasks) < scores.size:
+                    logging.info(f"Reused {scores.size - len(tasks)} stored fold scores of {name}, submitting {len(tasks)} fits")
+                if not tasks:
+                    # every fold score was stored, the round is over before it started
+                    following = next_round(name, scores)
+                    if following is not None:
+                        queue.append(following)
+                    continue
+                rounds[name] = {"scores": scores, "memo_keys": memo_keys, "remaining": len(tasks)}
+                task_lists.append([(name, estimator) + task for task in tasks])
+            # interleaved across models, so a time budget running out leaves every model with some completed fits
+            for task in (task for model_tasks in zip_longest(*task_lists) for task in model_tasks if task is not None):
+                name, estimator, params_index, fold_index, params, train, test = task
+                future = pool.submit(_fit_and_score, estimator, params, train, test, self.scoring, self._fit_options.get(name))
+                futures[future] = (name, params_index, fold_index, len(train))
+
+        def collect(future) -> Optional[tuple]:
+            name, params_index, fold_index, n_train_rows = futures.pop(future)
+            model_round = rounds[name]
+            if not future.cancelled():
+                score, fit_time = future.result()
+                model_round["scores"][params_index, fold_index] = score
+                self._record_fit_time(name, fit_time, n_train_rows)
+                if self.memo is not None:
+                    records.append(model_round["memo_keys"][params_index] + (fold_index, score, fit_time))
+            model_round["remaining"] -= 1
+            if model_round["remaining"] > 0:
+                return None
+            del rounds[name]
+            return next_round(name, model_round["scores"])
+
+        start(jobs)
+        while futures:
+            done, _ = wait(list(futures), timeout=None if budget_exhausted else self._remaining_seconds(),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                budget_exhausted = True
+                n_cancelled = sum(future.cancel() for future in list(futures))
+                logging.warning(f"Search time budget of {self.time_budget_seconds}s exhausted, cancelled {n_cancelled} pending fits")
+                done = [future for future in futures if future.cancelled()]
+            for future in done:
+                following = collect(future)
+                if following is None:
+                    continue
+                if budget_exhausted or self._remaining_seconds() == 0:
+                    logging.warning(f"Search time budget of {self.time_budget_seconds}s exhausted, no further round of {following[0]}")
+                    continue
+                start([following])
+        if records:
+            self.memo.put_scores(records)
+
+    def _refit_best(self, pool: ProcessPoolExecutor, n_workers: int, candidates: list, results: dict) -> None:
+        """
+        Adds the best_estimator of every model, fitted on all rows in the pool or loaded from the memo
+        With a time budget, refits whose estimated time exceeds the time left are skipped, except
+        the fastest one when none would fit, and refits still queued at the deadline are cancelled.
+        Models without a best_estimator are removed from the results.
+        """
+        estimators = {name: estimator for name, estimator, _, _ in candidates if name in results}
+        to_fit = []
+        for name, estimator in estimators.items():
+            if self.memo is not None:
+                memo_key = (self._data_key, self._estimator_key(name, estimator), SearchMemo.params_key(results[name]["best_params"]))
+                results[name]["best_estimator"] = self.memo.get_estimator(*memo_key)
+                if results[name]["best_estimator"] is not None:
+                    logging.info(f"Reused stored fitted {name} with the best parameters")
+                    continue
+            to_fit.append(name)
+
+        if self._deadline is not None and to_fit:
+            seconds_left = self._deadline - time.monotonic()
+            fitting = [name for name in to_fit if self._estimated_refit_seconds(name) <= seconds_left]
+            if not fitting and len(to_fit) == len(estimators):
+                # a model is needed, the one expected to be fitted soonest is refitted anyway
+                fitting = [min(to_fit, key=self._estimated_refit_seconds)]
+            for name in to_fit:
+                if name not in fitting:
+                    logging.warning(f"Skipping the refit of {name}, estimated at {self._estimated_refit_seconds(name):.1f}s "
+                                    f"with {max(0.0, seconds_left):.1f}s of the time budget left")
+                    del results[name]
+            to_fit = fitting
+
+        # the workers left idle by fewer refits than workers become threads of the refits
+        n_threads = max(1, n_workers // max(1, len(to_fit)))
+        futures = {pool.submit(_fit_all_rows, estimators[name], results[name]["best_params"],
+                               self._fit_options.get(name), n_threads): name for name in to_fit}
+        timeout = None if self._deadline is None else max(0.0, self._deadline - time.monotonic())
+        done, pending = wait(futures, timeout=timeout)
+        # refits already running are waited for, the queued ones never start; the pool is idle when
+        # the refits are submitted, so at least one of them is running and can not be cancelled
+        cancelled = [future for future in pending if future.cancel()]
+        if cancelled:
+            logging.warning(f"Search time budget of {self.time_budget_seconds}s exhausted, cancelled the refits of "
+                            f"{[futures[future] for future in cancelled]}")
+        for future in futures:
+            name = futures[future]
+            if future.cancelled():
+                del results[name]
+                continue
+            results[name]["best_estimator"] = future.result()
+            if self.memo is not None:
+                self.memo.put_estimator(self._data_key, self._estimator_key(name, estimators[name]),
+                                        SearchMemo.params_key(results[name]["best_params"]), results[name]["best_estimator"])
+
+    def _folds(self, estimator, y: np.ndarray, rows: np.ndarray) -> list:
+        splitter = check_cv(self.cv, y[rows], classifier=is_classifier(estimator))
+        return [(rows[train], rows[test]) for train, test in splitter.split(np.zeros(len(rows)), y[rows])]
+
+    @staticmethod
+    def _best_index(mean_scores: np.ndarray) -> int:
+        # highest mean score, the first candidate on ties
+        return int(np.argmax(np.nan_to_num(mean_scores, nan=-np.inf)))
+
+    def _random_search(self, pool: ProcessPoolExecutor, candidates: list, y: np.ndarray) -> dict:
+        rows = np.arange(len(y))
+        jobs = []
+        for name, estimator, distributions, _ in candidates:
+            params_list = sample_valid_params(estimator, distributions, self.n_iter, self.random_state, self.max_poly_C)
+            if not params_list:
+                logging.warning(f"No valid parameter combination of {name} in its grid, it is left out")
+                continue
+            jobs.append((name, estimator, params_list, self._folds(estimator, y, rows)))
+        scores = {}
+
+        def finish(name: str, model_scores: np.ndarray) -> None:
+            scores[name] = model_scores
+            logging.info(f"Finished {model_scores.size} search fits of {name}")
+
+        self._run_rounds(pool, jobs, finish)
+        results = {}
+        for name, _, params_list, _ in jobs:
+            mean_scores = scores[name].mean(axis=1)
+            if self._deadline is not None and np.isnan(mean_scores).all():
+                logging.warning(f"No candidate of {name} completed within the search time budget, it is left out")
+                continue
+            best_index = self._best_index(mean_scores)
+            results[name] = {
+                "best_params": params_list[best_index],
+                "best_score": float(mean_scores[best_index]),
+                "cv_results": {"params": params_list, "mean_test_score": mean_scores, "split_test_scores": scores[name]}
+            }
+        return results
+
+    def _stratified_order(self, y: np.ndarray) -> np.ndarray:
+        '''Row order whose every prefix keeps the class proportions, the nested subsets of the halving rounds.'''
+        random = np.random.RandomState(self.random_state)
+        permutation = random.permutation(len(y))
+        _, class_codes = np.unique(y[permutation], return_inverse=True)
+        position_in_class = np.zeros(len(y))
+        for code in np.unique(class_codes):
+            members = np.flatnonzero(class_codes == code)
+            position_in_class[members] = (np.arange(len(members)) + 0.5) / len(members)
+        return permutation[np.argsort(position_in_class, kind="stable")]
+
+    def _successive_halving(self, pool: ProcessPoolExecutor, candidates: list, y: np.ndarray) -> dict:
+        order = self._stratified_order(y)
+        n_classes = len(np.unique(y))
+        min_resources = min(len(y), 2 * n_classes * (self.cv if isinstance(self.cv, int) else 5))
+        state = {}
+        for name, estimator, distributions, _ in candidates:
+            params_list = sample_valid_params(estimator, distributions, self.n_candidates, self.random_state, self.max_poly_C)
+            if not params_list:
+                logging.warning(f"No valid parameter combination of {name} in its grid, it is left out")
+                continue
+            # 1 + floor(log_factor(candidates)) rounds, counted in integers to be exact at powers of the factor
+            n_rounds = 1
+            while self.factor ** n_rounds <= len(params_list):
+                n_rounds += 1
+            state[name] = {"estimator": estimator, "params": params_list, "alive": list(range(len(params_list))),
+                           "n_rounds": n_rounds, "round": 0, "iterations": []}
+        logging.info("Successive halving of " + ", ".join(f"{name}: {len(model['params'])} candidates in "
+                                                           f"{model['n_rounds']} rounds" for name, model in state.items()))
+
+        def round_job(name: str) -> tuple:
+            model = state[name]
+            rounds_left = model["n_rounds"] - 1 - model["round"]
+            model["n_resources"] = min(len(y), max(min_resources, len(y) // self.factor ** rounds_left))
+            return (name, model["estimator"], [model["params"][index] for index in model["alive"]],
+                    self._folds(model["estimator"], y, np.sort(order[:model["n_resources"]])))
+
+        def next_round(name: str, scores: np.ndarray) -> Optional[tuple]:
+            model = state[name]
+            mean_scores = scores.mean(axis=1)
+            model["iterations"].append({"n_resources": model["n_resources"], "candidates": list(model["alive"]),
+                                        "mean_test_score": mean_scores})
+            logging.info(f"{name} round {model['round'] + 1}: {len(mean_scores)} candidates on {model['n_resources']} rows, "
+                         f"best mean score {np.nanmax(np.append(mean_scores, -np.inf))}")
+            model["round"] += 1
+            if model["round"] >= model["n_rounds"]:
+                return None
+            ranking = sorted(range(len(mean_scores)), key=lambda position: -np.nan_to_num(mean_scores[position], nan=-np.inf))
+            n_kept = max(1, math.ceil(len(mean_scores) / self.factor))
+            model["alive"] = [model["alive"][position] for position in sorted(ranking[:n_kept])]
+            return round_job(name)
+
+        self._run_rounds(pool, [round_job(name) for name in state], next_round)
+
+        results = {}
+        for name, model in state.items():
+            # the last round with a completed candidate, an earlier one when the time budget cut the last short
+            completed = [iteration for iteration in model["iterations"] if not np.isnan(iteration["mean_test_score"]).all()]
+            if self._deadline is not None and not completed:
+                logging.warning(f"No candidate of {name} completed within the search time budget, it is left out")
+                continue
+            last_round = completed[-1] if completed else model["iterations"][-1]
+            best_position = self._best_index(last_round["mean_test_score"])
+            results[name] = {
+                "best_params": model["params"][last_round["candidates"][best_position]],
+                "best_score": float(last_round["mean_test_score"][best_position]),
+                "cv_results": {"params": model["params"], "iterations": model["iterations"]}
+            }
+        return results
+
+    def search(self, candidates: list, X: np.ndarray, y: np.ndarray) -> dict:
+        '''
+        Searches (name, estimator, param_distributions, fit_options) candidates,
+        returns name -> best_params, best_score, cv_results and, with refit, best_estimator.
+        '''
+        try:
+            y = np.asarray(y)
+            if self.memo is not None:
+                self._data_key = SearchMemo.data_key(X, y)
+                self.memo.use_data_key(self._data_key)
+            self._fit_options = {name: fit_options for name, _, _, fit_options in candidates}
+            self._deadline = None if self.time_budget_seconds is None else time.monotonic() + self.time_budget_seconds
+            n_workers = max(1, effective_n_jobs(self.n_jobs))
+            self._n_rows, self._n_workers, self._fit_seconds_per_row = len(y), n_workers, {}
+            logging.info(f"Starting {self.mode} hyper parameter search of {len(candidates)} models with {n_workers} workers")
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                     initargs=(_shareable_array(X), _shareable_array(y))) as pool:
+                if self.mode == "successive_halving":
+                    results = self._successive_halving(pool, candidates, y)
+                else:
+                    results = self._random_search(pool, candidates, y)
+                if self.refit:
+                    self._refit_best(pool, n_workers, candidates, results)
+                return results
+        except Exception as e:
+            raise AppException(e, sys) from e
@@ -0,0 +1,89 @@
+import sys
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable
+from pandas import DataFrame
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+
+def canonical_feature_rows(dataframe: DataFrame, columns: list) -> np.ndarray:
+    """
+    Feature rows as the model sees them: float64 values in model input column order
+    Integer and float spellings of a value, 0.0 and -0.0 and all NaN payloads become the
+    same bytes, so equal records get equal cache keys whatever column order they came in.
+    """
+    try:
+        features = np.ascontiguousarray(dataframe[columns].to_numpy(dtype=np.float64))
+        features += 0.0
+        features[np.isnan(features)] = np.nan
+        return features
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+class PredictionCache:
+    """
+    Thread safe LRU cache of per row predictions with a time to live
+    Keys hash the canonical feature row together with the model version, a prediction is
+    never served for another model. At most max_entries rows are kept, the least recently
+    used first to go, and entries older than ttl_seconds are treated as misses.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def row_keys(features: np.ndarray, model_version: str) -> list:
+        version_hash = hashlib.blake2b(f"{model_version}\0".encode(), digest_size=16)
+        keys = []
+        for row in features:
+            row_hash = version_hash.copy()
+            row_hash.update(row.tobytes())
+            keys.append(row_hash.digest())
+        return keys
+
+    def get_many(self, keys: list) -> list:
+        ''' Cached prediction of every key, None for misses and expired entries '''
+        now = self.clock()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                values.append(entry[0])
+        return values
+
+    def put_many(self, keys: list, values) -> None:
+        expires_at = self.clock() + self.ttl_seconds
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,246 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from pandas import DataFrame
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.utils.drift_utils import ks_pvalues
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of several numeric columns
+    Every column is summarised by at most max_centroids equal weight centroids. Updating
+    with a chunk or merging another sketch re-buckets all centroids by cumulative weight,
+    so the memory stays at (n_columns, max_centroids) whatever the number of rows seen.
+    """
+    def __init__(self, n_columns: int, max_centroids: int = 1000):
+        self.max_centroids = max_centroids
+        self.means = np.zeros((n_columns, 0))
+        self.weights = np.zeros((n_columns, 0))
+
+    def update(self, values: np.ndarray) -> None:
+        '''Adds a (n_rows, n_columns) chunk, missing values are ignored.'''
+        values = np.asarray(values, dtype=np.float64).T
+        weights = (~np.isnan(values)).astype(np.float64)
+        self._compress(np.concatenate([self.means, values], axis=1), np.concatenate([self.weights, weights], axis=1))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self._compress(np.concatenate([self.means, other.means], axis=1),
+                       np.concatenate([self.weights, other.weights], axis=1))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        means = np.where(weights > 0, means, np.inf)
+        order = np.argsort(means, axis=1, kind="stable")
+        means = np.take_along_axis(means, order, axis=1)
+        weights = np.take_along_axis(weights, order, axis=1)
+        means = np.where(weights > 0, means, 0.0)
+        n_columns, n_centroids = means.shape
+        if n_centroids <= self.max_centroids:
+            self.means, self.weights = means, weights
+            return
+
+        # centroids are assigned to equal weight buckets by the cumulative weight at their mid point
+        total = np.maximum(weights.sum(axis=1, keepdims=True), 1.0)
+        midpoint_rank = np.cumsum(weights, axis=1) - weights / 2
+        buckets = np.clip((midpoint_rank / total * self.max_centroids).astype(np.int64), 0, self.max_centroids - 1)
+        flat_buckets = (buckets + np.arange(n_columns)[:, None] * self.max_centroids).ravel()
+        size = n_columns * self.max_centroids
+        bucket_weights = np.bincount(flat_buckets, weights=weights.ravel(), minlength=size)
+        bucket_sums = np.bincount(flat_buckets, weights=(means * weights).ravel(), minlength=size)
+
+        self.weights = bucket_weights.reshape(n_columns, self.max_centroids)
+        self.means = np.divide(bucket_sums.reshape(n_columns, self.max_centroids), self.weights,
+                               out=np.zeros_like(self.weights), where=self.weights > 0)
+
+    def cdf_knots(self, column: int, minimum: float, maximum: float) -> tuple:
+        '''Knots of the piecewise linear cdf of a column, each centroid sits at the middle of its weight.'''
+        present = self.weights[column] > 0
+        means, weights = self.means[column][present], self.weights[column][present]
+        cdf = (np.cumsum(weights) - weights / 2) / weights.sum()
+        return np.concatenate([[minimum], means, [maximum]]), np.concatenate([[0.0], cdf, [1.0]])
+
+
+class ReservoirSample:
+    """
+    Uniform random sample of at most size rows of a stream of (n_rows, n_columns) chunks
+    Every row seen so far has the same probability of being in the sample, so statistics
+    that need all values at once can be estimated from data that does not fit in memory.
+    """
+    def __init__(self, n_columns: int, size: int = 100000, random_state: int = 42):
+        self.size = size
+        self.rows = np.empty((size, n_columns))
+        self.n_seen = 0
+        self._random = np.random.default_rng(random_state)
+
+    @property
+    def sample(self) -> np.ndarray:
+        return self.rows[:min(self.n_seen, self.size)]
+
+    def update(self, values: np.ndarray) -> None:
+        '''Adds a chunk of rows, keeping each with probability size / rows seen.'''
+        values = np.asarray(values, dtype=np.float64)
+        n_free = max(self.size - self.n_seen, 0)
+        self.rows[self.n_seen:self.n_seen + min(n_free, len(values))] = values[:n_free]
+        if len(values) > n_free:
+            # algorithm R: row i replaces a random slot when a draw from [0, i] falls inside the reservoir,
+            # later rows win duplicate slots as they would when processed one at a time
+            positions = np.arange(self.n_seen + n_free, self.n_seen + len(values))
+            slots = self._random.integers(0, positions + 1)
+            kept = slots < self.size
+            self.rows[slots[kept]] = values[n_free:][kept]
+        self.n_seen += len(values)
+
+
+class ReferenceProfile:
+    """
+    Compact, mergeable profile of a dataset used as the reference for drift checks
+    Numerical columns keep a quantile sketch plus count, null count, mean, variance, min and max;
+    categorical columns keep their value counts.
+    """
+    def __init__(self, numerical_columns: list, categorical_columns: list, max_centroids: int = 1000):
+        n_columns = len(numerical_columns)
+        self.numerical_columns = list(numerical_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.sketch = QuantileSketch(n_columns, max_centroids=max_centroids)
+        self.count = np.zeros(n_columns)
+        self.null_count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.minimum = np.full(n_columns, np.inf)
+        self.maximum = np.full(n_columns, -np.inf)
+        self.category_counts = {column: {} for column in self.categorical_columns}
+
+    @property
+    def variance(self) -> np.ndarray:
+        return np.divide(self.m2, self.count - 1, out=np.full_like(self.m2, np.nan), where=self.count > 1)
+
+    def _merge_moments(self, count, null_count, mean, m2, minimum, maximum) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = self.mean + delta * count / safe_total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.count = total
+        self.null_count = self.null_count + null_count
+        self.minimum = np.fmin(self.minimum, minimum)
+        self.maximum = np.fmax(self.maximum, maximum)
+
+    def update(self, dataframe: DataFrame) -> None:
+        '''Adds a chunk of rows to the profile.'''
+        try:
+            values = dataframe[self.numerical_columns].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            count = present.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(count > 0, np.nansum(values, axis=0) / np.maximum(count, 1), 0.0)
+                m2 = np.nansum((values - mean) ** 2, axis=0)
+            self._merge_moments(count, len(values) - count, mean, m2,
+                                np.where(present, values, np.inf).min(axis=0, initial=np.inf),
+                                np.where(present, values, -np.inf).max(axis=0, initial=-np.inf))
+            self.sketch.update(values)
+
+            for column in self.categorical_columns:
+                for value, value_count in dataframe[column].value_counts().items():
+                    self.category_counts[column][str(value)] = self.category_counts[column].get(str(value), 0) + int(value_count)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def merge(self, other: "ReferenceProfile") -> None:
+        '''Merges another profile of the same columns into this one.'''
+        try:
+            self._merge_moments(other.count, other.null_count, other.mean, other.m2, other.minimum, other.maximum)
+            self.sketch.merge(other.sketch)
+            for column, counts in other.category_counts.items():
+                for value, value_count in counts.items():
+                    self.category_counts[column][value] = self.category_counts[column].get(value, 0) + value_count
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @classmethod
+    def from_chunks(cls, chunks, numerical_columns: list, categorical_columns: list,
+                    max_centroids: int = 1000) -> "ReferenceProfile":
+        '''Builds a profile in a single pass over an iterable of DataFrames.'''
+        profile = cls(numerical_columns, categorical_columns, max_centroids=max_centroids)
+        for chunk in chunks:
+            profile.update(chunk)
+        return profile
+
+    def ks_statistics(self, current: "ReferenceProfile") -> dict:
+        '''KS statistic of every column between this profile and current, with the sample sizes of both.'''
+        try:
+            statistics = {}
+            for position, column in enumerate(self.numerical_columns):
+                n_base, n_current = int(self.count[position]), int(current.count[position])
+                if n_base == 0 or n_current == 0:
+                    continue
+                base_x, base_cdf = self.sketch.cdf_knots(position, self.minimum[position], self.maximum[position])
+                current_x, current_cdf = current.sketch.cdf_knots(position, current.minimum[position], current.maximum[position])
+                knots = np.union1d(base_x, current_x)
+                difference = np.abs(np.interp(knots, base_x, base_cdf, left=0.0, right=1.0) -
+                                    np.interp(knots, current_x, current_cdf, left=0.0, right=1.0))
+                statistics[column] = (float(difference.max()), n_base, n_current)
+
+            for column in self.categorical_columns:
+                base_counts = pd.Series(self.category_counts[column], dtype=np.float64)
+                current_counts = pd.Series(current.category_counts[column], dtype=np.float64)
+                categories = sorted(set(base_counts.index) | set(current_counts.index))
+                base_counts = base_counts.reindex(categories, fill_value=0.0)
+                current_counts = current_counts.reindex(categories, fill_value=0.0)
+                n_base, n_current = int(base_counts.sum()), int(current_counts.sum())
+                if n_base == 0 or n_current == 0:
+                    continue
+                difference = np.abs(np.cumsum(base_counts.to_numpy()) / n_base - np.cumsum(current_counts.to_numpy()) / n_current)
+                statistics[column] = (float(difference.max()), n_base, n_current)
+            return statistics
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def compare(self, current: "ReferenceProfile", threshold: float = 0.05) -> tuple:
+        '''Drift report in the drift_report.yaml format and whether any column drifted.'''
+        try:
+            drift_report = {}
+            drift_detected = False
+            for column, (ks_statistic, n_base, n_current) in self.ks_statistics(current).items():
+                p_value = float(ks_pvalues(np.array([ks_statistic]), n_base, n_current)[0])
+                drift_report[column] = {"p_value": p_value, "drift_detected": bool(p_value < threshold)}
+                drift_detected = drift_detected or p_value < threshold
+            return drift_report, drift_detected
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def save(self, file_path: Path) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            categories = {}
+            for position, column in enumerate(self.categorical_columns):
+                categories[f"category_values_{position}"] = np.array(list(self.category_counts[column].keys()), dtype=str)
+                categories[f"category_counts_{position}"] = np.array(list(self.category_counts[column].values()), dtype=np.int64)
+            with open(file_path, "wb") as file:
+                np.savez(file,
+                         numerical_columns=np.array(self.numerical_columns, dtype=str),
+                         categorical_columns=np.array(self.categorical_columns, dtype=str),
+                         max_centroids=np.array(self.sketch.max_centroids),
+                         centroid_means=self.sketch.means, centroid_weights=self.sketch.weights,
+                         count=self.count, null_count=self.null_count, mean=self.mean, m2=self.m2,
+                         minimum=self.minimum, maximum=self.maximum, **categories)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: Path) -> "ReferenceProfile":
+        try:
+            with np.load(file_path) as data:
+                profile = cls(data["numerical_columns"].tolist(), data["categorical_columns"].tolist(),
+                              max_centroids=int(data["max_centroids"]))
+                profile.sketch.means, profile.sketch.weights = data["centroid_means"], data["centroid_weights"]
+                profile.count, profile.null_count = data["count"], data["null_count"]
+                profile.mean, profile.m2 = data["mean"], data["m2"]
+                profile.minimum, profile.maximum = data["minimum"], data["maximum"]
+                for position, column in enumerate(profile.categorical_columns):
+                    profile.category_counts[column] = dict(zip(data[f"category_values_{position}"].tolist(),
+                                                               data[f"category_counts_{position}"].tolist()))
+            return profile
+        except Exception as e:
+            raise AppException(e, sys) from e
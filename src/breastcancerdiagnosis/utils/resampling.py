@@ -0,0 +1,190 @@
+import os
+import sys
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy.sparse import csr_matrix
+from sklearn.base import BaseEstimator
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics.pairwise import euclidean_distances
+from sklearn.neighbors import NearestNeighbors
+from imblearn.combine import SMOTEENN
+from imblearn.over_sampling import SMOTE
+from imblearn.under_sampling import EditedNearestNeighbours
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+RESAMPLING_METHODS = ("smoteenn", "smote", "enn", "none")
+NEIGHBORS_ALGORITHMS = ("auto", "kd_tree", "ball_tree", "brute", "approximate")
+# number of fitted approximate neighbour indexes kept in index_cache_dir, the least recently used are removed first
+MAX_CACHED_INDEXES: int = 8
+
+
+class ApproximateNeighbors(BaseEstimator):
+    """
+    Approximate k nearest neighbours for resampling large training sets
+    An inverted file index: the training points are clustered into n_lists k-means cells
+    and every query only computes exact distances to the points of its n_probe closest
+    cells. The cost of a query drops from n_samples to about n_probe / n_lists of it,
+    at the price of occasionally missing a neighbour lying in a cell that is not probed.
+    Queries are split across n_jobs threads. The interface is the subset of
+    KNeighborsMixin used by imblearn. With index_cache_dir the fitted cells are stored
+    keyed by a hash of the data and the index settings, and fitting the same data again,
+    in a later run or by another resampler, loads them instead of clustering.
+    """
+    def __init__(self, n_neighbors: int = 5, n_lists: Optional[int] = None, n_probe: int = 16,
+                 n_jobs: Optional[int] = None, random_state: Optional[int] = 42, index_cache_dir: Optional[Path] = None):
+        self.n_neighbors = n_neighbors
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.index_cache_dir = index_cache_dir
+
+    def index_key(self, X: np.ndarray) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{X.shape}:{self.n_lists}:{self.random_state}".encode())
+        digest.update(X.tobytes())
+        return digest.hexdigest()
+
+    def _load_index(self, file_path: Path) -> Optional[tuple]:
+        try:
+            with np.load(file_path) as index:
+                os.utime(file_path)
+                return index["centroids"], index["order"], index["offsets"]
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            # a missing or partly written index is rebuilt
+            return None
+
+    def _save_index(self, file_path: Path) -> None:
+        os.makedirs(self.index_cache_dir, exist_ok=True)
+        temporary_path = f"{file_path}.{os.getpid()}.tmp.npz"
+        np.savez(temporary_path, centroids=self.centroids_, order=self.order_, offsets=self.offsets_)
+        os.replace(temporary_path, file_path)
+        cached = sorted(Path(self.index_cache_dir).glob("*.npz"), key=lambda path: path.stat().st_mtime_ns)
+        for path in cached[:-MAX_CACHED_INDEXES]:
+            if not path.name.endswith(".tmp.npz"):
+                path.unlink(missing_ok=True)
+
+    def fit(self, X, y=None) -> "ApproximateNeighbors":
+        try:
+            X = np.ascontiguousarray(X, dtype=np.float64)
+            self.n_samples_fit_ = len(X)
+            file_path, index = None, None
+            if self.index_cache_dir is not None:
+                file_path = Path(self.index_cache_dir) / f"{self.index_key(X)}.npz"
+                index = self._load_index(file_path)
+            if index is not None:
+                self.centroids_, self.order_, self.offsets_ = index
+            else:
+                n_lists = self.n_lists or max(1, int(np.sqrt(len(X))))
+                kmeans = MiniBatchKMeans(n_clusters=min(n_lists, len(X)), n_init=1, random_state=self.random_state).fit(X)
+                self.centroids_ = kmeans.cluster_centers_
+                # training points are stored grouped by cell, cell c holds order_[offsets_[c]:offsets_[c + 1]]
+                self.order_ = np.argsort(kmeans.labels_, kind="stable")
+                self.offsets_ = np.searchsorted(kmeans.labels_[self.order_], np.arange(len(self.centroids_) + 1))
+                if file_path is not None:
+                    self._save_index(file_path)
+            self._fit_X = X[self.order_]
+            return self
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _query(self, X: np.ndarray, n_neighbors: int) -> tuple:
+        n_probe = min(self.n_probe, len(self.centroids_))
+        probes = np.argpartition(euclidean_distances(X, self.centroids_, squared=True), n_probe - 1, axis=1)[:, :n_probe]
+        best_distances = np.full((len(X), n_neighbors), np.inf)
+        best_indices = np.full((len(X), n_neighbors), -1, dtype=np.int64)
+        for cell in np.unique(probes):
+            queries = np.flatnonzero((probes == cell).any(axis=1))
+            start, stop = self.offsets_[cell], self.offsets_[cell + 1]
+            distances = np.hstack([best_distances[queries],
+                                   euclidean_distances(X[queries], self._fit_X[start:stop], squared=True)])
+            indices = np.hstack([best_indices[queries], np.broadcast_to(np.arange(start, stop), (len(queries), stop - start))])
+            if distances.shape[1] > n_neighbors:
+                keep = np.argpartition(distances, n_neighbors - 1, axis=1)[:, :n_neighbors]
+                distances, indices = np.take_along_axis(distances, keep, axis=1), np.take_along_axis(indices, keep, axis=1)
+            best_distances[queries], best_indices[queries] = distances, indices
+
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        best_distances = np.sqrt(np.maximum(np.take_along_axis(best_distances, order, axis=1), 0.0))
+        best_indices = np.take_along_axis(best_indices, order, axis=1)
+        return best_distances, np.where(best_indices >= 0, self.order_[best_indices], -1)
+
+    def kneighbors(self, X=None, n_neighbors: Optional[int] = None, return_distance: bool = True):
+        try:
+            n_neighbors = n_neighbors or self.n_neighbors
+            query_is_train = X is None
+            X = self._fit_X[np.argsort(self.order_)] if query_is_train else np.ascontiguousarray(X, dtype=np.float64)
+            # a training point is its own nearest neighbour, it is excluded when querying the training set
+            n_query = n_neighbors + 1 if query_is_train else n_neighbors
+            n_jobs = max(1, min(effective_n_jobs(self.n_jobs), len(X)))
+            blocks = np.array_split(np.arange(len(X)), n_jobs)
+            results = Parallel(n_jobs=n_jobs, prefer="threads")(
+                delayed(self._query)(X[block], n_query) for block in blocks if len(block)
+            )
+            distances = np.vstack([result[0] for result in results])
+            indices = np.vstack([result[1] for result in results])
+            if query_is_train:
+                distances, indices = distances[:, 1:], indices[:, 1:]
+            return (distances, indices) if return_distance else indices
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def kneighbors_graph(self, X=None, n_neighbors: Optional[int] = None, mode: str = "connectivity"):
+        try:
+            distances, indices = self.kneighbors(X, n_neighbors=n_neighbors, return_distance=True)
+            n_queries, n_neighbors = indices.shape
+            data = distances.ravel() if mode == "distance" else np.ones(indices.size)
+            return csr_matrix((data, indices.ravel(), np.arange(0, n_queries * n_neighbors + 1, n_neighbors)),
+                              shape=(n_queries, self.n_samples_fit_))
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+
+def get_neighbors_estimator(algorithm: str, n_neighbors: int, n_jobs: Optional[int] = None,
+                            index_cache_dir: Optional[Path] = None):
+    """
+    Neighbour index used by the resamplers
+    algorithm: auto, kd_tree, ball_tree or brute for exact neighbours, approximate for ApproximateNeighbors
+    n_neighbors: int number of neighbours including the query point itself
+    n_jobs: int number of parallel queries
+    index_cache_dir: directory the fitted approximate indexes are kept in and reused from, None to always fit
+    """
+    try:
+        if algorithm not in NEIGHBORS_ALGORITHMS:
+            raise ValueError(f"Unknown neighbors algorithm {algorithm}, expected one of {NEIGHBORS_ALGORITHMS}")
+        if algorithm == "approximate":
+            return ApproximateNeighbors(n_neighbors=n_neighbors, n_jobs=n_jobs, index_cache_dir=index_cache_dir)
+        return NearestNeighbors(n_neighbors=n_neighbors, algorithm=algorithm, n_jobs=n_jobs)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def get_resampler(method: str = "smoteenn", neighbors_algorithm: str = "auto", k_neighbors: int = 5,
+                  enn_neighbors: int = 3, n_jobs: Optional[int] = None, random_state: Optional[int] = None,
+                  index_cache_dir: Optional[Path] = None):
+    """
+    Resampler handling class imbalance, None when method is none
+    method: smoteenn, smote (oversampling only) or enn (cleaning only)
+    k_neighbors, enn_neighbors: neighbours used by SMOTE and EditedNearestNeighbours, as their integer defaults
+    index_cache_dir: where approximate neighbour indexes are persisted, see ApproximateNeighbors
+    """
+    try:
+        if method not in RESAMPLING_METHODS:
+            raise ValueError(f"Unknown resampling method {method}, expected one of {RESAMPLING_METHODS}")
+        if method == "none":
+            return None
+        # both samplers query with the training points themselves, hence one extra neighbour
+        smote = SMOTE(sampling_strategy="minority", random_state=random_state,
+                      k_neighbors=get_neighbors_estimator(neighbors_algorithm, k_neighbors + 1, n_jobs, index_cache_dir))
+        enn = EditedNearestNeighbours(sampling_strategy="all", n_jobs=n_jobs,
+                                      n_neighbors=get_neighbors_estimator(neighbors_algorithm, enn_neighbors + 1, n_jobs, index_cache_dir))
+        if method == "smote":
+            return smote
+        if method == "enn":
+            return enn
+        return SMOTEENN(sampling_strategy="minority", smote=smote, enn=enn, random_state=random_state)
+    except Exception as e:
+        raise AppException(e, sys) from e
@@ -0,0 +1,172 @@
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional
+from pandas import DataFrame
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.utils.main_utils import iter_dataframe_chunks
+from breastcancerdiagnosis.utils.profile_utils import ReferenceProfile
+from breastcancerdiagnosis.constants import TARGET_COLUMN
+
+# number of values outside target_mapping kept in the report
+MAX_REPORTED_UNKNOWN_VALUES: int = 10
+
+
+def is_dtype_valid(series: pd.Series, expected_dtype: str) -> bool:
+    """
+    Check a column against the type declared in schema.yaml
+    Integer columns are accepted for float columns, integral floats for int columns
+    """
+    if expected_dtype == "object":
+        return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+    if expected_dtype == "int":
+        if pd.api.types.is_integer_dtype(series):
+            return True
+        return pd.api.types.is_float_dtype(series) and bool(np.all(np.mod(series.dropna(), 1) == 0))
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+class SchemaValidator:
+    """
+    Validates data files against config/schema.yaml in a single scan per file
+    Every chunk is checked for column presence, dtypes, null rates, value ranges and the
+    target_mapping domain. When profile_centroids is set the same scan also builds the
+    ReferenceProfile used for drift detection.
+    """
+    def __init__(self, schema: dict, chunk_size: int = 100000, profile_centroids: Optional[int] = None):
+        try:
+            self.schema = schema
+            self.chunk_size = chunk_size
+            self.profile_centroids = profile_centroids
+            rules = schema.get('validation_rules', {}) or {}
+            self.max_null_rate = rules.get('max_null_rate', 1.0)
+            self.null_rate_exceptions = rules.get('null_rate_exceptions', {}) or {}
+            self.value_ranges = rules.get('value_ranges', {}) or {}
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def _new_profile(self) -> Optional[ReferenceProfile]:
+        if self.profile_centroids is None:
+            return None
+        drop_columns = self.schema['drop_columns']
+        return ReferenceProfile(
+            numerical_columns=[column for column in self.schema['numerical_columns'] if column not in drop_columns],
+            categorical_columns=[column for column in self.schema['categorical_columns'] if column not in drop_columns],
+            max_centroids=self.profile_centroids
+        )
+
+    def _scan_chunk(self, chunk: DataFrame, state: dict) -> None:
+        state["n_rows"] += len(chunk)
+        for column, expected_dtype in self.schema['columns'].items():
+            if column not in chunk.columns:
+                continue
+            series = chunk[column]
+            column_state = state["columns"][column]
+            column_state["dtype"] = str(series.dtype)
+            column_state["dtype_valid"] = column_state["dtype_valid"] and is_dtype_valid(series, expected_dtype)
+            column_state["null_count"] += int(series.isna().sum())
+            if column in self.value_ranges and pd.api.types.is_numeric_dtype(series) and series.notna().any():
+                column_state["min"] = min(column_state["min"], float(series.min()))
+                column_state["max"] = max(column_state["max"], float(series.max()))
+
+        if TARGET_COLUMN in chunk.columns:
+            known_values = set(self.schema['target_mapping'])
+            unknown_values = set(chunk[TARGET_COLUMN].dropna().unique().tolist()) - known_values
+            target_state = state["columns"][TARGET_COLUMN]
+            target_state["unknown_values"].update(str(value) for value in unknown_values)
+
+    def _build_report(self, state: dict, file_columns: list) -> dict:
+        n_rows = state["n_rows"]
+        column_reports = {}
+        for column, expected_dtype in self.schema['columns'].items():
+            column_state = state["columns"][column]
+            present = column in file_columns
+            report = {"present": present, "expected_dtype": expected_dtype}
+            checks = [present]
+            if present:
+                null_rate = column_state["null_count"] / n_rows if n_rows else 0.0
+                max_null_rate = self.null_rate_exceptions.get(column, self.max_null_rate)
+                report.update({"dtype": column_state["dtype"], "dtype_valid": column_state["dtype_valid"],
+                               "null_rate": null_rate, "null_rate_valid": null_rate <= max_null_rate})
+                checks += [report["dtype_valid"], report["null_rate_valid"]]
+                if column in self.value_ranges and np.isfinite(column_state["min"]):
+                    value_range = self.value_ranges[column]
+                    range_valid = (value_range.get('min') is None or column_state["min"] >= value_range['min']) and \
+                                  (value_range.get('max') is None or column_state["max"] <= value_range['max'])
+                    report.update({"min": column_state["min"], "max": column_state["max"], "range_valid": range_valid})
+                    checks.append(range_valid)
+                if column == TARGET_COLUMN:
+                    unknown_values = sorted(column_state["unknown_values"])
+                    report["unknown_target_values"] = unknown_values[:MAX_REPORTED_UNKNOWN_VALUES]
+                    report["target_domain_valid"] = not unknown_values
+                    checks.append(report["target_domain_valid"])
+            report["valid"] = all(checks)
+            column_reports[column] = report
+
+        unexpected_columns = [column for column in file_columns if column not in self.schema['columns']]
+        return {
+            "n_rows": n_rows,
+            "n_columns": len(file_columns),
+            "missing_columns": [column for column, report in column_reports.items() if not report["present"]],
+            "unexpected_columns": unexpected_columns,
+            "valid": len(file_columns) == len(self.schema['columns']) and all(report["valid"] for report in column_reports.values()),
+            "columns": column_reports
+        }
+
+    def validate_feature_chunk(self, chunk: DataFrame, feature_columns: list) -> tuple:
+        '''
+        Checks a chunk of model inputs, returns (errors, row_valid): chunk level errors for missing
+        columns or wrong dtypes and a mask of the rows without nulls or out of range feature values.
+        '''
+        try:
+            errors = [f"missing column {column}" for column in feature_columns if column not in chunk.columns]
+            errors += [f"column {column} has dtype {chunk[column].dtype}, expected {self.schema['columns'][column]}"
+                       for column in feature_columns if column in chunk.columns and column in self.schema['columns']
+                       and not is_dtype_valid(chunk[column], self.schema['columns'][column])]
+            if errors:
+                return errors, np.zeros(len(chunk), dtype=bool)
+
+            row_valid = chunk[feature_columns].notna().all(axis=1).to_numpy()
+            for column in feature_columns:
+                value_range = self.value_ranges.get(column)
+                if value_range is None:
+                    continue
+                if value_range.get('min') is not None:
+                    row_valid &= ~(chunk[column] < value_range['min']).to_numpy()
+                if value_range.get('max') is not None:
+                    row_valid &= ~(chunk[column] > value_range['max']).to_numpy()
+            return errors, row_valid
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def validate_file(self, file_path: Path) -> tuple:
+        '''Scans a file once and returns its validation report and, if enabled, its reference profile.'''
+        try:
+            state = {
+                "n_rows": 0,
+                "columns": {column: {"dtype": None, "dtype_valid": True, "null_count": 0, "min": np.inf, "max": -np.inf,
+                                     "unknown_values": set()} for column in self.schema['columns']}
+            }
+            profile = self._new_profile()
+            file_columns = []
+            for chunk in iter_dataframe_chunks(file_path, chunk_size=self.chunk_size):
+                file_columns = list(chunk.columns)
+                self._scan_chunk(chunk, state)
+                if profile is not None and all(column in chunk.columns for column in
+                                               profile.numerical_columns + profile.categorical_columns):
+                    profile.update(chunk)
+            return self._build_report(state, file_columns), profile
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def validate_files(self, file_paths: dict, n_jobs: int = 2, executor: str = "thread") -> dict:
+        '''Validates several files concurrently, returns a dict of name to (report, profile).'''
+        try:
+            pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+            with pool_class(max_workers=max(1, min(n_jobs, len(file_paths)))) as pool:
+                futures = {name: pool.submit(self.validate_file, file_path) for name, file_path in file_paths.items()}
+                return {name: future.result() for name, future in futures.items()}
+        except Exception as e:
+            raise AppException(e, sys) from e
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import dill
+import time
+import sqlite3
+import hashlib
+import sklearn
+import numpy as np
+from pathlib import Path
+from typing import Optional
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+# rows hashed at a time, so memory mapped training data is never copied as a whole
+HASH_BLOCK_ROWS: int = 65536
+
+
+class SearchMemo:
+    """
+    Persistent SQLite store of hyper parameter search results
+    Per fold cross validation scores and fit times are keyed by a hash of the training data,
+    the estimator (class, fixed parameters, fit options and sklearn version), the rows and folds used and
+    the searched parameters. Estimators refitted on all rows with the best parameters are
+    stored as well. A search over unchanged data only fits the combinations it has not seen.
+    With max_data_keys, only the results of that many most recently searched training
+    datasets are kept, older ones are deleted when a new dataset is searched.
+    """
+    def __init__(self, db_path: Path, max_data_keys: Optional[int] = None):
+        try:
+            self.max_data_keys = max_data_keys
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(db_path)
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS cv_scores (
+                    data_key TEXT, estimator_key TEXT, folds_key TEXT, params_key TEXT, fold INTEGER,
+                    score REAL, fit_time REAL,
+                    PRIMARY KEY (data_key, estimator_key, folds_key, params_key, fold)
+                );
+                CREATE TABLE IF NOT EXISTS fitted_estimators (
+                    data_key TEXT, estimator_key TEXT, params_key TEXT, estimator BLOB,
+                    PRIMARY KEY (data_key, estimator_key, params_key)
+                );
+                CREATE TABLE IF NOT EXISTS data_keys (
+                    data_key TEXT PRIMARY KEY, last_used REAL
+                );
+            """)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    @staticmethod
+    def data_key(X: np.ndarray, y: np.ndarray) -> str:
+        digest = hashlib.sha256()
+        for array in (X, y):
+            digest.update(f"{array.shape}:{array.dtype}".encode())
+            for start in range(0, len(array), HASH_BLOCK_ROWS):
+                digest.update(np.ascontiguousarray(array[start:start + HASH_BLOCK_ROWS]).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def estimator_key(estimator, scoring: Optional[str] = None, fit_options: Optional[dict] = None) -> str:
+        estimator_class = type(estimator)
+        fixed_params = json.dumps(estimator.get_params(deep=False), sort_keys=True, default=repr)
+        key = f"{estimator_class.__module__}.{estimator_class.__qualname__}:{fixed_params}:{scoring}:{sklearn.__version__}"
+        # keys of estimators fitted without fit options are unchanged
+        if fit_options:
+            key += ":" + json.dumps(fit_options, sort_keys=True, default=repr)
+        return key
+
+    @staticmethod
+    def folds_key(folds: list) -> str:
+        digest = hashlib.sha256()
+        for train, test in folds:
+            digest.update(np.asarray(train, dtype=np.int64).tobytes())
+            digest.update(b"|")
+            digest.update(np.asarray(test, dtype=np.int64).tobytes())
+            digest.update(b"/")
+        return digest.hexdigest()
+
+    @staticmethod
+    def params_key(params: dict) -> str:
+        return json.dumps(params, sort_keys=True, default=repr)
+
+    def use_data_key(self, data_key: str) -> None:
+        '''Marks a training dataset as searched now and, with max_data_keys, deletes the results of the least recently searched ones.'''
+        try:
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO data_keys VALUES (?, ?)", (data_key, time.time()))
+            if self.max_data_keys is None:
+                return
+            # datasets stored before their use was recorded count as the oldest
+            stale_keys = [row[0] for row in self.connection.execute("""
+                SELECT stored.data_key FROM (
+                    SELECT data_key FROM cv_scores UNION SELECT data_key FROM fitted_estimators UNION SELECT data_key FROM data_keys
+                ) AS stored LEFT JOIN data_keys USING (data_key)
+                ORDER BY COALESCE(data_keys.last_used, 0) DESC LIMIT -1 OFFSET ?
+            """, (self.max_data_keys,)).fetchall()]
+            if not stale_keys:
+                return
+            with self.connection:
+                for table in ("cv_scores", "fitted_estimators", "data_keys"):
+                    self.connection.executemany(f"DELETE FROM {table} WHERE data_key = ?", [(key,) for key in stale_keys])
+            # deleted rows only free pages inside the file, VACUUM gives them back
+            self.connection.execute("VACUUM")
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def get_scores(self, data_key: str, estimator_key: str, folds_key: str, params_key: str) -> dict:
+        '''Stored fold -> (score, fit_time) of a parameter combination, nan for failed fits.'''
+        try:
+            rows = self.connection.execute(
+                "SELECT fold, score, fit_time FROM cv_scores WHERE data_key = ? AND estimator_key = ? AND folds_key = ? AND params_key = ?",
+                (data_key, estimator_key, folds_key, params_key)
+            ).fetchall()
+            return {fold: (np.nan if score is None else score, fit_time) for fold, score, fit_time in rows}
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def put_scores(self, records: list) -> None:
+        '''Stores (data_key, estimator_key, folds_key, params_key, fold, score, fit_time) records.'''
+        try:
+            records = [record[:5] + (None if np.isnan(record[5]) else record[5], record[6]) for record in records]
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO cv_scores VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def get_estimator(self, data_key: str, estimator_key: str, params_key: str) -> Optional[object]:
+        try:
+            row = self.connection.execute(
+                "SELECT estimator FROM fitted_estimators WHERE data_key = ? AND estimator_key = ? AND params_key = ?",
+                (data_key, estimator_key, params_key)
+            ).fetchone()
+            return None if row is None else dill.loads(row[0])
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def put_estimator(self, data_key: str, estimator_key: str, params_key: str, estimator: object) -> None:
+        try:
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO fitted_estimators VALUES (?, ?, ?, ?)",
+                                        (data_key, estimator_key, params_key, dill.dumps(estimator)))
+        except Exception as e:
+            raise AppException(e, sys) from e
+
+    def close(self) -> None:
+        self.connection.close()
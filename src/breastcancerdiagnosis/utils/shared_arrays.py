@@ -0,0 +1,70 @@
+import sys
+import mmap
+import hashlib
+import numpy as np
+from breastcancerdiagnosis.exception.exception_handler import AppException
+
+# arrays smaller than this stay where they are, a page of shared memory each would cost more than it saves
+MIN_SHARED_ARRAY_BYTES: int = 4096
+
+
+def _iter_arrays(obj, path: str, seen: set):
+    '''Yields (path, container, key, array) of every numpy array reachable through dicts, lists and instance attributes.'''
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, dict):
+        items = list(obj.items())
+    elif isinstance(obj, list):
+        items = list(enumerate(obj))
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        items = list(vars(obj).items())
+        obj = vars(obj)
+    else:
+        return
+    for key, value in sorted(items, key=lambda item: str(item[0])):
+        if isinstance(value, np.ndarray):
+            if value.dtype != object:
+                yield f"{path}.{key}", obj, key, value
+        elif isinstance(value, (dict, list)) or (hasattr(value, "__dict__") and not callable(value)):
+            yield from _iter_arrays(value, f"{path}.{key}", seen)
+
+
+def _shared_copy(array: np.ndarray) -> np.ndarray:
+    # anonymous MAP_SHARED memory: after fork every worker maps the same physical pages
+    buffer = mmap.mmap(-1, max(array.nbytes, 1))
+    shared = np.frombuffer(buffer, dtype=array.dtype, count=array.size).reshape(array.shape)
+    shared[...] = array
+    shared.flags.writeable = False
+    return shared
+
+
+def share_model_arrays(model, min_bytes: int = MIN_SHARED_ARRAY_BYTES) -> int:
+    """
+    Moves the large numpy arrays of a loaded model into read-only shared memory
+    Meant to run in the parent of a pre-fork server before the workers are forked: the
+    weights then live in pages no worker can write to, so they are never copied on write
+    by one of them. Returns the number of bytes moved.
+    """
+    try:
+        moved = 0
+        for _, container, key, array in list(_iter_arrays(model, "model", set())):
+            if array.nbytes < min_bytes:
+                continue
+            container[key] = _shared_copy(array)
+            moved += array.nbytes
+        return moved
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+def model_arrays_digest(model) -> str:
+    ''' Hash of the dtype, shape and content of every array of a model, equal in processes seeing the same weights '''
+    try:
+        digest = hashlib.sha256()
+        for path, _, _, array in _iter_arrays(model, "model", set()):
+            digest.update(f"{path}:{array.dtype.str}:{array.shape}".encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()[:16]
+    except Exception as e:
+        raise AppException(e, sys) from e
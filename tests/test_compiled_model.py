@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from sklearn.datasets import load_breast_cancer
+from sklearn.ensemble import AdaBoostClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.entity.compiled_model import CompiledModel
+from breastcancerdiagnosis.entity.model import PrepareModel
+from breastcancerdiagnosis.entity.transformer import YeoJohnsonScaler
+from breastcancerdiagnosis.utils.model_compiler import compile_model, save_compiled_model, UnsupportedModelError
+
+ESTIMATORS = {
+    "logistic_regression": LogisticRegression(max_iter=5000),
+    "svc_linear": SVC(kernel="linear", C=0.5),
+    "svc_poly": SVC(kernel="poly", degree=3, C=1.0),
+    "svc_rbf": SVC(kernel="rbf", C=10.0),
+    "svc_sigmoid": SVC(kernel="sigmoid", C=0.1),
+    "adaboost_samme": AdaBoostClassifier(n_estimators=20, algorithm="SAMME", random_state=0),
+    "adaboost_samme_r": AdaBoostClassifier(n_estimators=20, algorithm="SAMME.R", random_state=0),
+    "hist_gradient_boosting": HistGradientBoostingClassifier(max_iter=30, random_state=0),
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    features, target = load_breast_cancer(return_X_y=True, as_frame=True)
+    return features.iloc[:400], target.iloc[:400], features.iloc[400:]
+
+
+def prepare_model(data, estimator, threshold=None) -> PrepareModel:
+    features, target, _ = data
+    scaler = YeoJohnsonScaler(columns=list(features.columns)).fit(features)
+    estimator.fit(scaler.transform(features), target)
+    return PrepareModel(preprocessing_object=scaler, trained_model_object=estimator, batch_size=64, threshold=threshold)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("name", list(ESTIMATORS))
+def test_compiled_model_matches_sklearn(data, name, tmp_path):
+    model = prepare_model(data, ESTIMATORS[name])
+    file_path = tmp_path / "model.npz"
+    save_compiled_model(file_path, compile_model(model))
+    compiled_model = CompiledModel.load(file_path)
+    test_features = data[2]
+
+    np.testing.assert_array_equal(compiled_model.predict(test_features), model.predict(test_features))
+    estimator = model.trained_model_object
+    np.testing.assert_allclose(compiled_model.decision_function(test_features),
+                               estimator.decision_function(model.transform(test_features)), rtol=1e-9, atol=1e-9)
+    assert compiled_model.has_proba == hasattr(estimator, "predict_proba")
+    if compiled_model.has_proba:
+        np.testing.assert_allclose(compiled_model.predict_proba(test_features), model.predict_proba(test_features),
+                                   rtol=1e-9, atol=1e-9)
+
+
+def test_compiled_model_scores_records_like_dataframes(data):
+    model = prepare_model(data, LogisticRegression(max_iter=5000), threshold=0.3)
+    compiled_model = CompiledModel(compile_model(model))
+    test_features = data[2]
+    records = test_features.to_dict("records")
+
+    np.testing.assert_array_equal(compiled_model.predict(records), model.predict(test_features))
+    np.testing.assert_array_equal(compiled_model.predict(test_features.to_numpy()), model.predict(test_features))
+
+
+def test_unsupported_model_raises_unsupported_model_error(data):
+    model = prepare_model(data, DecisionTreeClassifier(max_depth=3, random_state=0))
+    with pytest.raises(UnsupportedModelError):
+        compile_model(model)
+
+
+def test_compiler_failures_are_not_reported_as_unsupported(data):
+    model = prepare_model(data, LogisticRegression(max_iter=5000))
+    del model.trained_model_object.coef_
+    with pytest.raises(AppException):
+        compile_model(model)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from scipy.stats import ks_2samp, wasserstein_distance
+from breastcancerdiagnosis.utils.drift_utils import ks_and_wasserstein, ks_pvalues, compute_drift_statistics
+
+
+def samples(random_state: int = 0) -> tuple:
+    random = np.random.RandomState(random_state)
+    base = random.normal(size=(300, 4))
+    current = random.normal(loc=[0.0, 0.3, 0.0, 1.0], size=(200, 4))
+    # rounded columns have ties inside and across the samples
+    base[:, 2:] = np.round(base[:, 2:], 1)
+    current[:, 2:] = np.round(current[:, 2:], 1)
+    return base, current
+
+
+@pytest.mark.parametrize("random_state", [0, 1, 2])
+def test_ks_and_wasserstein_match_scipy(random_state):
+    base, current = samples(random_state)
+    ks_statistics, wasserstein_distances = ks_and_wasserstein(base, current)
+    p_values = ks_pvalues(ks_statistics, len(base), len(current))
+    for column in range(base.shape[1]):
+        expected = ks_2samp(base[:, column], current[:, column], method="asymp")
+        assert ks_statistics[column] == pytest.approx(expected.statistic, abs=1e-12)
+        assert p_values[column] == pytest.approx(expected.pvalue, rel=1e-9, abs=1e-15)
+        assert wasserstein_distances[column] == pytest.approx(wasserstein_distance(base[:, column], current[:, column]))
+
+
+def test_compute_drift_statistics_handles_missing_values_and_blocks():
+    base, current = samples()
+    base[::7, 1] = np.nan
+    current[::5, 3] = np.nan
+    statistics = compute_drift_statistics(base, current, metrics=("wasserstein", "psi"), n_jobs=2, columns_per_job=2)
+    for column in range(base.shape[1]):
+        base_column = base[:, column][~np.isnan(base[:, column])]
+        current_column = current[:, column][~np.isnan(current[:, column])]
+        expected = ks_2samp(base_column, current_column, method="asymp")
+        assert statistics["ks_statistic"][column] == pytest.approx(expected.statistic, abs=1e-12)
+        assert statistics["p_value"][column] == pytest.approx(expected.pvalue, rel=1e-9, abs=1e-15)
+    assert set(statistics) == {"ks_statistic", "p_value", "wasserstein", "psi"}
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from sklearn.datasets import load_breast_cancer
+from sklearn.preprocessing import PowerTransformer, StandardScaler
+from breastcancerdiagnosis.entity.transformer import YeoJohnsonScaler
+
+
+@pytest.fixture(scope="module")
+def features():
+    features, _ = load_breast_cancer(return_X_y=True, as_frame=True)
+    # negative values take the other branch of the Yeo-Johnson transform
+    features.iloc[:, :5] -= features.iloc[:, :5].median()
+    return features
+
+
+@pytest.mark.parametrize("include_standardized_input", [False, True])
+def test_matches_power_transformer_and_standard_scaler(features, include_standardized_input):
+    scaler = YeoJohnsonScaler(columns=list(features.columns), include_standardized_input=include_standardized_input)
+    transformed = scaler.fit(features).transform(features)
+
+    expected = PowerTransformer(method="yeo-johnson", standardize=True).fit_transform(features.to_numpy())
+    if include_standardized_input:
+        expected = np.hstack([expected, StandardScaler().fit_transform(features.to_numpy())])
+    np.testing.assert_allclose(transformed, expected, rtol=1e-7, atol=1e-9)
+    assert len(scaler.get_feature_names_out()) == transformed.shape[1]
+
+
+def test_partial_fit_in_chunks_matches_fit(features):
+    fitted = YeoJohnsonScaler(columns=list(features.columns)).fit(features)
+    chunked = YeoJohnsonScaler(columns=list(features.columns)).fit_lambdas(features)
+    for start in range(0, len(features), 100):
+        chunked.partial_fit(features.iloc[start:start + 100])
+
+    np.testing.assert_allclose(chunked.mean_, fitted.mean_, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(chunked.transform(features), fitted.transform(features), rtol=1e-9, atol=1e-9)
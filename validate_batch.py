@@ -0,0 +1,24 @@
+import sys
+import argparse
+from breastcancerdiagnosis.exception.exception_handler import AppException
+from breastcancerdiagnosis.components.data_validation import DataValidation
+from breastcancerdiagnosis.entity.config_entity import DataValidationConfig
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(description="Check a new csv, parquet or feather file against the schema and "
+                                                     "for drift from the reference profile of the last training run")
+        parser.add_argument("input_file", help="file of new rows to validate")
+        args = parser.parse_args()
+
+        data_validation = DataValidation(DataValidationConfig.from_yaml("config/config.yaml"), data_ingestion_artifact=None)
+        data_validation_artifact = data_validation.validate_batch(args.input_file)
+        print(data_validation_artifact.validation_message)
+        sys.exit(0 if data_validation_artifact.validation_status else 1)
+    except Exception as e:
+        raise AppException(e, sys) from e
+
+
+
+if __name__ == "__main__":
+    main()